@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'web_app.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -53,6 +54,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'web_app.context_processors.unread_notifications',
             ],
         },
     },
@@ -64,6 +66,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # The job worker writes from several threads; take the write lock up
+        # front and wait for it instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -114,7 +122,40 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Google Maps API (for logistics routing)
 GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', 'your-google-maps-key')
 
+# Marketplace
+PLATFORM_FEE_RATE = 0.025   # charged on the order subtotal
+
 # Cold Chain Alert Settings
 COLD_CHAIN_ALERT_EMAIL = os.environ.get('ALERT_EMAIL', 'alerts@AgriLogix.com')
 TEMPERATURE_THRESHOLD_MIN = 2   # °C
-TEMPERATURE_THRESHOLD_MAX = 8   # °C
\ No newline at end of file
+TEMPERATURE_THRESHOLD_MAX = 8   # °C
+TEMPERATURE_WARNING_MARGIN = 2   # °C outside the range before a warning becomes critical
+
+# Background Job Queue (run with `python manage.py run_jobs`)
+JOB_QUEUE_EAGER = False              # run jobs inline at enqueue time (tests / no worker)
+JOB_LOCK_TIMEOUT_SECONDS = 300       # running jobs older than this are considered abandoned
+JOB_BACKOFF_BASE_SECONDS = 5
+JOB_BACKOFF_MAX_SECONDS = 3600
+
+# Product view counter (web_app.view_counter)
+VIEW_COUNT_FLUSH_SECONDS = 30        # write buffered views at most this often per process
+VIEW_COUNT_FLUSH_THRESHOLD = 1000    # ...or as soon as this many views are buffered
+
+# Notification digests (web_app.notifications): notification type -> window in seconds.
+# Events of a listed type for the same user within one window become a single notification.
+NOTIFICATION_DIGEST_WINDOWS = {
+    'order': 300,
+}
+NOTIFICATION_ARCHIVE_DAYS = 90       # read notifications older than this move to the archive table
+
+# Resumable photo uploads (web_app.uploads)
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', str(BASE_DIR / 'upload_sessions'))
+CHUNKED_UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+CHUNKED_UPLOAD_CHUNK_BYTES = 256 * 1024   # suggested chunk size for slow links
+CHUNKED_UPLOAD_EXPIRY_HOURS = 48
+
+# Request instrumentation (web_app.instrumentation); off unless INSTRUMENTATION_ENABLED=1
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 10    # same SQL shape this often in one request is flagged
+INSTRUMENTATION_RECENT_REQUESTS = 200        # requests kept for the admin page
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')   # bearer token for /metrics scrapers
@@ -3,7 +3,10 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from web_app.admin import instrumentation_view
+
 urlpatterns = [
+    path('admin/instrumentation/', admin.site.admin_view(instrumentation_view), name='admin_instrumentation'),
     path('admin/', admin.site.urls),
     path('', include('web_app.urls')),  # include your app urls
 ]
@@ -1,14 +1,32 @@
-from django.contrib import admin
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Count
+from django.http import FileResponse
+from django.shortcuts import redirect, render
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
+
+from . import instrumentation
+from .exports import export_queryset, schema_path
+from .planner import accept as accept_pickup
+from .price_import import BulletinError, import_prices
 from .models import (
-    User, Notification,
+    User, Notification, NotificationArchive, PendingNotification,
     Farm, FarmerProfile, HarvestSchedule,
-    ProductCategory, Product, PriceHistory,
-    Vehicle, LogisticsRoute, Shipment, ShipmentTracking,
+    ProductCategory, Product, PriceHistory, ProductViewDaily,
+    Vehicle, LogisticsRoute, Shipment, ShipmentTracking, PickupProposal, SyncMutation,
     Order, OrderItem, Dispute,
-    ColdStorageFacility, ColdStorageBooking, TemperatureLog,
-    PostHarvestLossReport, PlatformMetric, MarketPriceIndex,
+    ColdStorageFacility, ColdStorageBooking, TemperatureLog, TemperatureExcursion,
+    PostHarvestLossReport, PlatformMetric, MarketPriceIndex, LossSummary, LossTotal, MarketCoverage, PriceBand,
+    SupplyForecast, BuyerRecommendation, MediaBlob, MediaReference, UploadSession,
+    BackgroundJob,
 )
 
 admin.site.site_header = "🌾 AgriLogix Administration"
@@ -16,6 +34,23 @@ admin.site.site_title = "AgriLogix Admin"
 admin.site.index_title = "Logistics in Agriculture Platform"
 
 
+@admin.action(description='Export selected rows (Parquet / gzip CSV)')
+def export_columnar(modeladmin, request, queryset):
+    workdir = tempfile.mkdtemp(prefix='agrilogix-export-')
+    path_base = os.path.join(workdir, modeladmin.model._meta.model_name)
+    path, _ = export_queryset(queryset, path_base)
+    if path.endswith('.csv.gz'):
+        # The CSV is only typed together with its schema sidecar, so both go out in one zip.
+        with zipfile.ZipFile(f'{path_base}.zip', 'w') as bundle:
+            for member in (path, schema_path(path_base)):
+                bundle.write(member, os.path.basename(member))
+        path = f'{path_base}.zip'
+    handle = open(path, 'rb')
+    # The open handle keeps the data readable while FileResponse streams it.
+    shutil.rmtree(workdir)
+    return FileResponse(handle, as_attachment=True, filename=os.path.basename(path))
+
+
 # ============================================================
 # 👤 USERS
 # ============================================================
@@ -49,10 +84,27 @@ class CustomUserAdmin(UserAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'notification_type', 'is_read', 'created_at']
+    list_display = ['title', 'user', 'notification_type', 'item_count', 'is_read', 'created_at']
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['title', 'message', 'user__username']
     list_editable = ['is_read']
+    readonly_fields = ['item_count', 'payload', 'created_at']
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'notification_type', 'item_count', 'created_at', 'archived_at']
+    list_filter = ['notification_type', 'archived_at']
+    search_fields = ['title', 'user__username']
+    readonly_fields = ['id', 'user', 'notification_type', 'title', 'message', 'item_count', 'payload',
+                       'created_at', 'archived_at']
+
+
+@admin.register(PendingNotification)
+class PendingNotificationAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'notification_type', 'created_at']
+    list_filter = ['notification_type']
+    search_fields = ['title', 'user__username']
     readonly_fields = ['created_at']
 
 
@@ -107,9 +159,10 @@ class FarmerProfileAdmin(admin.ModelAdmin):
 class HarvestScheduleAdmin(admin.ModelAdmin):
     list_display = ['product_name', 'farm', 'expected_quantity_kg', 'actual_quantity_kg',
                     'harvest_date', 'ready_for_pickup_date', 'status']
-    list_filter = ['status', 'harvest_date']
+    list_filter = ['status', 'commodity_key', 'harvest_date']
     search_fields = ['product_name', 'farm__name']
     list_editable = ['status']
+    readonly_fields = ['commodity_key']
     date_hierarchy = 'harvest_date'
 
     def get_queryset(self, request):
@@ -139,17 +192,17 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'farm', 'category', 'quantity_available', 'unit',
                     'price_per_unit', 'total_value_display', 'is_organic', 'status', 'created_at']
-    list_filter = ['status', 'category', 'is_organic', 'is_certified', 'created_at']
+    list_filter = ['status', 'near_expiry', 'category', 'commodity_key', 'is_organic', 'is_certified', 'created_at']
     search_fields = ['name', 'variety', 'farm__name', 'farm__owner__username']
     list_editable = ['status', 'price_per_unit']
-    readonly_fields = ['views_count', 'created_at']
+    readonly_fields = ['commodity_key', 'near_expiry', 'views_count', 'created_at']
     inlines = [PriceHistoryInline]
     date_hierarchy = 'harvest_date'
 
     fieldsets = (
-        ('Product Info', {'fields': ('farm', 'category', 'name', 'variety', 'description', 'photo')}),
+        ('Product Info', {'fields': ('farm', 'category', 'name', 'commodity_key', 'variety', 'description', 'photo')}),
         ('Inventory & Pricing', {'fields': ('quantity_available', 'unit', 'price_per_unit', 'minimum_order_quantity')}),
-        ('Dates', {'fields': ('harvest_date', 'expiry_date')}),
+        ('Dates', {'fields': ('harvest_date', 'expiry_date', 'near_expiry')}),
         ('Quality & Status', {'fields': ('is_organic', 'is_certified', 'status', 'views_count', 'created_at')}),
     )
 
@@ -161,6 +214,14 @@ class ProductAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('farm__owner', 'category')
 
 
+@admin.register(ProductViewDaily)
+class ProductViewDailyAdmin(admin.ModelAdmin):
+    list_display = ['product', 'day', 'views']
+    list_filter = ['day']
+    search_fields = ['product__name']
+    date_hierarchy = 'day'
+
+
 @admin.register(PriceHistory)
 class PriceHistoryAdmin(admin.ModelAdmin):
     list_display = ['product', 'price', 'market_price', 'price_diff', 'recorded_at']
@@ -221,6 +282,7 @@ class ShipmentAdmin(admin.ModelAdmin):
     list_display = ['shipment_code', 'driver', 'vehicle', 'status_badge', 'status',  # ← add 'status'
                     'weight_kg', 'shipping_cost', 'scheduled_pickup', 'actual_delivery', 'driver_rating']
     list_editable = ['status']
+    actions = [export_columnar]
 
     list_filter = ['status', 'created_at', 'scheduled_pickup']
     search_fields = ['shipment_code', 'driver__username', 'pickup_address', 'delivery_address']
@@ -234,7 +296,8 @@ class ShipmentAdmin(admin.ModelAdmin):
                                   'delivery_address', 'delivery_latitude', 'delivery_longitude')}),
         ('Timeline', {'fields': ('scheduled_pickup', 'actual_pickup', 'estimated_delivery', 'actual_delivery')}),
         ('Details', {'fields': ('status', 'weight_kg', 'shipping_cost', 'notes')}),
-        ('Completion', {'fields': ('proof_of_delivery_photo', 'driver_rating', 'created_at', 'updated_at')}),
+        ('Completion', {'fields': ('proof_of_delivery_photo', 'driver_rating', 'handover_rating',
+                                   'created_at', 'updated_at')}),
     )
 
     def status_badge(self, obj):
@@ -267,6 +330,41 @@ class ShipmentTrackingAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
 
 
+@admin.register(SyncMutation)
+class SyncMutationAdmin(admin.ModelAdmin):
+    list_display = ['client_id', 'user', 'kind', 'shipment', 'result', 'error', 'client_at', 'received_at']
+    list_filter = ['kind', 'result', 'received_at']
+    search_fields = ['client_id', 'user__username', 'shipment__shipment_code']
+    readonly_fields = ['user', 'client_id', 'kind', 'shipment', 'payload', 'client_at', 'result', 'error',
+                       'received_at']
+
+
+@admin.register(PickupProposal)
+class PickupProposalAdmin(admin.ModelAdmin):
+    list_display = ['region', 'pickup_date', 'farm_count', 'total_kg', 'cold_chain_kg', 'vehicle_class',
+                    'vehicle_loads', 'estimated_cost', 'cold_storage_facility', 'status', 'needs_review']
+    list_filter = ['status', 'needs_review', 'vehicle_class', 'region']
+    search_fields = ['region']
+    date_hierarchy = 'pickup_date'
+    readonly_fields = ['harvest_ids', 'farm_count', 'total_kg', 'cold_chain_kg', 'pickup_latitude',
+                       'pickup_longitude', 'route', 'vehicle_class', 'vehicle_loads', 'estimated_cost',
+                       'cold_storage_facility', 'storage_tonnes', 'fingerprint', 'shipment',
+                       'cold_storage_booking', 'created_at', 'updated_at']
+    actions = ['accept_proposals', 'dismiss_proposals']
+
+    def accept_proposals(self, request, queryset):
+        proposals = queryset.filter(status='proposed').select_related('route', 'cold_storage_facility')
+        for proposal in proposals:
+            accept_pickup(proposal, request.user)
+        self.message_user(request, f'{len(proposals)} pickup(s) booked.')
+    accept_proposals.short_description = 'Book shipments for selected proposals'
+
+    def dismiss_proposals(self, request, queryset):
+        updated = queryset.filter(status='proposed').update(status='dismissed', needs_review=False)
+        self.message_user(request, f'{updated} proposal(s) dismissed.')
+    dismiss_proposals.short_description = 'Dismiss selected proposals'
+
+
 # ============================================================
 # 📦 ORDERS
 # ============================================================
@@ -290,6 +388,7 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'buyer', 'farmer', 'status_badge', 'status',  # ← add 'status'
                     'subtotal', 'shipping_cost', 'total_amount', 'farmer_earnings_display',
                     'payment_method', 'created_at']
+    actions = [export_columnar]
 
     list_filter = ['status', 'payment_method', 'created_at']
     search_fields = ['order_number', 'buyer__username', 'farmer__username', 'payment_reference']
@@ -342,6 +441,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ['requires_cold_chain']
     search_fields = ['product__name', 'order__order_number']
     readonly_fields = ['subtotal']
+    actions = [export_columnar]
 
 
 @admin.register(Dispute)
@@ -427,6 +527,7 @@ class TemperatureLogAdmin(admin.ModelAdmin):
     search_fields = ['sensor_id']
     readonly_fields = ['recorded_at']
     date_hierarchy = 'recorded_at'
+    actions = [export_columnar]
 
     def temperature_display(self, obj):
         color = {'critical': '#DC143C', 'warning': '#FFA500', 'normal': '#228B22'}.get(obj.alert_level, '#000')
@@ -439,6 +540,25 @@ class TemperatureLogAdmin(admin.ModelAdmin):
     alert_badge.short_description = 'Alert Level'
 
 
+@admin.register(TemperatureExcursion)
+class TemperatureExcursionAdmin(admin.ModelAdmin):
+    list_display = ['sensor_id', 'booking', 'shipment', 'alert_badge', 'status', 'peak_temperature_celsius',
+                    'readings_count', 'suppressed_count', 'notifications_sent', 'alert_latency_ms',
+                    'opened_at', 'closed_at']
+    list_filter = ['status', 'alert_level', 'opened_at']
+    search_fields = ['sensor_id', 'booking__facility__name', 'shipment__shipment_code']
+    readonly_fields = ['first_log', 'opened_at', 'notified_at', 'alert_latency_ms', 'closed_at']
+    date_hierarchy = 'opened_at'
+
+    def alert_badge(self, obj):
+        badges = {'warning': '🟡 Warning', 'critical': '🔴 CRITICAL'}
+        return badges.get(obj.alert_level, obj.alert_level)
+    alert_badge.short_description = 'Alert Level'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('booking__facility', 'shipment')
+
+
 # ============================================================
 # 📊 ANALYTICS
 # ============================================================
@@ -447,10 +567,10 @@ class TemperatureLogAdmin(admin.ModelAdmin):
 class PostHarvestLossReportAdmin(admin.ModelAdmin):
     list_display = ['product_name', 'farm', 'quantity_lost_kg', 'value_lost_display',
                     'primary_cause', 'was_cold_chain_used', 'incident_date']
-    list_filter = ['primary_cause', 'was_cold_chain_used', 'incident_date']
+    list_filter = ['primary_cause', 'commodity_key', 'was_cold_chain_used', 'incident_date']
     search_fields = ['product_name', 'farm__name', 'farm__owner__username']
     date_hierarchy = 'incident_date'
-    readonly_fields = ['created_at']
+    readonly_fields = ['commodity_key', 'created_at']
 
     def value_lost_display(self, obj):
         return format_html('<span style="color:red">KES {:,.0f}</span>', float(obj.estimated_value_lost))
@@ -481,8 +601,169 @@ class PlatformMetricAdmin(admin.ModelAdmin):
 
 @admin.register(MarketPriceIndex)
 class MarketPriceIndexAdmin(admin.ModelAdmin):
-    list_display = ['product_name', 'market', 'price_per_kg', 'recorded_date']
-    list_filter = ['market', 'recorded_date']
+    list_display = ['product_name', 'commodity_key', 'market', 'price_per_kg', 'recorded_date']
+    list_filter = ['market', 'commodity_key', 'recorded_date']
     search_fields = ['product_name']
     date_hierarchy = 'recorded_date'
-    list_editable = ['price_per_kg']
\ No newline at end of file
+    list_editable = ['price_per_kg']
+    readonly_fields = ['commodity_key']
+    actions = [export_columnar]
+    change_list_template = 'admin/web_app/marketpriceindex/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='web_app_marketpriceindex_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:web_app_marketpriceindex_changelist')
+        if request.method == 'POST' and request.FILES.get('bulletin'):
+            upload = request.FILES['bulletin']
+            try:
+                result = import_prices(upload.file, upload.name)
+            except BulletinError as exc:
+                messages.error(request, f'{upload.name}: {exc}')
+            else:
+                for error in result['errors']:
+                    messages.warning(request, error)
+                messages.success(request, f'{upload.name}: {result["upserted"]} prices upserted, '
+                                          f'{result["rejected"]} rows rejected.')
+                return redirect('admin:web_app_marketpriceindex_changelist')
+        return render(request, 'admin/web_app/marketpriceindex/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import market price bulletin',
+        })
+
+
+
+@admin.register(LossSummary)
+class LossSummaryAdmin(admin.ModelAdmin):
+    list_display = ['farm', 'month', 'primary_cause', 'report_count', 'total_kg_lost', 'total_value_lost', 'refreshed_at']
+    list_filter = ['primary_cause', 'month']
+    search_fields = ['farm__name']
+    readonly_fields = ['refreshed_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('farm__owner')
+
+
+@admin.register(LossTotal)
+class LossTotalAdmin(admin.ModelAdmin):
+    list_display = ['owner', 'primary_cause', 'report_count', 'total_kg_lost', 'total_value_lost']
+    list_filter = ['primary_cause']
+    search_fields = ['owner__username']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('owner')
+
+
+@admin.register(MarketCoverage)
+class MarketCoverageAdmin(admin.ModelAdmin):
+    list_display = ['product_name', 'market', 'price_points', 'first_recorded', 'last_recorded', 'refreshed_at']
+    list_filter = ['market']
+    search_fields = ['product_name']
+    readonly_fields = ['refreshed_at']
+
+
+@admin.register(PriceBand)
+class PriceBandAdmin(admin.ModelAdmin):
+    list_display = ['commodity_key', 'market', 'low_price', 'suggested_price', 'high_price',
+                    'market_price', 'transport_cost_per_kg', 'sample_size', 'as_of']
+    list_filter = ['market', 'as_of']
+    search_fields = ['commodity_key']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(SupplyForecast)
+class SupplyForecastAdmin(admin.ModelAdmin):
+    list_display = ['commodity_key', 'region', 'week_start', 'scheduled_kg', 'supply_kg', 'demand_kg',
+                    'farm_count', 'computed_at']
+    list_filter = ['week_start', 'region']
+    search_fields = ['commodity_key', 'region']
+    readonly_fields = ['computed_at']
+
+
+@admin.register(BuyerRecommendation)
+class BuyerRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['buyer', 'computed_at']
+    search_fields = ['buyer__username']
+    readonly_fields = ['product_ids', 'computed_at']
+
+
+# ============================================================
+# 🗂️ MEDIA
+# ============================================================
+
+class MediaReferenceInline(admin.TabularInline):
+    model = MediaReference
+    extra = 0
+    readonly_fields = ['model', 'object_id', 'field']
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'reference_count', 'created_at', 'last_uploaded_at']
+    search_fields = ['sha256', 'name']
+    readonly_fields = ['sha256', 'name', 'size', 'created_at', 'last_uploaded_at']
+    inlines = [MediaReferenceInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(reference_total=Count('references'))
+
+    def reference_count(self, obj):
+        return obj.reference_total
+    reference_count.short_description = 'References'
+    reference_count.admin_order_field = 'reference_total'
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'target', 'object_id', 'filename', 'received_bytes', 'size', 'status', 'expires_at']
+    list_filter = ['status', 'target', 'created_at']
+    search_fields = ['user__username', 'filename']
+    readonly_fields = ['id', 'received_bytes', 'created_at', 'updated_at']
+
+
+# ============================================================
+# ⚙️ BACKGROUND JOBS
+# ============================================================
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'max_attempts', 'run_after',
+                    'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'task', 'created_at']
+    search_fields = ['task', 'idempotency_key', 'last_error']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at']
+    date_hierarchy = 'created_at'
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{updated} job(s) queued for retry.')
+    retry_jobs.short_description = 'Retry selected jobs'
+
+
+# ============================================================
+# 📈 INSTRUMENTATION
+# ============================================================
+
+def instrumentation_view(request):
+    """Per-view latency and query counts from web_app.instrumentation (the worker serving this page only)."""
+    if request.method == 'POST' and request.user.is_superuser:
+        instrumentation.reset()
+        messages.success(request, 'Instrumentation counters reset.')
+        return redirect('admin_instrumentation')
+    views, recent = instrumentation.snapshot()
+    return render(request, 'admin/web_app/instrumentation.html', {
+        **admin.site.each_context(request),
+        'title': 'Request instrumentation',
+        'enabled': settings.INSTRUMENTATION_ENABLED,
+        'threshold': settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD,
+        'views': views,
+        'recent': recent,
+    })
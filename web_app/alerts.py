@@ -0,0 +1,196 @@
+"""
+Cold chain alert pipeline.
+
+Every TemperatureLog is classified against the range its booking (or
+shipment) requires. The first out-of-range reading for a sensor opens a
+TemperatureExcursion and notifies everyone with a stake in the goods; further
+bad readings only update the open episode, and the first normal reading
+closes it. A sensor reporting every 30 s therefore produces one alert per
+episode instead of one per reading.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import TemperatureExcursion, TemperatureLog
+from .notifications import send as send_notifications
+
+
+ALERT_TITLES = {
+    'warning': '🌡️ Temperature Warning',
+    'critical': '🔴 Critical Temperature Alert!',
+}
+
+
+def allowed_range(log):
+    """Return the (min, max) °C window the reading has to stay inside."""
+    if log.booking_id:
+        return Decimal(log.booking.required_temp_min), Decimal(log.booking.required_temp_max)
+    vehicle = log.shipment.vehicle if log.shipment_id else None
+    if vehicle and vehicle.refrigeration_min_temp is not None and vehicle.refrigeration_max_temp is not None:
+        return Decimal(vehicle.refrigeration_min_temp), Decimal(vehicle.refrigeration_max_temp)
+    return Decimal(settings.TEMPERATURE_THRESHOLD_MIN), Decimal(settings.TEMPERATURE_THRESHOLD_MAX)
+
+
+def deviation(temperature, low, high):
+    if temperature < low:
+        return low - temperature
+    if temperature > high:
+        return temperature - high
+    return Decimal(0)
+
+
+def classify(temperature, low, high):
+    off_by = deviation(temperature, low, high)
+    if off_by == 0:
+        return 'normal'
+    if off_by <= Decimal(str(settings.TEMPERATURE_WARNING_MARGIN)):
+        return 'warning'
+    return 'critical'
+
+
+def alert_recipients(log):
+    """User ids that must hear about an excursion on this reading's goods."""
+    user_ids = set()
+    order = None
+    if log.booking_id:
+        user_ids.add(log.booking.booked_by_id)
+        user_ids.add(log.booking.facility.operator_id)
+        order = log.booking.order
+    elif log.shipment_id:
+        if log.shipment.driver_id:
+            user_ids.add(log.shipment.driver_id)
+        order = getattr(log.shipment, 'order', None)
+    if order is not None:
+        user_ids.update([order.farmer_id, order.buyer_id])
+    user_ids.discard(None)
+    return sorted(user_ids)
+
+
+def _describe(log, low, high):
+    if log.booking_id:
+        where = f'{log.booking.facility.name} ({log.booking.product_description})'
+    else:
+        where = f'shipment {log.shipment.shipment_code}'
+    return (f'Sensor {log.sensor_id} at {where} recorded {log.temperature_celsius}°C — '
+            f'required range is {low}°C to {high}°C.')
+
+
+def _notify(excursion, log, low, high):
+    user_ids = alert_recipients(log)
+    title = ALERT_TITLES[excursion.alert_level]
+    message = _describe(log, low, high)
+    send_notifications(user_ids, 'cold_chain', title, message)
+    TemperatureLog.objects.filter(pk=log.pk).update(is_alert_sent=True)
+
+    now = timezone.now()
+    if excursion.notified_at is None:
+        excursion.notified_at = now
+        excursion.alert_latency_ms = max(int((now - log.recorded_at).total_seconds() * 1000), 0)
+    excursion.notifications_sent += len(user_ids)
+
+
+def _open_excursion(log, level, low, high):
+    excursion = TemperatureExcursion(
+        booking_id=log.booking_id,
+        shipment_id=log.shipment_id,
+        sensor_id=log.sensor_id,
+        first_log=log,
+        alert_level=level,
+        allowed_min_celsius=low,
+        allowed_max_celsius=high,
+        peak_temperature_celsius=log.temperature_celsius,
+        opened_at=log.recorded_at,
+    )
+    try:
+        with transaction.atomic():
+            excursion.save()
+    except IntegrityError:
+        # Another worker opened the episode for this sensor first.
+        return None
+    _notify(excursion, log, low, high)
+
+    # If a newer in-range reading was handled before this one, the episode is
+    # already over; record it closed at that reading.
+    recovery = TemperatureLog.objects.filter(
+        sensor_id=log.sensor_id, booking_id=log.booking_id, shipment_id=log.shipment_id,
+        recorded_at__gt=log.recorded_at, alert_level='normal',
+    ).order_by('recorded_at').values_list('recorded_at', flat=True).first()
+    if recovery:
+        excursion.status = 'closed'
+        excursion.closed_at = recovery
+    excursion.save(update_fields=['notified_at', 'alert_latency_ms', 'notifications_sent', 'status', 'closed_at'])
+    return excursion
+
+
+def process_reading(log):
+    """Classify one reading and open, extend or close its sensor's excursion."""
+    low, high = allowed_range(log)
+    temperature = Decimal(log.temperature_celsius)
+    level = classify(temperature, low, high)
+    if level != log.alert_level:
+        log.alert_level = level
+        TemperatureLog.objects.filter(pk=log.pk).update(alert_level=level)
+
+    with transaction.atomic():
+        excursion = (TemperatureExcursion.objects.select_for_update()
+                     .filter(sensor_id=log.sensor_id, status='open').first())
+
+        if excursion and (excursion.booking_id, excursion.shipment_id) != (log.booking_id, log.shipment_id):
+            # The sensor was moved to other goods; the old episode can't continue.
+            excursion.status = 'closed'
+            excursion.closed_at = log.recorded_at
+            excursion.save(update_fields=['status', 'closed_at'])
+            excursion = None
+
+        if level == 'normal':
+            # A late normal reading from before the episode started must not end it.
+            if excursion and log.recorded_at >= excursion.opened_at:
+                excursion.status = 'closed'
+                excursion.closed_at = log.recorded_at
+                excursion.save(update_fields=['status', 'closed_at'])
+            return excursion
+
+        if excursion is None:
+            # Readings can be processed out of order by the worker pool; a bad
+            # reading that belongs to an episode already closed stays suppressed.
+            earlier = TemperatureExcursion.objects.filter(
+                sensor_id=log.sensor_id, booking_id=log.booking_id, shipment_id=log.shipment_id,
+                opened_at__lte=log.recorded_at, closed_at__gte=log.recorded_at,
+            ).first()
+            if earlier:
+                TemperatureExcursion.objects.filter(pk=earlier.pk).update(
+                    readings_count=F('readings_count') + 1, suppressed_count=F('suppressed_count') + 1,
+                )
+                return earlier
+            return _open_excursion(log, level, low, high)
+
+        excursion.readings_count += 1
+        if deviation(temperature, low, high) > deviation(excursion.peak_temperature_celsius, low, high):
+            excursion.peak_temperature_celsius = temperature
+        if level == 'critical' and excursion.alert_level == 'warning':
+            # Escalation is new information, not a duplicate.
+            excursion.alert_level = 'critical'
+            _notify(excursion, log, low, high)
+        else:
+            excursion.suppressed_count += 1
+        excursion.save()
+        return excursion
+
+
+def alert_metrics(since=None):
+    """Alert volume and latency figures for the admin and platform metrics."""
+    excursions = TemperatureExcursion.objects.all()
+    if since is not None:
+        excursions = excursions.filter(opened_at__gte=since)
+    return excursions.aggregate(
+        excursions=Count('id'),
+        notifications_sent=Sum('notifications_sent'),
+        readings_suppressed=Sum('suppressed_count'),
+        avg_latency_ms=Avg('alert_latency_ms'),
+        max_latency_ms=Max('alert_latency_ms'),
+    )
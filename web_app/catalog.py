@@ -0,0 +1,116 @@
+"""
+Canonical commodity catalog.
+
+Product, HarvestSchedule, PostHarvestLossReport and MarketPriceIndex all
+carry free-text product names ("Cabbages (Drumhead)", "Sukuma Wiki (Kale)",
+"Maize (Dry)"). ``commodity_key_for`` maps any of them onto one canonical
+key, which the models store in an indexed ``commodity_key`` column so
+cross-table comparisons are equality joins rather than substring scans.
+
+The alias index is built once per process from ``COMMODITIES``.
+"""
+
+import re
+from functools import lru_cache
+
+# key: (display name, needs cold chain, aliases)
+COMMODITIES = {
+    'apple': ('Apples', True, ['apple']),
+    'avocado': ('Avocado', True, ['avocado', 'hass']),
+    'banana': ('Bananas', False, ['banana', 'matoke', 'cavendish']),
+    'beans': ('Dry Beans', False, ['beans', 'dry beans', 'rosecoco', 'mwitemania']),
+    'cabbage': ('Cabbage', True, ['cabbage', 'drumhead']),
+    'carrot': ('Carrots', True, ['carrot']),
+    'cassava': ('Cassava', False, ['cassava', 'mihogo']),
+    'coconut': ('Coconut', False, ['coconut', 'nazi']),
+    'coffee': ('Coffee', False, ['coffee', 'arabica', 'robusta']),
+    'eggs': ('Eggs', True, ['egg', 'mayai']),
+    'french_beans': ('French Beans', True, ['french bean', 'green bean']),
+    'kale': ('Kale (Sukuma Wiki)', True, ['kale', 'sukuma wiki', 'sukuma', 'collard']),
+    'maize': ('Maize', False, ['maize', 'corn', 'mahindi', 'wema']),
+    'mango': ('Mango', True, ['mango', 'apple mango', 'ngowe', 'kent', 'tommy']),
+    'milk': ('Fresh Milk', True, ['milk', 'maziwa']),
+    'mursik': ('Mursik', True, ['mursik', 'fermented milk', 'maziwa lala']),
+    'onion': ('Onions', False, ['onion', 'kitunguu']),
+    'potato': ('Potatoes', True, ['potato', 'irish potato', 'shangi']),
+    'sorghum': ('Sorghum', False, ['sorghum', 'mtama']),
+    'spinach': ('Spinach', True, ['spinach']),
+    'sweet_potato': ('Sweet Potatoes', False, ['sweet potato', 'viazi vitamu']),
+    'tea': ('Tea', False, ['tea', 'green leaf']),
+    'tilapia': ('Tilapia', True, ['tilapia']),
+    'tomato': ('Tomatoes', True, ['tomato', 'nyanya']),
+    'wheat': ('Wheat', False, ['wheat', 'wheat grain', 'ega fahari']),
+    'wheat_flour': ('Wheat Flour', False, ['wheat flour', 'atta']),
+}
+
+# Grading and marketing words that never change which commodity a name is.
+QUALIFIERS = {'organic', 'fresh', 'dry', 'dried', 'fine', 'whole', 'grade', 'premium', 'local', 'raw', 'of', 'and'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _singular(token):
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('oes') and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def tokens(text):
+    """Lower-cased, singularised word tokens of ``text`` with qualifiers removed."""
+    return tuple(_singular(t) for t in _TOKEN_RE.findall((text or '').lower()) if t not in QUALIFIERS)
+
+
+@lru_cache(maxsize=None)
+def _alias_index():
+    """{alias token tuple: key}, plus the longest alias length for the scan."""
+    index = {}
+    for key, (name, _, aliases) in COMMODITIES.items():
+        for alias in [key.replace('_', ' '), name, *aliases]:
+            alias_tokens = tokens(alias)
+            if alias_tokens:
+                index.setdefault(alias_tokens, key)
+    return index, max(len(alias) for alias in index)
+
+
+@lru_cache(maxsize=4096)
+def commodity_key_for(name):
+    """
+    Canonical key for a free-text product name.
+
+    The longest alias found anywhere in the name wins, so "Wheat Flour" maps
+    to wheat_flour rather than wheat. Names matching no alias fall back to a
+    slug of their tokens, so every row still gets an equality-joinable key.
+    """
+    words = tokens(name)
+    index, longest = _alias_index()
+    for size in range(min(longest, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            key = index.get(words[start:start + size])
+            if key:
+                return key
+    return '_'.join(words)[:40]
+
+
+def display_name(key):
+    return COMMODITIES[key][0] if key in COMMODITIES else key.replace('_', ' ').title()
+
+
+def requires_cold_chain(key):
+    return key in COMMODITIES and COMMODITIES[key][1]
+
+
+def filter_by_commodity(queryset, text, name_field='product_name'):
+    """
+    Narrow ``queryset`` to rows matching a user-typed product name.
+
+    Recognised commodities use the indexed ``commodity_key`` equality; anything
+    else (a partial word, an uncatalogued crop) falls back to a substring match.
+    """
+    key = commodity_key_for(text)
+    if key in COMMODITIES:
+        return queryset.filter(commodity_key=key)
+    return queryset.filter(**{f'{name_field}__icontains': text.strip()})
@@ -0,0 +1,131 @@
+"""
+Change feed for the mobile apps.
+
+``GET api/changes/`` returns, for each feed (orders, shipments, products,
+notifications, cold storage bookings), the rows the user may see that
+changed since the client's token, oldest first and at most ``limit`` per
+feed per page. The token is a signed keyset cursor holding the
+(updated_at, id) of the last row sent from each feed. A feed visible
+through several owner columns (an order's buyer or its farmer) is read as
+one query per owner, each a range scan of its ``(<owner>, updated_at, id)``
+index bounded below by the cursor, and the pages are merged here, so a
+poll costs what changed rather than the size of the table.
+
+Rows changed within the last ``SETTLE`` are held back until the next poll:
+``updated_at`` is stamped before the transaction commits, and a cursor that
+had already moved past that time would skip the row for good.
+
+Code that changes these models with ``QuerySet.update()`` has to set
+``updated_at`` itself for the change to reach the feed. Deleted rows are
+not reported.
+"""
+
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .images import rendition_urls
+from .models import ColdStorageBooking, ColdStorageFacility, Notification, Order, Product, Shipment
+
+TOKEN_SALT = 'web_app.change_feed'
+SETTLE = timedelta(seconds=2)
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def _orders(user):
+    return [Q(buyer=user), Q(farmer=user)]
+
+
+def _shipments(user):
+    linked = Order.objects.filter(Q(buyer=user) | Q(farmer=user), shipment__isnull=False).values('shipment_id')
+    return [Q(driver=user), Q(pk__in=linked)]
+
+
+def _bookings(user):
+    return [Q(booked_by=user), Q(facility__in=ColdStorageFacility.objects.filter(operator=user).values('pk'))]
+
+
+# name: (model, the user's visibility filters, one per owner index, fields sent)
+FEEDS = {
+    'orders': (Order, _orders, [
+        'id', 'order_number', 'buyer_id', 'farmer_id', 'shipment_id', 'status', 'subtotal', 'shipping_cost',
+        'platform_fee', 'total_amount', 'payment_method', 'payment_date', 'delivery_address',
+        'requested_delivery_date', 'created_at', 'completed_at', 'updated_at',
+    ]),
+    'shipments': (Shipment, _shipments, [
+        'id', 'shipment_code', 'driver_id', 'vehicle_id', 'status', 'pickup_address', 'delivery_address',
+        'scheduled_pickup', 'actual_pickup', 'estimated_delivery', 'actual_delivery', 'weight_kg',
+        'driver_rating', 'updated_at',
+    ]),
+    'products': (Product, lambda user: [Q()], [
+        'id', 'farm_id', 'category_id', 'name', 'variety', 'quantity_available', 'unit', 'price_per_unit',
+        'minimum_order_quantity', 'harvest_date', 'expiry_date', 'is_organic', 'is_certified', 'photo',
+        'status', 'near_expiry', 'updated_at',
+    ]),
+    'notifications': (Notification, lambda user: [Q(user=user)], [
+        'id', 'notification_type', 'title', 'message', 'item_count', 'payload', 'is_read', 'created_at',
+        'updated_at',
+    ]),
+    'bookings': (ColdStorageBooking, _bookings, [
+        'id', 'facility_id', 'order_id', 'booked_by_id', 'product_description', 'quantity_tonnes',
+        'required_temp_min', 'required_temp_max', 'start_date', 'end_date', 'total_cost', 'status',
+        'updated_at',
+    ]),
+}
+
+
+def read_token(token):
+    """{feed: (updated_at, id)} from a token; a missing or tampered token starts every feed over."""
+    if not token:
+        return {}
+    try:
+        cursors = signing.loads(token, salt=TOKEN_SALT)
+        return {name: (datetime.fromisoformat(at), pk) for name, (at, pk) in cursors.items() if name in FEEDS}
+    except (signing.BadSignature, TypeError, ValueError, AttributeError):
+        return {}
+
+
+def issue_token(cursors):
+    return signing.dumps({name: [at.isoformat(), pk] for name, (at, pk) in cursors.items()},
+                         salt=TOKEN_SALT, compress=True)
+
+
+def _after(cursor):
+    if cursor is None:
+        return Q()
+    at, pk = cursor
+    # The plain lower bound on updated_at is what lets the index range scan start at the cursor.
+    return Q(updated_at__gte=at) & (Q(updated_at__gt=at) | Q(id__gt=pk))
+
+
+def feed_queries(user, name, cursor=None, horizon=None, limit=DEFAULT_LIMIT):
+    """The per-owner-index querysets whose merged rows make one page of feed ``name``."""
+    model, visible, fields = FEEDS[name]
+    horizon = horizon or timezone.now() - SETTLE
+    return [model.objects.filter(owner, _after(cursor), updated_at__lt=horizon)
+            .order_by('updated_at', 'id').values(*fields)[:limit + 1]
+            for owner in visible(user)]
+
+
+def changes(user, token=None, feeds=None, limit=DEFAULT_LIMIT):
+    """One page of changes for ``user`` since ``token``; ``has_more`` means poll again straight away."""
+    cursors = read_token(token)
+    horizon = timezone.now() - SETTLE
+    page, has_more = {}, False
+    for name in feeds or FEEDS:
+        # A row visible through two owners (a driver's own order) comes back from both queries.
+        merged = {row['id']: row for query in feed_queries(user, name, cursors.get(name), horizon, limit)
+                  for row in query}
+        rows = sorted(merged.values(), key=lambda row: (row['updated_at'], row['id']))[:limit + 1]
+        if len(rows) > limit:
+            rows, has_more = rows[:limit], True
+        if rows:
+            cursors[name] = (rows[-1]['updated_at'], rows[-1]['id'])
+        if name == 'products':
+            for row in rows:
+                row['photo'] = rendition_urls(row['photo'])
+        page[name] = rows
+    return {'changes': page, 'has_more': has_more, 'token': issue_token(cursors)}
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def unread_notifications(request):
+    """``unread_count`` for the notification badge in base.html, counted only if a page shows it."""
+    if not request.user.is_authenticated:
+        return {}
+    return {'unread_count': SimpleLazyObject(lambda: unread_count(request.user.pk))}
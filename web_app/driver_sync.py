@@ -0,0 +1,216 @@
+"""
+Offline-first sync for the driver app.
+
+While out of signal the app queues status changes, location fixes and
+handover ratings (the driver's view of the delivery, kept apart from the
+``driver_rating`` customers give the driver), then sends them as one batch when it reconnects. ``sync``
+applies the batch in the order it was queued, in one transaction, and
+answers with the driver's shipments that changed since the client's last
+sync token.
+
+Every mutation carries a client-generated ``id`` (its idempotency key) and
+the device time ``at`` it happened. Each one is logged as a SyncMutation, so
+a batch resent after a lost response is acknowledged instead of applied
+twice. A mutation that no longer fits the server's state (a shipment
+reassigned or already closed) is rejected on its own; the rest of the batch
+still applies.
+"""
+
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Shipment, SyncMutation, User, Vehicle
+from .shipments import FINAL_STATUSES, clean_fix, track, update_status
+
+MAX_BATCH = 500
+TOKEN_SALT = 'web_app.driver_sync'
+# Changes committed by a transaction that started before the token was issued can land just behind it.
+TOKEN_OVERLAP = timedelta(seconds=5)
+SHIPMENT_FIELDS = [
+    'id', 'shipment_code', 'status', 'pickup_address', 'pickup_latitude', 'pickup_longitude',
+    'delivery_address', 'delivery_latitude', 'delivery_longitude', 'scheduled_pickup',
+    'estimated_delivery', 'weight_kg', 'notes', 'vehicle_id', 'updated_at',
+]
+
+
+class SyncError(Exception):
+    """The batch as a whole cannot be accepted."""
+
+
+class Rejected(Exception):
+    """One mutation cannot be applied."""
+
+
+def issue_token(at):
+    return signing.dumps(at.isoformat(), salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """The time a token was issued at, or None (full sync) for a missing or tampered token."""
+    if not token:
+        return None
+    try:
+        return datetime.fromisoformat(signing.loads(token, salt=TOKEN_SALT))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
+def _client_time(value, now):
+    try:
+        at = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        at = None
+    if at is None:
+        raise Rejected('at must be an ISO 8601 timestamp')
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    return min(at, now)  # a fast device clock must not stamp events in the future
+
+
+def _fix(data, required=False):
+    """The mutation's (latitude, longitude, speed_kmh), checked for type, finiteness and range."""
+    for key in ('latitude', 'longitude') if required else ():
+        if data.get(key) in (None, ''):
+            raise Rejected(f'{key} is required')
+    try:
+        return clean_fix(data.get('latitude'), data.get('longitude'), data.get('speed_kmh'))
+    except ValueError as exc:
+        raise Rejected(str(exc)) from None
+
+
+def _shipment(user, data):
+    try:
+        pk = int(data['shipment'])
+    except (KeyError, TypeError, ValueError):
+        raise Rejected('shipment is required') from None
+    shipment = Shipment.objects.select_for_update().filter(pk=pk, driver=user).first()
+    if shipment is None:
+        raise Rejected(f'Shipment #{pk} is not assigned to you')
+    return shipment
+
+
+def _apply_status(user, data, at):
+    shipment = _shipment(user, data)
+    if shipment.status in FINAL_STATUSES:
+        raise Rejected(f'Shipment is already {shipment.get_status_display()}')
+    latitude, longitude, speed_kmh = _fix(data)
+    try:
+        update_status(shipment, data.get('status'), latitude=latitude, longitude=longitude, speed_kmh=speed_kmh,
+                      at=at)
+    except ValueError as exc:
+        raise Rejected(str(exc)) from None
+    return shipment
+
+
+def _apply_location(user, data, at):
+    latitude, longitude, speed_kmh = _fix(data, required=True)
+    shipment = _shipment(user, data) if data.get('shipment') else None
+    try:
+        vehicle_id = int(data['vehicle']) if data.get('vehicle') else (shipment.vehicle_id if shipment else None)
+    except (TypeError, ValueError):
+        raise Rejected('vehicle must be a vehicle id') from None
+    if shipment is None and vehicle_id is None:
+        raise Rejected('A location fix needs a shipment or a vehicle')
+    if vehicle_id is not None:
+        # Fixes arrive late and out of order; an older one never overwrites a newer position.
+        Vehicle.objects.filter(pk=vehicle_id, driver=user).filter(
+            Q(last_location_update__isnull=True) | Q(last_location_update__lt=at)
+        ).update(current_latitude=latitude, current_longitude=longitude, last_location_update=at)
+    if shipment is not None:
+        track(shipment, latitude, longitude, speed_kmh, 'Location update', at=at)
+    return shipment
+
+
+def _apply_rating(user, data, at):
+    shipment = _shipment(user, data)
+    try:
+        rating = int(data['rating'])
+    except (KeyError, TypeError, ValueError):
+        raise Rejected('rating is required') from None
+    if not 1 <= rating <= 5:
+        raise Rejected('rating must be between 1 and 5')
+    if shipment.status != 'delivered':
+        raise Rejected('Only delivered shipments can be rated')
+    shipment.handover_rating = rating
+    shipment.save(update_fields=['handover_rating', 'updated_at'])
+    return shipment
+
+
+HANDLERS = {
+    'status': _apply_status,
+    'location': _apply_location,
+    'rating': _apply_rating,
+}
+
+
+def _apply(user, data, now):
+    """Apply one mutation; returns the unsaved SyncMutation recording the outcome."""
+    record = SyncMutation(user=user, client_id=str(data['id'])[:64], kind=str(data.get('type', ''))[:20],
+                          payload=data, client_at=now, result='applied')
+    try:
+        if record.kind not in HANDLERS:
+            raise Rejected(f'Unknown mutation type "{record.kind}"')
+        record.client_at = _client_time(data.get('at'), now)
+        # A savepoint per mutation, so a rejected one leaves nothing half-applied.
+        with transaction.atomic():
+            shipment = HANDLERS[record.kind](user, data, record.client_at)
+        record.shipment = shipment
+    except Rejected as exc:
+        record.result, record.error = 'rejected', str(exc)[:255]
+    except ValidationError as exc:
+        # A value the model refuses must not roll back the rest of the batch either.
+        record.result, record.error = 'rejected', '; '.join(exc.messages)[:255]
+    return record
+
+
+def changes(user, since):
+    """The driver's shipments changed since ``since`` (or every open one), plus the ids of all open ones."""
+    shipments = Shipment.objects.filter(driver=user)
+    if since is None:
+        changed = shipments.exclude(status__in=FINAL_STATUSES)
+    else:
+        changed = shipments.filter(updated_at__gte=since - TOKEN_OVERLAP)
+    return {
+        'shipments': list(changed.order_by('updated_at', 'id').values(*SHIPMENT_FIELDS)),
+        # Anything the client holds that is not listed here was closed or reassigned.
+        'open_shipments': list(shipments.exclude(status__in=FINAL_STATUSES).values_list('id', flat=True)),
+    }
+
+
+def sync(user, mutations, token=None):
+    """Apply ``mutations`` in order and return their results with the delta since ``token``."""
+    if not isinstance(mutations, list) or len(mutations) > MAX_BATCH:
+        raise SyncError(f'mutations must be a list of at most {MAX_BATCH} items')
+    if any(not isinstance(data, dict) or not data.get('id') for data in mutations):
+        raise SyncError('Every mutation needs an id')
+
+    since = read_token(token)
+    now = timezone.now()
+    results = []
+    with transaction.atomic():
+        # Serialises syncs from one driver (a resent batch racing the original, or two devices).
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+        client_ids = [str(data['id'])[:64] for data in mutations]
+        seen = {client_id: (result, error) for client_id, result, error in SyncMutation.objects.filter(
+            user=user, client_id__in=client_ids).values_list('client_id', 'result', 'error')}
+        records = []
+        for data in mutations:
+            client_id = str(data['id'])[:64]
+            if client_id in seen:
+                result, error = seen[client_id]
+                results.append({'id': client_id, 'result': result, 'error': error, 'duplicate': True})
+                continue
+            record = _apply(user, data, now)
+            records.append(record)
+            seen[client_id] = (record.result, record.error)
+            results.append({'id': client_id, 'result': record.result, 'error': record.error})
+        SyncMutation.objects.bulk_create(records)
+
+    issued_at = timezone.now()
+    return {'results': results, **changes(user, since), 'token': issue_token(issued_at)}
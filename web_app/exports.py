@@ -0,0 +1,175 @@
+"""
+Streaming columnar export of the analytics tables.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and written
+one batch at a time, so memory stays flat however large the table is.
+Parquet is used when pyarrow is installed; otherwise the export is a gzip
+CSV with a ``.schema.json`` sidecar recording each column's type, and
+``read_csv_export`` reads it back with those types.
+"""
+
+import csv
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.db import models
+
+from .models import MarketPriceIndex, Order, OrderItem, Shipment, TemperatureLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+
+EXPORT_TABLES = {
+    'orders': Order,
+    'order_items': OrderItem,
+    'shipments': Shipment,
+    'temperature_logs': TemperatureLog,
+    'market_prices': MarketPriceIndex,
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def parquet_available():
+    return pa is not None
+
+
+def columns_for(model):
+    """[(column name, type spec)] for the model's concrete fields."""
+    columns = []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, models.DecimalField):
+            spec = ('decimal', field.max_digits, field.decimal_places)
+        elif isinstance(field, models.DateTimeField):
+            spec = ('timestamp',)
+        elif isinstance(field, models.DateField):
+            spec = ('date',)
+        elif isinstance(field, models.BooleanField):
+            spec = ('bool',)
+        elif isinstance(field, models.FloatField):
+            spec = ('float',)
+        elif isinstance(field, (models.AutoField, models.IntegerField, models.ForeignKey)):
+            spec = ('int',)
+        elif isinstance(field, models.JSONField):
+            spec = ('json',)
+        else:
+            spec = ('string',)
+        columns.append((field.attname, spec))
+    return columns
+
+
+def _arrow_type(spec):
+    kind = spec[0]
+    if kind == 'decimal':
+        return pa.decimal128(spec[1], spec[2])
+    return {
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'date': pa.date32(),
+        'bool': pa.bool_(),
+        'float': pa.float64(),
+        'int': pa.int64(),
+    }.get(kind, pa.string())
+
+
+def _batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _cell(value, spec):
+    if value is None:
+        return ''
+    if spec[0] == 'json':
+        return json.dumps(value)
+    if spec[0] in ('date', 'timestamp'):
+        return value.isoformat()
+    return str(value)
+
+
+def _parse(text, spec):
+    if text == '':
+        return None
+    kind = spec[0]
+    if kind == 'decimal':
+        return Decimal(text)
+    if kind == 'timestamp':
+        return datetime.fromisoformat(text)
+    if kind == 'date':
+        return date.fromisoformat(text)
+    if kind == 'bool':
+        return text == 'True'
+    if kind == 'int':
+        return int(text)
+    if kind == 'float':
+        return float(text)
+    if kind == 'json':
+        return json.loads(text)
+    return text
+
+
+def schema_path(path_base):
+    return f'{path_base}.schema.json'
+
+
+def read_csv_export(path):
+    """Yield the rows of a gzip CSV export as dicts, typed by its schema sidecar."""
+    path_base = path[:-len('.csv.gz')]
+    with open(schema_path(path_base), encoding='utf-8') as handle:
+        schema = json.load(handle)
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as handle:
+        reader = csv.reader(handle)
+        names = next(reader)
+        for row in reader:
+            yield {name: _parse(text, schema[name]) for name, text in zip(names, row)}
+
+
+def export_queryset(queryset, path_base, fmt='auto', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write ``queryset`` to ``path_base`` + extension and return (path, row count).
+
+    ``fmt`` is 'parquet', 'csv' or 'auto' (Parquet when pyarrow is installed).
+    """
+    if fmt == 'auto':
+        fmt = 'parquet' if parquet_available() else 'csv'
+    if fmt == 'parquet' and not parquet_available():
+        raise RuntimeError('Parquet export needs pyarrow; install it or use --format csv')
+
+    columns = columns_for(queryset.model)
+    names = [name for name, _ in columns]
+    rows = queryset.order_by('pk').values_list(*names).iterator(chunk_size=chunk_size)
+    count = 0
+
+    if fmt == 'parquet':
+        path = f'{path_base}.parquet'
+        schema = pa.schema([(name, _arrow_type(spec)) for name, spec in columns])
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for batch in _batches(rows, chunk_size):
+                arrays = [
+                    pa.array([json.dumps(row[i]) if spec[0] == 'json' and row[i] is not None else row[i]
+                              for row in batch], type=schema.field(i).type)
+                    for i, (_, spec) in enumerate(columns)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(batch)
+        return path, count
+
+    path = f'{path_base}.csv.gz'
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(names)
+        for batch in _batches(rows, chunk_size):
+            writer.writerows([_cell(value, spec) for value, (_, spec) in zip(row, columns)] for row in batch)
+            count += len(batch)
+    with open(schema_path(path_base), 'w', encoding='utf-8') as handle:
+        json.dump({name: list(spec) for name, spec in columns}, handle, indent=2)
+    return path, count
@@ -0,0 +1,168 @@
+"""
+Supply forecasts for buyers.
+
+``compute_forecast`` runs as a periodic batch (``manage.py
+compute_supply_forecast``) and stores one SupplyForecast row per commodity,
+region (the supplying farm's nearest town) and week for the next few weeks:
+
+* scheduled supply: expected quantities of open HarvestSchedules, bucketed
+  by ready-for-pickup week;
+* supply: the same quantities scaled by each farm's historical
+  actual/expected ratio, shrunk towards the platform-wide ratio for farms
+  with few completed harvests;
+* demand: the average weekly quantity ordered from that region over a
+  lookback window, projected flat over the horizon.
+
+The aggregation is done on NumPy arrays in a handful of queries; the API and
+dashboard only read the stored rows.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .catalog import commodity_key_for
+from .models import HarvestSchedule, OrderItem, SupplyForecast
+from .planner import OPEN_STATUSES
+from .shipping import UNIT_WEIGHTS_KG
+
+HORIZON_WEEKS = 6
+DEMAND_WEEKS = 12
+PRIOR_HARVESTS = 3          # completed harvests a farm needs before its own ratio outweighs the platform's
+RATIO_LIMITS = (0.2, 1.5)
+DEMAND_STATUSES_EXCLUDED = ['draft', 'cancelled']
+
+_CENTS = Decimal('0.01')
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _kg(value):
+    return Decimal(str(round(float(value), 2))).quantize(_CENTS)
+
+
+def yield_ratios():
+    """({farm id: adjusted actual/expected ratio}, platform-wide ratio) from completed harvests."""
+    rows = np.array(HarvestSchedule.objects
+                    .filter(actual_quantity_kg__isnull=False, expected_quantity_kg__gt=0)
+                    .values_list('farm_id', 'expected_quantity_kg', 'actual_quantity_kg'), dtype=float)
+    if not len(rows):
+        return {}, 1.0
+    farms, index = np.unique(rows[:, 0].astype(int), return_inverse=True)
+    expected = np.bincount(index, weights=rows[:, 1])
+    actual = np.bincount(index, weights=rows[:, 2])
+    counts = np.bincount(index)
+    platform = float(np.clip(actual.sum() / expected.sum(), *RATIO_LIMITS))
+    ratios = np.clip((counts * actual / expected + PRIOR_HARVESTS * platform) / (counts + PRIOR_HARVESTS),
+                     *RATIO_LIMITS)
+    return dict(zip(farms.tolist(), ratios.tolist())), platform
+
+
+def compute_forecast(today=None, horizon_weeks=HORIZON_WEEKS, demand_weeks=DEMAND_WEEKS):
+    """Recompute every SupplyForecast row; returns the number of rows stored."""
+    first_week = week_start(today or timezone.localdate())
+    end = first_week + timedelta(weeks=horizon_weeks)
+    ratios, platform = yield_ratios()
+
+    harvests = list(HarvestSchedule.objects
+                    .filter(ready_for_pickup_date__gte=first_week, ready_for_pickup_date__lt=end,
+                            status__in=OPEN_STATUSES, farm__is_active=True)
+                    .exclude(commodity_key='')
+                    .values_list('commodity_key', 'farm__nearest_town', 'farm_id',
+                                 'ready_for_pickup_date', 'expected_quantity_kg'))
+    since = timezone.now() - timedelta(weeks=demand_weeks)
+    orders = list(OrderItem.objects
+                  .filter(order__created_at__gte=since)
+                  .exclude(order__status__in=DEMAND_STATUSES_EXCLUDED)
+                  .exclude(product__commodity_key='')
+                  .values_list('product__commodity_key', 'product__farm__nearest_town', 'product__unit')
+                  .annotate(quantity=Sum('quantity'))
+                  .order_by())
+
+    keys = {}
+    for commodity, town, *_ in harvests + orders:
+        keys.setdefault((commodity, town.strip() or 'Unknown'), len(keys))
+    if not keys:
+        with transaction.atomic():
+            SupplyForecast.objects.all().delete()
+        return 0
+
+    scheduled = np.zeros((len(keys), horizon_weeks))
+    supply = np.zeros_like(scheduled)
+    farm_count = np.zeros_like(scheduled, dtype=int)
+    if harvests:
+        key_index = np.array([keys[(c, t.strip() or 'Unknown')] for c, t, *_ in harvests])
+        week_index = np.array([(day - first_week).days // 7 for *_, day, _ in harvests])
+        quantity = np.array([float(q) for *_, q in harvests])
+        ratio = np.array([ratios.get(farm, platform) for _, _, farm, _, _ in harvests])
+        np.add.at(scheduled, (key_index, week_index), quantity)
+        np.add.at(supply, (key_index, week_index), quantity * ratio)
+        farms = np.unique(np.column_stack([key_index, week_index, [h[2] for h in harvests]]), axis=0)
+        np.add.at(farm_count, (farms[:, 0], farms[:, 1]), 1)
+
+    weekly_demand = np.zeros(len(keys))
+    if orders:
+        key_index = np.array([keys[(c, t.strip() or 'Unknown')] for c, t, _, _ in orders])
+        kg = np.array([float(q) * UNIT_WEIGHTS_KG.get(unit, 1) for _, _, unit, q in orders])
+        np.add.at(weekly_demand, key_index, kg / demand_weeks)
+
+    rows = []
+    for (commodity, region), i in keys.items():
+        for week in range(horizon_weeks):
+            rows.append(SupplyForecast(
+                commodity_key=commodity,
+                region=region,
+                week_start=first_week + timedelta(weeks=week),
+                scheduled_kg=_kg(scheduled[i, week]),
+                supply_kg=_kg(supply[i, week]),
+                demand_kg=_kg(weekly_demand[i]),
+                farm_count=farm_count[i, week],
+            ))
+
+    with transaction.atomic():
+        SupplyForecast.objects.all().delete()
+        SupplyForecast.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def forecast_curves(product=None, region=None):
+    """Stored forecast as {commodity, weeks, regions: [{region, curve}]}, optionally for one product/region."""
+    forecasts = SupplyForecast.objects.all()
+    commodity = commodity_key_for(product) if product else None
+    if commodity:
+        forecasts = forecasts.filter(commodity_key=commodity)
+    if region:
+        forecasts = forecasts.filter(region__iexact=region)
+
+    curves = {}
+    for forecast in forecasts.order_by('commodity_key', 'region', 'week_start'):
+        curves.setdefault((forecast.commodity_key, forecast.region), []).append({
+            'week_start': forecast.week_start,
+            'scheduled_kg': forecast.scheduled_kg,
+            'supply_kg': forecast.supply_kg,
+            'demand_kg': forecast.demand_kg,
+            'balance_kg': forecast.balance_kg,
+            'farm_count': forecast.farm_count,
+        })
+    return {
+        'commodity': commodity,
+        'weeks': sorted({point['week_start'] for curve in curves.values() for point in curve}),
+        'regions': [{'commodity': key[0], 'region': key[1], 'curve': curve} for key, curve in curves.items()],
+    }
+
+
+def supply_outlook(weeks=2):
+    """Per-commodity supply and demand totals over the next ``weeks`` forecast weeks, largest supply first."""
+    start = week_start(timezone.localdate())
+    return list(SupplyForecast.objects
+                .filter(week_start__gte=start, week_start__lt=start + timedelta(weeks=weeks))
+                .values('commodity_key')
+                .annotate(scheduled=Sum('scheduled_kg'), supply=Sum('supply_kg'), demand=Sum('demand_kg'),
+                          balance=Sum('supply_kg') - Sum('demand_kg'))
+                .order_by('-supply'))
@@ -0,0 +1,38 @@
+"""
+Small geographic helpers shared by pricing and logistics.
+"""
+
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# Approximate coordinates of the markets in MarketPriceIndex.MARKETS.
+MARKET_LOCATIONS = {
+    'nairobi_wakulima': (-1.2833, 36.8333),
+    'nairobi_kangemi': (-1.2667, 36.7500),
+    'mombasa_kongowea': (-4.0300, 39.6800),
+    'kisumu_kibuye': (-0.0917, 34.7680),
+    'nakuru_central': (-0.2833, 36.0667),
+}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between two (lat, lon) points."""
+    lat1, lon1, lat2, lon2 = map(radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+def distances_km(lat, lon, lats, lons):
+    """Vectorised haversine from one point (or an array of points) to arrays of points."""
+    lat, lon, lats, lons = (np.radians(np.asarray(v, dtype=float)) for v in (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def markets_by_distance(latitude, longitude, markets=None):
+    """[(distance km, market key)] nearest first, over ``markets`` or all known markets."""
+    keys = MARKET_LOCATIONS if markets is None else [m for m in markets if m in MARKET_LOCATIONS]
+    return sorted((haversine_km(latitude, longitude, *MARKET_LOCATIONS[key]), key) for key in keys)
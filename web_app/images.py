@@ -0,0 +1,160 @@
+"""
+Resized renditions of uploaded photos.
+
+When a model in ``IMAGE_FIELDS`` is saved with a new photo, an
+``images.render`` job (run by the ``run_jobs`` worker pool) writes WebP and
+JPEG renditions of it in each ``RENDITIONS`` size under
+``renditions/<original path>/`` and re-saves the original without its EXIF
+block (phone photos carry GPS coordinates and device details). Uploads are
+content-addressed (see web_app.storage), so the clean copy becomes a new
+blob, the fields pointing at the original are moved to it, and the original
+blob is deleted straight away rather than left for ``gc_media``.
+
+Templates use the ``rendition`` filter (``{% load renditions %}``) and the
+JSON API uses ``rendition_urls``; both fall back to the original file until
+its renditions exist.
+"""
+
+import io
+import os
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ColdStorageFacility, Dispute, Farm, Product, Shipment, User, Vehicle
+from .storage import discard, is_content_addressed, media_storage, repoint
+
+# name: (max width, max height); images are scaled down to fit, never up.
+RENDITIONS = {
+    'thumb': (240, 240),
+    'card': (640, 480),
+    'full': (1600, 1600),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+ORIGINAL_JPEG_QUALITY = 95
+
+IMAGE_FIELDS = {
+    User: ['profile_photo'],
+    Farm: ['photo'],
+    Product: ['photo'],
+    Vehicle: ['photo'],
+    Shipment: ['proof_of_delivery_photo'],
+    Dispute: ['evidence_photo'],
+    ColdStorageFacility: ['photo'],
+}
+
+
+def _name(image):
+    return getattr(image, 'name', image) or ''
+
+
+def _ready_key(name):
+    return f'images:ready:{name}'
+
+
+def rendition_name(name, size, fmt='webp'):
+    return f'renditions/{os.path.splitext(name)[0]}/{size}.{fmt}'
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _replace(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, content)
+
+
+def _strip_exif(name):
+    """Re-save the original without EXIF; returns its (possibly new) name."""
+    started = timezone.now()
+    with default_storage.open(name, 'rb') as handle:
+        original = Image.open(handle)
+        source_format = original.format
+        if not original.getexif() and 'exif' not in original.info:
+            return name
+        clean = ImageOps.exif_transpose(original)
+        clean.load()
+    buffer = io.BytesIO()
+    if source_format == 'JPEG':
+        _flatten(clean).save(buffer, 'JPEG', quality=ORIGINAL_JPEG_QUALITY)
+    else:
+        clean.save(buffer, source_format or 'PNG')
+    content = ContentFile(buffer.getvalue())
+    if not is_content_addressed(name):
+        _replace(name, content)
+        return name
+    # Stored blobs are immutable: store the clean copy as a new blob and move every reference to it.
+    clean_name = media_storage().save(name, content)
+    repoint(name, clean_name)
+    discard(name, uploaded_before=started)
+    return clean_name
+
+
+def render(name):
+    """Strip the EXIF data of the stored image ``name`` and write every rendition of it."""
+    name = _strip_exif(name)
+    if renditions_ready(name):
+        return name
+    with default_storage.open(name, 'rb') as handle:
+        original = Image.open(handle)
+        original.draft('RGB', max(RENDITIONS.values()))  # lets JPEG decode at reduced scale
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    for size, box in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        for fmt in FORMATS:
+            _replace(rendition_name(name, size, fmt), _encode(resized, fmt))
+
+    cache.set(_ready_key(name), True, None)
+    return name
+
+
+def renditions_ready(name):
+    ready = cache.get(_ready_key(name))
+    if ready is None:
+        ready = default_storage.exists(rendition_name(name, 'full', 'jpg'))
+        # Re-check missing renditions every minute; present ones never go away.
+        cache.set(_ready_key(name), ready, None if ready else 60)
+    return ready
+
+
+def rendition_url(image, size, fmt='webp'):
+    """URL of ``image``'s ``size`` rendition, or of the original until the rendition exists."""
+    name = _name(image)
+    if not name:
+        return ''
+    if renditions_ready(name):
+        return default_storage.url(rendition_name(name, size, fmt))
+    return default_storage.url(name)
+
+
+def rendition_urls(image):
+    """{'original': url, 'thumb': {'webp': url, 'jpg': url}, ...} for JSON responses, or None."""
+    name = _name(image)
+    if not name:
+        return None
+    urls = {'original': default_storage.url(name)}
+    for size in RENDITIONS:
+        urls[size] = {fmt: rendition_url(name, size, fmt) for fmt in FORMATS}
+    return urls
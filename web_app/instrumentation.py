@@ -0,0 +1,213 @@
+"""
+Per-view latency and query instrumentation.
+
+With ``INSTRUMENTATION_ENABLED`` on, ``InstrumentationMiddleware`` times
+every request, every SQL statement it runs (through
+``connection.execute_wrapper``) and its outermost template render, and adds
+them up per view (the URL name the request resolved to):
+
+* ``GET /metrics`` serves the totals in the Prometheus text format;
+* ``/admin/instrumentation/`` shows the per-view table and the latest
+  requests.
+
+A request that runs the same SQL shape (the statement text, with IN lists
+collapsed) ``INSTRUMENTATION_N_PLUS_ONE_THRESHOLD`` times or more is flagged
+as a likely N+1 and the statement is logged.
+
+When disabled the middleware removes itself (MiddlewareNotUsed) and the
+template hook is never installed, so requests pay nothing.
+
+Numbers are kept per process and are not shared between workers: ``/metrics``
+answers with the totals of whichever worker served the scrape. Under a
+multi-worker server, give each worker its own port and scrape each one as a
+separate target (or run one worker); aggregate in the query, e.g.
+``sum by (view) (rate(agrilogix_view_requests_total[5m]))``. The admin page
+likewise shows only the worker that rendered it.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_current = ContextVar('instrumented_request', default=None)
+_lock = threading.Lock()
+_views = {}
+_recent = deque(maxlen=settings.INSTRUMENTATION_RECENT_REQUESTS)
+_original_render = None
+
+
+class _Request:
+    """What one request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.n_plus_one = 0
+        self.buckets = [0] * len(BUCKETS)
+
+
+def _execute(execute, sql, params, many, context):
+    state = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if state is not None:
+            state.queries += 1
+            state.db_time += time.perf_counter() - start
+            state.shapes[_IN_LIST.sub('IN (...)', sql)] += 1
+
+
+def _timed_render(self, context):
+    state = _current.get()
+    if state is None:
+        return _original_render(self, context)
+    # {% include %} renders nested templates; only the outermost render is counted.
+    state.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        state.template_depth -= 1
+        if not state.template_depth:
+            state.template_time += time.perf_counter() - start
+
+
+def install_template_hook():
+    global _original_render
+    if _original_render is None:
+        _original_render = template_base.Template.render
+        template_base.Template.render = _timed_render
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_hook()
+
+    def __call__(self, request):
+        state = _Request()
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else '') or 'unresolved'
+        record(view, request.method, response.status_code, time.perf_counter() - start, state)
+        return response
+
+
+def record(view, method, status, wall_time, state):
+    worst_shape, repeats = max(state.shapes.items(), key=lambda item: item[1], default=('', 0))
+    n_plus_one = repeats >= settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+    if n_plus_one:
+        logger.warning('Possible N+1 in %s: the same query ran %d times: %s', view, repeats, worst_shape[:300])
+    with _lock:
+        stats = _views.setdefault(view, ViewStats())
+        stats.requests += 1
+        stats.errors += status >= 500
+        stats.wall_time += wall_time
+        stats.max_wall_time = max(stats.max_wall_time, wall_time)
+        stats.queries += state.queries
+        stats.db_time += state.db_time
+        stats.template_time += state.template_time
+        stats.n_plus_one += n_plus_one
+        for i, bound in enumerate(BUCKETS):
+            if wall_time <= bound:
+                stats.buckets[i] += 1  # cumulative, as the exposition format wants
+        _recent.append({
+            'at': timezone.now(), 'view': view, 'method': method, 'status': status,
+            'wall_ms': wall_time * 1000, 'queries': state.queries, 'db_ms': state.db_time * 1000,
+            'template_ms': state.template_time * 1000,
+            'repeated_query': worst_shape if n_plus_one else '', 'repeats': repeats if n_plus_one else 0,
+        })
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _recent.clear()
+
+
+def snapshot():
+    """(per-view rows slowest first by total time, latest requests newest first) for the admin page."""
+    with _lock:
+        rows = [{
+            'view': view, 'requests': s.requests, 'errors': s.errors,
+            'avg_ms': s.wall_time / s.requests * 1000, 'max_ms': s.max_wall_time * 1000,
+            'avg_queries': s.queries / s.requests, 'avg_db_ms': s.db_time / s.requests * 1000,
+            'avg_template_ms': s.template_time / s.requests * 1000, 'n_plus_one': s.n_plus_one,
+            'total_s': s.wall_time,
+        } for view, s in _views.items()]
+        recent = list(reversed(_recent))
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True), recent
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus():
+    """Every view's totals in the Prometheus text exposition format."""
+    with _lock:
+        views = [(_label(view), dict(vars(s), buckets=list(s.buckets))) for view, s in sorted(_views.items())]
+    counters = [
+        ('agrilogix_view_requests_total', 'requests', 'Requests handled.'),
+        ('agrilogix_view_errors_total', 'errors', 'Requests answered with a 5xx status.'),
+        ('agrilogix_view_db_queries_total', 'queries', 'SQL statements executed.'),
+        ('agrilogix_view_db_seconds_total', 'db_time', 'Time spent in SQL statements.'),
+        ('agrilogix_view_template_seconds_total', 'template_time', 'Time spent rendering templates.'),
+        ('agrilogix_view_n_plus_one_total', 'n_plus_one', 'Requests flagged as likely N+1 query patterns.'),
+    ]
+    lines = []
+    for name, field, help_text in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{view="{view}"}} {stats[field]}' for view, stats in views]
+
+    name = 'agrilogix_view_duration_seconds'
+    lines += [f'# HELP {name} Wall time per request.', f'# TYPE {name} histogram']
+    for view, stats in views:
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+        lines += [
+            f'{name}_bucket{{view="{view}",le="+Inf"}} {stats["requests"]}',
+            f'{name}_sum{{view="{view}"}} {stats["wall_time"]}',
+            f'{name}_count{{view="{view}"}} {stats["requests"]}',
+        ]
+    return '\n'.join(lines) + '\n'
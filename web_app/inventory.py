@@ -0,0 +1,107 @@
+"""
+Listing lifecycle sweeps.
+
+``sweep`` (``manage.py sweep_products``, safe to run every minute) moves
+listings through their lifecycle with set-based UPDATEs instead of per-row
+saves:
+
+* available listings past ``expiry_date`` become ``expired``;
+* available listings with nothing left become ``sold``;
+* available listings expiring within ``NEAR_EXPIRY_DAYS`` are flagged
+  ``near_expiry`` so farmers can discount them (and unflagged if the date
+  moves out again).
+
+Candidates are found through partial indexes on available/flagged rows, so
+an idle sweep costs a few index probes however large the table is. Work is
+done in primary-key batches, each UPDATE re-checking its condition, and
+owners get one summary notification per sweep. Overlapping runs are kept
+out by a database lease, so it holds across hosts.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import acquire_lease, release_lease
+from .models import Notification, Product
+from .notifications import deliver
+
+NEAR_EXPIRY_DAYS = 2
+BATCH_SIZE = 5000
+MAX_BATCHES = 50            # per transition per run; the next run picks up the rest
+LEASE_NAME = 'inventory:sweep'
+LEASE_SECONDS = 55
+
+
+def _transition(candidates, changes):
+    """
+    Apply ``changes`` to ``candidates`` one pk batch at a time.
+
+    Returns a Counter of updated listings per owner id.
+    """
+    owners = Counter()
+    last_pk = 0
+    for _ in range(MAX_BATCHES):
+        batch = list(candidates.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1]
+        with transaction.atomic():
+            # Rows changed since the paging SELECT no longer match and are left alone. The rows
+            # that still match are locked, so they are exactly the rows the UPDATE changes.
+            rows = list(candidates.filter(pk__in=batch).select_for_update(of=('self',))
+                        .values_list('pk', 'farm__owner_id'))
+            Product.objects.filter(pk__in=[pk for pk, _ in rows]).update(**changes, updated_at=timezone.now())
+        owners.update(owner_id for _, owner_id in rows)
+        if len(batch) < BATCH_SIZE:
+            break
+    return owners
+
+
+def _notify(expired, sold, near_expiry):
+    notifications = []
+    for owner_id in set(expired) | set(sold) | set(near_expiry):
+        parts = []
+        if expired[owner_id]:
+            parts.append(f'{expired[owner_id]} listing(s) passed their expiry date and were unlisted')
+        if sold[owner_id]:
+            parts.append(f'{sold[owner_id]} listing(s) sold out')
+        if near_expiry[owner_id]:
+            parts.append(f'{near_expiry[owner_id]} listing(s) expire within {NEAR_EXPIRY_DAYS} days — '
+                         f'consider discounting them')
+        notifications.append(Notification(
+            user_id=owner_id, notification_type='system',
+            title='📦 Listing updates', message='; '.join(parts) + '.',
+        ))
+    deliver(notifications)
+    return len(notifications)
+
+
+def sweep(today=None):
+    """Run every listing transition once; returns counts, or None if another sweep holds the lease."""
+    holder = acquire_lease(LEASE_NAME, LEASE_SECONDS)
+    if holder is None:
+        return None
+    try:
+        today = today or timezone.localdate()
+        horizon = today + timedelta(days=NEAR_EXPIRY_DAYS)
+        available = Product.objects.filter(status='available')
+
+        expired = _transition(available.filter(expiry_date__lt=today), {'status': 'expired', 'near_expiry': False})
+        sold = _transition(available.filter(quantity_available__lte=0), {'status': 'sold', 'near_expiry': False})
+        flagged = _transition(available.filter(expiry_date__gte=today, expiry_date__lte=horizon, near_expiry=False),
+                              {'near_expiry': True})
+        cleared = _transition(Product.objects.filter(near_expiry=True).exclude(
+            status='available', expiry_date__gte=today, expiry_date__lte=horizon), {'near_expiry': False})
+
+        return {
+            'expired': sum(expired.values()),
+            'sold': sum(sold.values()),
+            'near_expiry': sum(flagged.values()),
+            'cleared': sum(cleared.values()),
+            'notified': _notify(expired, sold, flagged),
+        }
+    finally:
+        release_lease(LEASE_NAME, holder)
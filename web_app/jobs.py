@@ -0,0 +1,183 @@
+"""
+Lightweight persistent job queue backed by the BackgroundJob table.
+
+Views and signals call ``enqueue`` (or ``enqueue_on_commit``) instead of doing
+side work inline; the ``run_jobs`` management command claims due jobs and runs
+them on a thread pool. No external broker is needed: claiming is a
+conditional UPDATE, so several workers can share the table safely.
+"""
+
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BackgroundJob, Lease
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register a function as a job handler under ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name, payload=None, key=None, delay=None, max_attempts=5):
+    """
+    Queue ``task_name`` with a JSON payload and return the job.
+
+    ``key`` makes the call idempotent: a second enqueue with the same key
+    returns the existing job instead of queueing the work twice.
+    """
+    if task_name not in _registry:
+        raise KeyError(f'Unknown job task "{task_name}"')
+
+    fields = {
+        'task': task_name,
+        'payload': payload or {},
+        'max_attempts': max_attempts,
+        'run_after': timezone.now() + (delay or timedelta(0)),
+    }
+    if key is None:
+        job = BackgroundJob.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job, created = BackgroundJob.objects.get_or_create(idempotency_key=key, defaults=fields)
+        except IntegrityError:
+            job, created = BackgroundJob.objects.get(idempotency_key=key), False
+        if not created:
+            return job
+
+    if settings.JOB_QUEUE_EAGER and not delay:
+        BackgroundJob.objects.filter(pk=job.pk).update(status='running', attempts=F('attempts') + 1)
+        job.refresh_from_db()
+        run_job(job)
+    return job
+
+
+def enqueue_on_commit(task_name, payload=None, key=None, delay=None, max_attempts=5):
+    """Queue the job once the surrounding transaction commits."""
+    transaction.on_commit(lambda: enqueue(task_name, payload, key=key, delay=delay, max_attempts=max_attempts))
+
+
+def enqueue_debounced(task_name, payload, key, window=60, grace=0):
+    """
+    Queue at most one ``task_name`` per ``key`` per ``window`` seconds.
+
+    The job runs when the window closes (plus ``grace`` seconds), so every
+    change made during the window is picked up by that single run.
+    """
+    if settings.JOB_QUEUE_EAGER:
+        enqueue_on_commit(task_name, payload)
+        return
+    # The window is picked at commit: a transaction that outlives its window must not
+    # fold into a run that has already started without seeing its changes.
+    transaction.on_commit(lambda: _enqueue_in_window(task_name, payload, key, window, grace))
+
+
+def _enqueue_in_window(task_name, payload, key, window, grace=0):
+    now = time.time()
+    bucket = int(now // window)
+    job = enqueue(task_name, payload, key=f'{key}:{bucket}',
+                  delay=timedelta(seconds=(bucket + 1) * window - now + grace))
+    if job.status != 'queued':
+        # Already claimed (a worker clock running ahead); the next window's run picks the change up.
+        enqueue(task_name, payload, key=f'{key}:{bucket + 1}',
+                delay=timedelta(seconds=(bucket + 2) * window - now + grace))
+
+
+def backoff_delay(attempts):
+    base = settings.JOB_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    delay = min(base, settings.JOB_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay + random.uniform(0, delay / 10))
+
+
+def release_stale_jobs():
+    """Requeue jobs whose worker died while running them; returns how many were requeued."""
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status='running', locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS))
+    # claim_jobs counted the crashed run, so a job that keeps killing its worker runs out of attempts.
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now,
+        last_error='Worker died while running the job',
+    )
+    if failed:
+        logger.error('%d job(s) failed permanently: their workers died on every attempt', failed)
+    return stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def claim_jobs(worker_id, limit):
+    """Atomically take up to ``limit`` due jobs for ``worker_id``."""
+    now = timezone.now()
+    candidate_ids = list(
+        BackgroundJob.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidate_ids:
+        taken = BackgroundJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if taken:
+            claimed.append(job_id)
+    return claimed
+
+
+def acquire_lease(name, seconds):
+    """
+    Take the lease ``name`` for ``seconds``; returns a holder token, or None while someone else holds it.
+
+    Like ``claim_jobs`` this is a conditional UPDATE, so it excludes other processes and hosts too.
+    """
+    now = timezone.now()
+    Lease.objects.bulk_create([Lease(name=name, expires_at=now)], ignore_conflicts=True)
+    holder = uuid.uuid4().hex
+    taken = Lease.objects.filter(name=name, expires_at__lte=now).update(
+        holder=holder, expires_at=now + timedelta(seconds=seconds))
+    return holder if taken else None
+
+
+def release_lease(name, holder):
+    """Give the lease back early, if ``holder`` still has it."""
+    Lease.objects.filter(name=name, holder=holder).update(expires_at=timezone.now())
+
+
+def run_job(job):
+    """Run a claimed job and record success, retry or failure."""
+    handler = _registry.get(job.task)
+    try:
+        if handler is None:
+            raise KeyError(f'No handler registered for "{job.task}"')
+        handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('Job %s (%s) failed permanently', job.pk, job.task)
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + backoff_delay(job.attempts)
+            logger.warning('Job %s (%s) failed, retrying at %s', job.pk, job.task, job.run_after)
+    else:
+        job.status = 'succeeded'
+        job.last_error = ''
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'last_error', 'run_after', 'finished_at', 'locked_by', 'locked_at'])
+    return job
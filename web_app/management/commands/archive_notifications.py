@@ -0,0 +1,21 @@
+# management/commands/archive_notifications.py
+# Run nightly (e.g. cron: 30 3 * * * python manage.py archive_notifications)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web_app.notifications import BATCH_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = 'Move read notifications older than NOTIFICATION_ARCHIVE_DAYS into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_ARCHIVE_DAYS,
+                            help='Archive read notifications older than this many days')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows moved per transaction')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING(f'🗄️ Archiving read notifications older than {options["days"]} days...'))
+        moved = archive(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {moved} notification(s) archived.'))
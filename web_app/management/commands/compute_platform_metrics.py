@@ -0,0 +1,33 @@
+# management/commands/compute_platform_metrics.py
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from web_app.metrics import backfill, earliest_activity_date
+
+
+class Command(BaseCommand):
+    help = 'Recompute PlatformMetric rows from Orders, Shipments and temperature alerts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help='First day to compute (YYYY-MM-DD); defaults to the first order')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to compute; defaults to today')
+        parser.add_argument('--days', type=int, help='Only recompute the last N days')
+        parser.add_argument('--chunk-days', type=int, default=90, help='Days aggregated per query batch')
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        if options['days']:
+            start = end - timedelta(days=options['days'] - 1)
+        else:
+            start = options['start'] or earliest_activity_date()
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        self.stdout.write(self.style.WARNING(f'📊 Computing platform metrics {start} → {end}...'))
+        for chunk_start, chunk_end in backfill(start, end, chunk_days=options['chunk_days']):
+            self.stdout.write(f'  {chunk_start} → {chunk_end}')
+        self.stdout.write(self.style.SUCCESS('✅ Platform metrics up to date.'))
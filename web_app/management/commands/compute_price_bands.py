@@ -0,0 +1,19 @@
+# management/commands/compute_price_bands.py
+# Run nightly (e.g. cron: 15 2 * * * python manage.py compute_price_bands)
+
+from django.core.management.base import BaseCommand
+
+from web_app.pricing import WINDOW_DAYS, compute_bands
+
+
+class Command(BaseCommand):
+    help = 'Precompute fair-price bands per commodity and market region for the listing form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=WINDOW_DAYS,
+                            help='Days of market prices (ending at the latest price) per band')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('💰 Computing price bands...'))
+        count = compute_bands(window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} price bands stored.'))
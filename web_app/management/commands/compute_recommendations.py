@@ -0,0 +1,18 @@
+# management/commands/compute_recommendations.py
+# Run nightly (e.g. cron: 45 2 * * * python manage.py compute_recommendations)
+
+from django.core.management.base import BaseCommand
+
+from web_app.recommendations import TOP_N, build
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stored product recommendations for every buyer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_N, help='Products stored per buyer')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🛒 Building buyer recommendations...'))
+        count = build(top_n=options['top'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Recommendations stored for {count} buyers.'))
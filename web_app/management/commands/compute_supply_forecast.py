@@ -0,0 +1,20 @@
+# management/commands/compute_supply_forecast.py
+# Run daily (e.g. cron: 30 2 * * * python manage.py compute_supply_forecast)
+
+from django.core.management.base import BaseCommand
+
+from web_app.forecasting import DEMAND_WEEKS, HORIZON_WEEKS, compute_forecast
+
+
+class Command(BaseCommand):
+    help = 'Precompute weekly supply/demand forecasts per commodity and region'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=HORIZON_WEEKS, help='Forecast horizon in weeks')
+        parser.add_argument('--demand-weeks', type=int, default=DEMAND_WEEKS,
+                            help='Weeks of order history used for demand')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🔮 Computing supply forecasts...'))
+        count = compute_forecast(horizon_weeks=options['weeks'], demand_weeks=options['demand_weeks'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} forecast rows stored.'))
@@ -0,0 +1,37 @@
+# management/commands/export_analytics.py
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from web_app.exports import DEFAULT_CHUNK_SIZE, EXPORT_TABLES, export_queryset, parquet_available
+
+
+class Command(BaseCommand):
+    help = 'Export analytics tables to compressed columnar files (Parquet, or gzip CSV without pyarrow)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='*', help=f'Tables to export: {", ".join(EXPORT_TABLES)} (default: all)')
+        parser.add_argument('--format', choices=['auto', 'parquet', 'csv'], default='auto')
+        parser.add_argument('--output-dir', default='exports')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows fetched from the database and written per batch')
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(EXPORT_TABLES)
+        unknown = set(tables) - set(EXPORT_TABLES)
+        if unknown:
+            raise CommandError(f'Unknown table(s): {", ".join(sorted(unknown))}')
+        if options['format'] == 'parquet' and not parquet_available():
+            raise CommandError('pyarrow is not installed; use --format csv')
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        stamp = timezone.localdate().strftime('%Y%m%d')
+        self.stdout.write(self.style.WARNING(f'📦 Exporting {len(tables)} table(s) to {options["output_dir"]}/...'))
+        for table in tables:
+            path_base = os.path.join(options['output_dir'], f'{table}-{stamp}')
+            path, count = export_queryset(EXPORT_TABLES[table].objects.all(), path_base,
+                                          fmt=options['format'], chunk_size=options['chunk_size'])
+            self.stdout.write(f'  {table}: {count} rows → {path}')
+        self.stdout.write(self.style.SUCCESS('✅ Export complete.'))
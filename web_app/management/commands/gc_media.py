@@ -0,0 +1,36 @@
+# management/commands/gc_media.py
+# Run daily (e.g. cron: 0 4 * * * python manage.py gc_media)
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from web_app.images import IMAGE_FIELDS
+from web_app.storage import GC_GRACE, collect_garbage, rebuild_references
+from web_app.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete stored uploads (and their renditions) that no model field references any more, and expired upload sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=GC_GRACE.total_seconds() / 3600,
+                            help='Keep unreferenced blobs uploaded more recently than this')
+        parser.add_argument('--rebuild-references', action='store_true',
+                            help='Recreate the reference table from the model rows first')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            self.stdout.write(self.style.WARNING('⏳ Closing expired upload sessions...'))
+            self.stdout.write(self.style.SUCCESS(f'✅ {purge_expired()} session(s) closed.'))
+
+        if options['rebuild_references']:
+            self.stdout.write(self.style.WARNING('🔗 Rebuilding media references...'))
+            count = rebuild_references(IMAGE_FIELDS)
+            self.stdout.write(self.style.SUCCESS(f'✅ {count} references recorded.'))
+
+        self.stdout.write(self.style.WARNING('🗑️ Collecting unreferenced media...'))
+        count, freed = collect_garbage(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        verb = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} blob(s) {verb}, {freed / 1024 / 1024:.1f} MB.'))
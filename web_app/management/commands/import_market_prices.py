@@ -0,0 +1,32 @@
+# management/commands/import_market_prices.py
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web_app.price_import import DEFAULT_BATCH_SIZE, BulletinError, import_prices
+
+
+class Command(BaseCommand):
+    help = 'Import market price bulletins (CSV or XLSX) into the Market Price Index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Bulletin files with market, product, price and date columns')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows upserted per statement')
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            self.stdout.write(self.style.WARNING(f'📥 Importing {path}...'))
+            started = time.monotonic()
+            try:
+                with open(path, 'rb') as handle:
+                    result = import_prices(handle, os.path.basename(path), batch_size=options['batch_size'])
+            except (OSError, BulletinError) as exc:
+                raise CommandError(f'{path}: {exc}')
+            for error in result['errors']:
+                self.stdout.write(self.style.ERROR(f'  {error}'))
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {result["upserted"]} prices upserted, {result["rejected"]} rejected '
+                f'({result["rows"]} rows in {time.monotonic() - started:.1f}s).'
+            ))
@@ -0,0 +1,27 @@
+# management/commands/plan_pickups.py
+# Safe to run repeatedly (e.g. hourly); only changed harvest groups are rewritten.
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from web_app.planner import plan
+
+
+class Command(BaseCommand):
+    help = 'Propose consolidated pickups and cold storage for upcoming harvests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First pickup day (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--days', type=int, default=14, help='Number of days to plan ahead')
+
+    def handle(self, *args, **options):
+        start = options['start'] or timezone.localdate()
+        end = start + timedelta(days=options['days'] - 1)
+        self.stdout.write(self.style.WARNING(f'🗓️ Planning pickups {start} → {end}...'))
+        result = plan(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["groups"]} pickup groups: {result["created"]} new, {result["updated"]} updated, '
+            f'{result["unchanged"]} unchanged, {result["removed"]} removed, {result["flagged"]} flagged for review.'
+        ))
@@ -0,0 +1,18 @@
+# management/commands/reconcile_unread_counts.py
+# Run hourly (e.g. cron: 15 * * * * python manage.py reconcile_unread_counts)
+
+from django.core.management.base import BaseCommand
+
+from web_app.notifications import BATCH_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the unread notification counters from the notifications table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Users recounted per transaction')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🔔 Reconciling unread notification counters...'))
+        users = reconcile(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Counters rewritten; {users} user(s) have unread notifications.'))
@@ -0,0 +1,18 @@
+# management/commands/refresh_analytics_summaries.py
+
+from django.core.management.base import BaseCommand
+
+from web_app.models import LossSummary, MarketCoverage
+from web_app.summaries import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized loss and market coverage summaries from scratch'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('📊 Rebuilding analytics summaries...'))
+        rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {LossSummary.objects.count()} loss summaries, '
+            f'{MarketCoverage.objects.count()} market coverage rows.'
+        ))
@@ -0,0 +1,35 @@
+# management/commands/render_images.py
+# Backfill renditions for photos uploaded before the image pipeline existed.
+
+from django.core.management.base import BaseCommand
+
+from web_app.images import IMAGE_FIELDS, render, renditions_ready
+from web_app.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Queue (or run) rendition jobs for every stored photo that has none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--now', action='store_true', help='Render inline instead of queueing jobs')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🖼️ Looking for photos without renditions...'))
+        count = 0
+        for model, fields in IMAGE_FIELDS.items():
+            for field in fields:
+                names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                for name in names.values_list(field, flat=True).distinct().iterator():
+                    if renditions_ready(name):
+                        continue
+                    if options['now']:
+                        try:
+                            render(name)
+                        except (OSError, ValueError) as exc:
+                            self.stdout.write(self.style.ERROR(f'❌ {name}: {exc}'))
+                            continue
+                    else:
+                        enqueue('images.render', {'name': name}, key=f'images:{name}')
+                    count += 1
+        verb = 'rendered' if options['now'] else 'queued'
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} photo(s) {verb}.'))
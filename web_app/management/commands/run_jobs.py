@@ -0,0 +1,67 @@
+# management/commands/run_jobs.py
+
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from web_app.jobs import claim_jobs, release_stale_jobs, run_job
+from web_app.models import BackgroundJob
+
+
+def _run_in_thread(job_id):
+    try:
+        job = BackgroundJob.objects.get(pk=job_id)
+        run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (notifications, alerts, metric refreshes) on a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the jobs that are currently due, then exit')
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(self.style.WARNING(f'⚙️ Job worker {worker_id} started with {workers} threads'))
+        processed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as pool:
+            while not self.stopping:
+                close_old_connections()
+                release_stale_jobs()
+                free = workers - len(running)
+                claimed = claim_jobs(worker_id, free) if free else []
+                for job_id in claimed:
+                    running.add(pool.submit(_run_in_thread, job_id))
+
+                if running:
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    processed += len(done)
+                    running = set(running)
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+            wait(running)
+            processed += len(running)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Job worker stopped after {processed} jobs'))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
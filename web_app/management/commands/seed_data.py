@@ -5,6 +5,7 @@ from datetime import date, timedelta, datetime
 from decimal import Decimal
 from django.core.management.base import BaseCommand
 from django.contrib.auth.hashers import make_password
+from web_app.metrics import backfill
 from web_app.models import (
     User, Notification,
     Farm, FarmerProfile, HarvestSchedule,
@@ -996,29 +997,11 @@ class Command(BaseCommand):
     # PLATFORM METRICS
     # ----------------------------------------------------------
     def create_platform_metrics(self):
-        self.stdout.write('📊 Creating platform metrics...')
+        self.stdout.write('📊 Computing platform metrics from seeded activity...')
 
-        base_date = date.today() - timedelta(days=30)
-        for i in range(30):
-            day = base_date + timedelta(days=i)
-            PlatformMetric.objects.get_or_create(
-                date=day,
-                defaults={
-                    'total_orders': random.randint(15, 45),
-                    'completed_orders': random.randint(10, 38),
-                    'total_gmv': Decimal(str(random.randint(180000, 850000))),
-                    'total_farmer_earnings': Decimal(str(random.randint(140000, 700000))),
-                    'total_middleman_savings': Decimal(str(random.randint(40000, 180000))),
-                    'active_farmers': random.randint(12, 28),
-                    'active_buyers': random.randint(8, 20),
-                    'active_drivers': random.randint(4, 10),
-                    'shipments_completed': random.randint(8, 30),
-                    'kg_transported': Decimal(str(random.randint(5000, 25000))),
-                    'cold_chain_trips': random.randint(2, 10),
-                    'spoilage_prevented_kg': Decimal(str(random.randint(200, 1500))),
-                    'temperature_alerts_sent': random.randint(0, 5),
-                }
-            )
+        today = date.today()
+        for chunk_start, chunk_end in backfill(today - timedelta(days=30), today):
+            self.stdout.write(f'  Metrics computed for {chunk_start} – {chunk_end}')
 
     # ----------------------------------------------------------
     # MARKET PRICE INDEX
@@ -0,0 +1,20 @@
+# management/commands/sweep_products.py
+# Safe to run every minute (e.g. cron: * * * * * python manage.py sweep_products)
+
+from django.core.management.base import BaseCommand
+
+from web_app.inventory import sweep
+
+
+class Command(BaseCommand):
+    help = 'Expire, sell out and flag near-expiry product listings'
+
+    def handle(self, *args, **options):
+        result = sweep()
+        if result is None:
+            self.stdout.write(self.style.WARNING('⏳ Another sweep is still running; skipped.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["expired"]} expired, {result["sold"]} sold out, {result["near_expiry"]} flagged '
+            f'near expiry, {result["cleared"]} unflagged; {result["notified"]} owner(s) notified.'
+        ))
@@ -0,0 +1,126 @@
+"""
+PlatformMetric computation from the live Order, Shipment and cold chain tables.
+
+Every figure is a grouped aggregate over an indexed timestamp, so a whole
+chunk of days costs a handful of queries no matter how many days it spans.
+``refresh_day`` keeps today's row current (it is queued from signals) and
+``backfill`` walks years of history in fixed-size chunks.
+
+total_middleman_savings has no source table yet and is left untouched.
+"""
+
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .jobs import enqueue_debounced
+from .models import Order, PlatformMetric, Shipment, TemperatureExcursion
+
+METRIC_FIELDS = [
+    'total_orders', 'completed_orders', 'total_gmv', 'total_farmer_earnings',
+    'active_farmers', 'active_buyers', 'active_drivers', 'shipments_completed',
+    'kg_transported', 'cold_chain_trips', 'spoilage_prevented_kg', 'temperature_alerts_sent',
+]
+
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.combine(start, dt_time.min), tz),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min), tz))
+
+
+def _grouped(queryset, field, start, end, **aggregates):
+    """{day: {aggregate: value}} for rows whose ``field`` falls in [start, end]."""
+    lower, upper = _day_bounds(start, end)
+    rows = (queryset.filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
+            .annotate(day=TruncDate(field)).values('day').annotate(**aggregates).order_by())
+    return {row.pop('day'): row for row in rows}
+
+
+def _distinct_pairs(queryset, field, start, end, column):
+    """{day: set(ids)} of distinct ``column`` values per day."""
+    lower, upper = _day_bounds(start, end)
+    pairs = (queryset.filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
+             .exclude(**{f'{column}__isnull': True})
+             .annotate(day=TruncDate(field)).values_list('day', column).distinct().order_by())
+    result = {}
+    for day, value in pairs:
+        result.setdefault(day, set()).add(value)
+    return result
+
+
+def compute_range(start, end):
+    """Compute metric values for every day in [start, end] with set-based queries."""
+    created = _grouped(Order.objects.all(), 'created_at', start, end,
+                       total_orders=Count('id'),
+                       active_farmers=Count('farmer', distinct=True),
+                       active_buyers=Count('buyer', distinct=True))
+    completed = _grouped(Order.objects.filter(status='completed'), 'completed_at', start, end,
+                         completed_orders=Count('id'),
+                         total_gmv=Sum('total_amount'),
+                         total_farmer_earnings=Sum(F('subtotal') - F('platform_fee')))
+    delivered = _grouped(Shipment.objects.filter(status='delivered'), 'actual_delivery', start, end,
+                         shipments_completed=Count('id'),
+                         kg_transported=Sum('weight_kg'),
+                         cold_chain_trips=Count('id', filter=Q(vehicle__is_refrigerated=True)),
+                         spoilage_prevented_kg=Sum('weight_kg', filter=Q(vehicle__is_refrigerated=True)))
+    alerts = _grouped(TemperatureExcursion.objects.all(), 'notified_at', start, end,
+                      temperature_alerts_sent=Count('id'))
+    drivers = _distinct_pairs(Shipment.objects.all(), 'actual_pickup', start, end, 'driver')
+    for day, ids in _distinct_pairs(Shipment.objects.all(), 'actual_delivery', start, end, 'driver').items():
+        drivers.setdefault(day, set()).update(ids)
+
+    results = {}
+    day = start
+    while day <= end:
+        values = {}
+        for source in (created, completed, delivered, alerts):
+            values.update(source.get(day, {}))
+        values['active_drivers'] = len(drivers.get(day, ()))
+        results[day] = {name: values.get(name) or 0 for name in METRIC_FIELDS}
+        day += timedelta(days=1)
+    return results
+
+
+def store(results):
+    """Upsert computed days into PlatformMetric in one statement."""
+    PlatformMetric.objects.bulk_create(
+        [PlatformMetric(date=day, **values) for day, values in results.items()],
+        update_conflicts=True, unique_fields=['date'], update_fields=METRIC_FIELDS,
+    )
+
+
+def refresh_day(day):
+    store(compute_range(day, day))
+
+
+def backfill(start, end, chunk_days=90):
+    """Recompute [start, end] in chunks so memory stays bounded; yields each chunk's range."""
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        store(compute_range(chunk_start, chunk_end))
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+def earliest_activity_date():
+    first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    return timezone.localdate(first) if first else timezone.localdate()
+
+
+def schedule_refresh(*moments):
+    """
+    Queue a refresh of the days touched by ``moments`` (datetimes or None).
+
+    Jobs are debounced per day, so a burst of order or shipment updates
+    costs one recomputation.
+    """
+    days = {timezone.localdate()}
+    for moment in moments:
+        if moment is not None:
+            days.add(timezone.localdate(moment) if timezone.is_aware(moment) else moment.date())
+    for day in days:
+        enqueue_debounced('metrics.refresh_day', {'day': day.isoformat()}, key=f'platform-metric:{day.isoformat()}')
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemperatureExcursion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=50)),
+                ('alert_level', models.CharField(choices=[('normal', '🟢 Normal'), ('warning', '🟡 Warning'), ('critical', '🔴 Critical — Spoilage Risk')], default='warning', max_length=10)),
+                ('status', models.CharField(choices=[('open', '🔴 Open'), ('closed', '🟢 Recovered')], default='open', max_length=10)),
+                ('allowed_min_celsius', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('allowed_max_celsius', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('peak_temperature_celsius', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('readings_count', models.PositiveIntegerField(default=1)),
+                ('suppressed_count', models.PositiveIntegerField(default=0)),
+                ('notifications_sent', models.PositiveIntegerField(default=0)),
+                ('opened_at', models.DateTimeField()),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('alert_latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excursions', to='web_app.coldstoragebooking')),
+                ('first_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='web_app.temperaturelog')),
+                ('shipment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excursions', to='web_app.shipment')),
+            ],
+            options={
+                'verbose_name': 'Temperature Excursion',
+                'verbose_name_plural': 'Temperature Excursions',
+                'ordering': ['-opened_at'],
+                'indexes': [models.Index(fields=['sensor_id', 'status'], name='web_app_tem_sensor__761318_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('sensor_id',), name='one_open_excursion_per_sensor')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0003_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='web_app_ord_created_96ab1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['completed_at'], name='web_app_ord_complet_80cc4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['actual_pickup'], name='web_app_shi_actual__e61cff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['actual_delivery'], name='web_app_shi_actual__e88e79_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temperatureexcursion',
+            index=models.Index(fields=['notified_at'], name='web_app_tem_notifie_1c80d8_idx'),
+        ),
+    ]
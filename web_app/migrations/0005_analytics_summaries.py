@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:35
+
+import django.db.models.deletion
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def build_summaries(apps, schema_editor):
+    PostHarvestLossReport = apps.get_model('web_app', 'PostHarvestLossReport')
+    MarketPriceIndex = apps.get_model('web_app', 'MarketPriceIndex')
+    LossSummary = apps.get_model('web_app', 'LossSummary')
+    MarketCoverage = apps.get_model('web_app', 'MarketCoverage')
+
+    loss_groups = (PostHarvestLossReport.objects
+                   .values('farm_id', 'incident_date__year', 'incident_date__month', 'primary_cause')
+                   .annotate(report_count=Count('id'), total_kg_lost=Sum('quantity_lost_kg'),
+                             total_value_lost=Sum('estimated_value_lost'))
+                   .order_by())
+    LossSummary.objects.bulk_create([
+        LossSummary(
+            farm_id=group['farm_id'],
+            month=date(group['incident_date__year'], group['incident_date__month'], 1),
+            primary_cause=group['primary_cause'],
+            report_count=group['report_count'],
+            total_kg_lost=group['total_kg_lost'],
+            total_value_lost=group['total_value_lost'],
+        ) for group in loss_groups
+    ], batch_size=1000)
+
+    coverage = (MarketPriceIndex.objects.values('market', 'product_name')
+                .annotate(price_points=Count('id'), first_recorded=Min('recorded_date'),
+                          last_recorded=Max('recorded_date'))
+                .order_by())
+    MarketCoverage.objects.bulk_create([MarketCoverage(**row) for row in coverage], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0004_platform_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(choices=[('nairobi_wakulima', 'Wakulima Market, Nairobi'), ('nairobi_kangemi', 'Kangemi Market, Nairobi'), ('mombasa_kongowea', 'Kongowea Market, Mombasa'), ('kisumu_kibuye', 'Kibuye Market, Kisumu'), ('nakuru_central', 'Central Market, Nakuru')], max_length=30)),
+                ('product_name', models.CharField(max_length=100)),
+                ('price_points', models.PositiveIntegerField(default=0)),
+                ('first_recorded', models.DateField()),
+                ('last_recorded', models.DateField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Market Coverage',
+                'verbose_name_plural': 'Market Coverage',
+                'ordering': ['market', 'product_name'],
+                'constraints': [models.UniqueConstraint(fields=('market', 'product_name'), name='unique_market_coverage')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LossSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('primary_cause', models.CharField(choices=[('temperature', 'Temperature Abuse'), ('transport_delay', 'Transport Delay'), ('handling', 'Poor Handling'), ('packaging', 'Packaging Failure'), ('road_condition', 'Bad Road Conditions'), ('breakdown', 'Vehicle Breakdown'), ('other', 'Other')], max_length=20)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('total_kg_lost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_value_lost', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loss_summaries', to='web_app.farm')),
+            ],
+            options={
+                'verbose_name': 'Loss Summary',
+                'verbose_name_plural': 'Loss Summaries',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('farm', 'month', 'primary_cause'), name='unique_loss_summary')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of web_app.catalog as it stood when this migration was written, so later
+# edits to the live alias table or slug rules don't change what the backfill does.
+ALIASES = {
+    'apple': ['Apples', 'apple'],
+    'avocado': ['Avocado', 'avocado', 'hass'],
+    'banana': ['Bananas', 'banana', 'matoke', 'cavendish'],
+    'beans': ['Dry Beans', 'beans', 'dry beans', 'rosecoco', 'mwitemania'],
+    'cabbage': ['Cabbage', 'cabbage', 'drumhead'],
+    'carrot': ['Carrots', 'carrot'],
+    'cassava': ['Cassava', 'cassava', 'mihogo'],
+    'coconut': ['Coconut', 'coconut', 'nazi'],
+    'coffee': ['Coffee', 'coffee', 'arabica', 'robusta'],
+    'eggs': ['Eggs', 'egg', 'mayai'],
+    'french_beans': ['French Beans', 'french bean', 'green bean'],
+    'kale': ['Kale (Sukuma Wiki)', 'kale', 'sukuma wiki', 'sukuma', 'collard'],
+    'maize': ['Maize', 'maize', 'corn', 'mahindi', 'wema'],
+    'mango': ['Mango', 'mango', 'apple mango', 'ngowe', 'kent', 'tommy'],
+    'milk': ['Fresh Milk', 'milk', 'maziwa'],
+    'mursik': ['Mursik', 'mursik', 'fermented milk', 'maziwa lala'],
+    'onion': ['Onions', 'onion', 'kitunguu'],
+    'potato': ['Potatoes', 'potato', 'irish potato', 'shangi'],
+    'sorghum': ['Sorghum', 'sorghum', 'mtama'],
+    'spinach': ['Spinach', 'spinach'],
+    'sweet_potato': ['Sweet Potatoes', 'sweet potato', 'viazi vitamu'],
+    'tea': ['Tea', 'tea', 'green leaf'],
+    'tilapia': ['Tilapia', 'tilapia'],
+    'tomato': ['Tomatoes', 'tomato', 'nyanya'],
+    'wheat': ['Wheat', 'wheat', 'wheat grain', 'ega fahari'],
+    'wheat_flour': ['Wheat Flour', 'wheat flour', 'atta'],
+}
+QUALIFIERS = {'organic', 'fresh', 'dry', 'dried', 'fine', 'whole', 'grade', 'premium', 'local', 'raw', 'of', 'and'}
+
+
+def _singular(token):
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('oes') and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def _tokens(text):
+    return tuple(_singular(t) for t in re.findall(r'[a-z]+', (text or '').lower()) if t not in QUALIFIERS)
+
+
+def _alias_index():
+    index = {}
+    for key, aliases in ALIASES.items():
+        for alias in [key.replace('_', ' '), *aliases]:
+            if _tokens(alias):
+                index.setdefault(_tokens(alias), key)
+    return index
+
+
+def commodity_key_for(name, index):
+    words = _tokens(name)
+    longest = max(len(alias) for alias in index)
+    for size in range(min(longest, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            key = index.get(words[start:start + size])
+            if key:
+                return key
+    return '_'.join(words)[:40]
+
+
+def backfill_commodity_keys(apps, schema_editor):
+    index = _alias_index()
+    # One UPDATE per distinct name rather than one per row.
+    for model_name, name_field in [('Product', 'name'), ('HarvestSchedule', 'product_name'),
+                                   ('PostHarvestLossReport', 'product_name'), ('MarketPriceIndex', 'product_name')]:
+        model = apps.get_model('web_app', model_name)
+        for name in model.objects.values_list(name_field, flat=True).distinct().order_by():
+            model.objects.filter(**{name_field: name}).update(commodity_key=commodity_key_for(name, index))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0005_analytics_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harvestschedule',
+            name='commodity_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='marketpriceindex',
+            name='commodity_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='postharvestlossreport',
+            name='commodity_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='commodity_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.RunPython(backfill_commodity_keys, migrations.RunPython.noop),
+    ]
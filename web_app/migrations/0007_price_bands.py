@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0006_commodity_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity_key', models.CharField(max_length=40)),
+                ('market', models.CharField(choices=[('nairobi_wakulima', 'Wakulima Market, Nairobi'), ('nairobi_kangemi', 'Kangemi Market, Nairobi'), ('mombasa_kongowea', 'Kongowea Market, Mombasa'), ('kisumu_kibuye', 'Kibuye Market, Kisumu'), ('nakuru_central', 'Central Market, Nakuru')], max_length=30)),
+                ('market_price', models.DecimalField(decimal_places=2, help_text='Median wholesale price per kg', max_digits=8)),
+                ('transport_cost_per_kg', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('low_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('suggested_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('high_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('sample_size', models.PositiveIntegerField(default=0)),
+                ('as_of', models.DateField(help_text='Latest market price included')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Price Band',
+                'verbose_name_plural': 'Price Bands',
+                'ordering': ['commodity_key', 'market'],
+                'constraints': [models.UniqueConstraint(fields=('commodity_key', 'market'), name='unique_price_band')],
+            },
+        ),
+    ]
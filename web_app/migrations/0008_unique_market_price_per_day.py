@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:43
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_prices(apps, schema_editor):
+    # Keep the most recently entered price for each market/product/day.
+    MarketPriceIndex = apps.get_model('web_app', 'MarketPriceIndex')
+    duplicates = (MarketPriceIndex.objects.values('market', 'product_name', 'recorded_date')
+                  .annotate(rows=Count('id'), keep=Max('id')).filter(rows__gt=1).order_by())
+    for group in duplicates:
+        (MarketPriceIndex.objects
+         .filter(market=group['market'], product_name=group['product_name'], recorded_date=group['recorded_date'])
+         .exclude(pk=group['keep']).delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0007_price_bands'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_prices, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='marketpriceindex',
+            constraint=models.UniqueConstraint(fields=('market', 'product_name', 'recorded_date'), name='unique_market_price_per_day'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0008_unique_market_price_per_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PickupProposal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(help_text='Farm nearest town', max_length=100)),
+                ('pickup_date', models.DateField()),
+                ('harvest_ids', models.JSONField(default=list)),
+                ('farm_count', models.PositiveIntegerField(default=0)),
+                ('total_kg', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cold_chain_kg', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pickup_latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('pickup_longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('vehicle_class', models.CharField(choices=[('motorcycle', '🏍️ Motorcycle'), ('pickup', '🚐 Pickup Truck'), ('truck_small', '🚛 Small Truck (1-3T)'), ('truck_medium', '🚚 Medium Truck (3-7T)'), ('truck_large', '🏗️ Large Truck (7T+)'), ('refrigerated', '❄️ Refrigerated Truck')], max_length=20)),
+                ('vehicle_loads', models.PositiveIntegerField(default=1)),
+                ('estimated_cost', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('storage_tonnes', models.DecimalField(decimal_places=3, default=0, max_digits=8)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('status', models.CharField(choices=[('proposed', '📝 Proposed'), ('accepted', '✅ Accepted'), ('dismissed', '🚫 Dismissed')], default='proposed', max_length=20)),
+                ('needs_review', models.BooleanField(default=False, help_text='Harvests changed after the proposal was reviewed')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cold_storage_booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pickup_proposals', to='web_app.coldstoragebooking')),
+                ('cold_storage_facility', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pickup_proposals', to='web_app.coldstoragefacility')),
+                ('route', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pickup_proposals', to='web_app.logisticsroute')),
+                ('shipment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pickup_proposals', to='web_app.shipment')),
+            ],
+            options={
+                'verbose_name': 'Pickup Proposal',
+                'verbose_name_plural': 'Pickup Proposals',
+                'ordering': ['pickup_date', 'region'],
+                'constraints': [models.UniqueConstraint(fields=('region', 'pickup_date'), name='unique_pickup_proposal')],
+            },
+        ),
+    ]
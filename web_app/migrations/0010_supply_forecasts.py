@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0009_pickup_proposals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplyForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity_key', models.CharField(max_length=40)),
+                ('region', models.CharField(help_text='Nearest town of the supplying farms', max_length=100)),
+                ('week_start', models.DateField(help_text='Monday of the forecast week')),
+                ('scheduled_kg', models.DecimalField(decimal_places=2, default=0, help_text='Expected quantity on open harvest schedules', max_digits=12)),
+                ('supply_kg', models.DecimalField(decimal_places=2, default=0, help_text="Scheduled quantity adjusted by each farm's actual/expected record", max_digits=12)),
+                ('demand_kg', models.DecimalField(decimal_places=2, default=0, help_text='Average weekly ordered quantity over the lookback window', max_digits=12)),
+                ('farm_count', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Supply Forecast',
+                'verbose_name_plural': 'Supply Forecasts',
+                'ordering': ['commodity_key', 'region', 'week_start'],
+                'constraints': [models.UniqueConstraint(fields=('commodity_key', 'region', 'week_start'), name='unique_supply_forecast')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0010_supply_forecasts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='near_expiry',
+            field=models.BooleanField(default=False, help_text='Expires soon; flagged for discounting'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['expiry_date'], name='product_available_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('status', 'available')), fields=['quantity_available'], name='product_available_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('near_expiry', True)), fields=['expiry_date'], name='product_near_expiry_idx'),
+        ),
+    ]
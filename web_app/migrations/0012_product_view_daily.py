@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0011_product_expiry_sweep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='web_app.product')),
+            ],
+            options={
+                'verbose_name': 'Product Views (Daily)',
+                'verbose_name_plural': 'Product Views (Daily)',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'product'], name='web_app_pro_day_cee344_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_view_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:02
+
+import django.db.models.deletion
+import django.utils.timezone
+import web_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0012_product_view_daily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(help_text='Path in media storage', max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_uploaded_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Latest upload of this content, deduplicated or not')),
+            ],
+            options={
+                'verbose_name': 'Media Blob',
+                'verbose_name_plural': 'Media Blobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='coldstoragefacility',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='cold_storage/'),
+        ),
+        migrations.AlterField(
+            model_name='dispute',
+            name='evidence_photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='disputes/'),
+        ),
+        migrations.AlterField(
+            model_name='farm',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='farms/'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='products/'),
+        ),
+        migrations.AlterField(
+            model_name='shipment',
+            name='proof_of_delivery_photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='deliveries/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='profiles/'),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=web_app.storage.media_storage, upload_to='vehicles/'),
+        ),
+        migrations.CreateModel(
+            name='MediaReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='app_label.model_name', max_length=100)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field', models.CharField(max_length=50)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='web_app.mediablob')),
+            ],
+            options={
+                'verbose_name': 'Media Reference',
+                'verbose_name_plural': 'Media References',
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id', 'field'), name='unique_media_reference')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0014_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncMutation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(help_text='Idempotency key generated by the client', max_length=64)),
+                ('kind', models.CharField(choices=[('status', 'Status Change'), ('location', 'Location Fix'), ('rating', 'Delivery Rating')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('client_at', models.DateTimeField(help_text='When the change happened on the device')),
+                ('result', models.CharField(choices=[('applied', 'Applied'), ('rejected', 'Rejected')], max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Mutation',
+                'verbose_name_plural': 'Sync Mutations',
+                'ordering': ['-received_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['driver', 'updated_at'], name='web_app_shi_driver__c7471a_idx'),
+        ),
+        migrations.AddField(
+            model_name='syncmutation',
+            name='shipment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sync_mutations', to='web_app.shipment'),
+        ),
+        migrations.AddField(
+            model_name='syncmutation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_mutations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='syncmutation',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_sync_mutation'),
+        ),
+    ]
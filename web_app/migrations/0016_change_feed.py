@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows count as changed when they were created, not when this migration ran.
+    for model in ['ColdStorageBooking', 'Notification', 'Product']:
+        apps.get_model('web_app', model).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0015_driver_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='shipment',
+            name='web_app_shi_driver__c7471a_idx',
+        ),
+        migrations.AddField(
+            model_name='coldstoragebooking',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='coldstoragebooking',
+            index=models.Index(fields=['booked_by', 'updated_at', 'id'], name='booking_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coldstoragebooking',
+            index=models.Index(fields=['facility', 'updated_at', 'id'], name='booking_facility_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='notification_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', 'updated_at', 'id'], name='order_buyer_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['farmer', 'updated_at', 'id'], name='order_farmer_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='product_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['driver', 'updated_at', 'id'], name='shipment_driver_changes_idx'),
+        ),
+    ]
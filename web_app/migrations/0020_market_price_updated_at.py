@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    apps.get_model('web_app', 'MarketPriceIndex').objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0019_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketpriceindex',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='marketpriceindex',
+            index=models.Index(fields=['commodity_key', 'updated_at'], name='market_price_version_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0020_market_price_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logisticsroute',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0021_logistics_route_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuyerRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_ids', models.JSONField(default=list, help_text='Best first')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('buyer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Buyer Recommendation',
+                'verbose_name_plural': 'Buyer Recommendations',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0023_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='handover_rating',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="The driver's rating of the delivery handover", null=True),
+        ),
+        migrations.AlterField(
+            model_name='syncmutation',
+            name='kind',
+            field=models.CharField(choices=[('status', 'Status Change'), ('location', 'Location Fix'), ('rating', 'Handover Rating')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_loss_totals(apps, schema_editor):
+    LossSummary = apps.get_model('web_app', 'LossSummary')
+    LossTotal = apps.get_model('web_app', 'LossTotal')
+    platform = LossSummary.objects.values('primary_cause').order_by()
+    per_owner = LossSummary.objects.values('farm__owner_id', 'primary_cause').order_by()
+    LossTotal.objects.bulk_create([
+        LossTotal(owner_id=row.get('farm__owner_id'), primary_cause=row['primary_cause'],
+                  report_count=row['reports'], total_kg_lost=row['kg'], total_value_lost=row['value'])
+        for rows in (platform, per_owner)
+        for row in rows.annotate(reports=Sum('report_count'), kg=Sum('total_kg_lost'), value=Sum('total_value_lost'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0024_shipment_handover_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LossTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('primary_cause', models.CharField(choices=[('temperature', 'Temperature Abuse'), ('transport_delay', 'Transport Delay'), ('handling', 'Poor Handling'), ('packaging', 'Packaging Failure'), ('road_condition', 'Bad Road Conditions'), ('breakdown', 'Vehicle Breakdown'), ('other', 'Other')], max_length=20)),
+                ('report_count', models.IntegerField(default=0)),
+                ('total_kg_lost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_value_lost', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='loss_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Loss Total',
+                'verbose_name_plural': 'Loss Totals',
+                'constraints': [models.UniqueConstraint(fields=('owner', 'primary_cause'), name='unique_loss_total'), models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('primary_cause',), name='unique_platform_loss_total')],
+            },
+        ),
+        migrations.RunPython(backfill_loss_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+import importlib
+import re
+
+from django.db import migrations
+
+# The tokeniser used to drop digits, so "Crop1" and "Crop2" shared the key "crop".
+# Only names containing a digit can change; they are re-keyed with the 0006 alias
+# table (still frozen) and the digit-keeping tokeniser.
+commodity_keys = importlib.import_module('web_app.migrations.0006_commodity_keys')
+
+
+def _tokens(text):
+    return tuple(commodity_keys._singular(t) for t in re.findall(r'[a-z0-9]+', (text or '').lower())
+                 if t not in commodity_keys.QUALIFIERS)
+
+
+def _commodity_key_for(name, index):
+    words = _tokens(name)
+    longest = max(len(alias) for alias in index)
+    for size in range(min(longest, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            key = index.get(words[start:start + size])
+            if key:
+                return key
+    return '_'.join(words)[:40]
+
+
+def rekey_numbered_names(apps, schema_editor):
+    index = commodity_keys._alias_index()
+    for model_name, name_field in [('Product', 'name'), ('HarvestSchedule', 'product_name'),
+                                   ('PostHarvestLossReport', 'product_name'), ('MarketPriceIndex', 'product_name')]:
+        model = apps.get_model('web_app', model_name)
+        names = model.objects.filter(**{f'{name_field}__regex': r'[0-9]'}).values_list(name_field, flat=True)
+        for name in names.distinct().order_by():
+            model.objects.filter(**{name_field: name}).update(commodity_key=_commodity_key_for(name, index))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0025_loss_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_numbered_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0026_rekey_numbered_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketpriceindex',
+            index=models.Index(fields=['commodity_key', 'market', 'recorded_date'], name='market_price_pair_date_idx'),
+        ),
+    ]
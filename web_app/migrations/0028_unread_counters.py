@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Notification = apps.get_model('web_app', 'Notification')
+    UnreadCounter = apps.get_model('web_app', 'UnreadCounter')
+    counts = (Notification.objects.filter(is_read=False).values('user_id').annotate(unread=Count('id'))
+              .values_list('user_id', 'unread').order_by())
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id, unread=unread) for user_id, unread in counts],
+                                      batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web_app', '0027_market_price_pair_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BroadcastChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('broadcast_id', models.CharField(max_length=64)),
+                ('after', models.BigIntegerField()),
+                ('recipients', models.PositiveIntegerField(default=0)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('broadcast_id', 'after'), name='unique_broadcast_chunk')],
+            },
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .catalog import commodity_key_for
+from .storage import media_storage
 
 
 # ============================================================
@@ -17,7 +23,7 @@ class User(AbstractUser):
 
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='buyer')
     phone = models.CharField(max_length=20, unique=True, null=True, blank=True)
-    profile_photo = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    profile_photo = models.ImageField(upload_to='profiles/', storage=media_storage, null=True, blank=True)
     location = models.CharField(max_length=255, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -48,14 +54,91 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=20, choices=TYPES)
     title = models.CharField(max_length=255)
     message = models.TextField()
+    item_count = models.PositiveIntegerField(default=1, help_text="Events collapsed into this notification")
+    payload = models.JSONField(default=list, blank=True, help_text="The collapsed events, newest first")
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} → {self.user.username}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='notification_changes_idx'),
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+            models.Index(fields=['created_at'], condition=models.Q(is_read=True), name='notification_read_age_idx'),
+        ]
+
+
+class NotificationArchive(models.Model):
+    """A read Notification moved out of the hot table by ``manage.py archive_notifications``; keeps its id."""
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPES)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    item_count = models.PositiveIntegerField(default=1)
+    payload = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_read = True  # only read notifications are archived
+
+    def __str__(self):
+        return f"{self.title} → {self.user.username} (archived)"
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Archived Notification"
+        verbose_name_plural = "Archived Notifications"
+        indexes = [models.Index(fields=['user', '-id'], name='notification_archive_user_idx')]
+
+
+class PendingNotification(models.Model):
+    """An event waiting to be collapsed into a digest Notification (see web_app.notifications)."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_notifications')
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPES)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.title} → {self.user.username} (pending)"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['user', 'notification_type', 'created_at'])]
+
+
+class UnreadCounter(models.Model):
+    """A user's unread notification count, moved by web_app.notifications in the transaction that changes it."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread"
+
+
+class BroadcastChunk(models.Model):
+    """One sent chunk of a broadcast (the users after ``after``), so a retried job does not send it twice."""
+
+    broadcast_id = models.CharField(max_length=64)
+    after = models.BigIntegerField()
+    recipients = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Broadcast {self.broadcast_id} after #{self.after}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast_id', 'after'], name='unique_broadcast_chunk'),
+        ]
 
 
 # ============================================================
@@ -86,7 +169,7 @@ class Farm(models.Model):
     has_electricity = models.BooleanField(default=False)
     water_source = models.CharField(max_length=100, blank=True)
     certification = models.CharField(max_length=100, blank=True)
-    photo = models.ImageField(upload_to='farms/', null=True, blank=True)
+    photo = models.ImageField(upload_to='farms/', storage=media_storage, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -138,6 +221,7 @@ class HarvestSchedule(models.Model):
 
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='harvests')
     product_name = models.CharField(max_length=100)
+    commodity_key = models.CharField(max_length=40, blank=True, db_index=True)
     expected_quantity_kg = models.DecimalField(max_digits=10, decimal_places=2)
     actual_quantity_kg = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     harvest_date = models.DateField()
@@ -146,6 +230,10 @@ class HarvestSchedule(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.commodity_key = commodity_key_for(self.product_name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product_name} from {self.farm.name} — {self.harvest_date}"
 
@@ -196,6 +284,7 @@ class Product(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='products')
     category = models.ForeignKey(ProductCategory, on_delete=models.SET_NULL, null=True, related_name='products')
     name = models.CharField(max_length=200)
+    commodity_key = models.CharField(max_length=40, blank=True, db_index=True)
     variety = models.CharField(max_length=100, blank=True)
     description = models.TextField(blank=True)
     quantity_available = models.DecimalField(max_digits=10, decimal_places=2)
@@ -206,10 +295,16 @@ class Product(models.Model):
     expiry_date = models.DateField(null=True, blank=True)
     is_organic = models.BooleanField(default=False)
     is_certified = models.BooleanField(default=False)
-    photo = models.ImageField(upload_to='products/', null=True, blank=True)
+    photo = models.ImageField(upload_to='products/', storage=media_storage, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
+    near_expiry = models.BooleanField(default=False, help_text="Expires soon; flagged for discounting")
     views_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.commodity_key = commodity_key_for(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.quantity_available} {self.unit}) — {self.farm.name}"
@@ -222,6 +317,16 @@ class Product(models.Model):
         ordering = ['-created_at']
         verbose_name = "Product"
         verbose_name_plural = "Products"
+        indexes = [
+            # Partial indexes keep the per-minute expiry sweep cheap however many old listings exist.
+            models.Index(fields=['expiry_date'], condition=models.Q(status='available'),
+                         name='product_available_expiry_idx'),
+            models.Index(fields=['quantity_available'], condition=models.Q(status='available'),
+                         name='product_available_qty_idx'),
+            models.Index(fields=['expiry_date'], condition=models.Q(near_expiry=True),
+                         name='product_near_expiry_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_changes_idx'),
+        ]
 
 
 class PriceHistory(models.Model):
@@ -241,6 +346,26 @@ class PriceHistory(models.Model):
         verbose_name_plural = "Price Histories"
 
 
+class ProductViewDaily(models.Model):
+    """Detail-page views of a product per day, flushed in batches by web_app.view_counter."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.views} views"
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name = "Product Views (Daily)"
+        verbose_name_plural = "Product Views (Daily)"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_view_day'),
+        ]
+        indexes = [models.Index(fields=['day', 'product'])]
+
+
 # ============================================================
 # 🚛 LOGISTICS
 # ============================================================
@@ -273,7 +398,7 @@ class Vehicle(models.Model):
     refrigeration_max_temp = models.IntegerField(null=True, blank=True)
     insurance_expiry = models.DateField()
     inspection_expiry = models.DateField()
-    photo = models.ImageField(upload_to='vehicles/', null=True, blank=True)
+    photo = models.ImageField(upload_to='vehicles/', storage=media_storage, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     current_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     current_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -303,6 +428,7 @@ class LogisticsRoute(models.Model):
     frequency = models.CharField(max_length=50, default='Daily')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.origin_name} → {self.destination_name}"
@@ -345,8 +471,10 @@ class Shipment(models.Model):
     shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     weight_kg = models.DecimalField(max_digits=10, decimal_places=2)
     notes = models.TextField(blank=True)
-    proof_of_delivery_photo = models.ImageField(upload_to='deliveries/', null=True, blank=True)
+    proof_of_delivery_photo = models.ImageField(upload_to='deliveries/', storage=media_storage, null=True, blank=True)
     driver_rating = models.PositiveSmallIntegerField(null=True, blank=True)
+    handover_rating = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                       help_text="The driver's rating of the delivery handover")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -357,6 +485,11 @@ class Shipment(models.Model):
         ordering = ['-created_at']
         verbose_name = "Shipment"
         verbose_name_plural = "Shipments"
+        indexes = [
+            models.Index(fields=['actual_pickup']),
+            models.Index(fields=['actual_delivery']),
+            models.Index(fields=['driver', 'updated_at', 'id'], name='shipment_driver_changes_idx'),
+        ]
 
 
 class ShipmentTracking(models.Model):
@@ -376,6 +509,89 @@ class ShipmentTracking(models.Model):
         verbose_name_plural = "Tracking Events"
 
 
+class PickupProposal(models.Model):
+    """Consolidated pickup for the harvests ready in one region on one day (see web_app.planner)."""
+
+    STATUS_CHOICES = [
+        ('proposed', '📝 Proposed'),
+        ('accepted', '✅ Accepted'),
+        ('dismissed', '🚫 Dismissed'),
+    ]
+
+    region = models.CharField(max_length=100, help_text="Farm nearest town")
+    pickup_date = models.DateField()
+    harvest_ids = models.JSONField(default=list)
+    farm_count = models.PositiveIntegerField(default=0)
+    total_kg = models.DecimalField(max_digits=12, decimal_places=2)
+    cold_chain_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pickup_latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    pickup_longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    route = models.ForeignKey(LogisticsRoute, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='pickup_proposals')
+    vehicle_class = models.CharField(max_length=20, choices=Vehicle.VEHICLE_TYPES)
+    vehicle_loads = models.PositiveIntegerField(default=1)
+    estimated_cost = models.DecimalField(max_digits=12, decimal_places=2)
+    cold_storage_facility = models.ForeignKey('ColdStorageFacility', on_delete=models.SET_NULL, null=True,
+                                              blank=True, related_name='pickup_proposals')
+    storage_tonnes = models.DecimalField(max_digits=8, decimal_places=3, default=0)
+    fingerprint = models.CharField(max_length=40)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='proposed')
+    needs_review = models.BooleanField(default=False, help_text="Harvests changed after the proposal was reviewed")
+    shipment = models.ForeignKey(Shipment, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='pickup_proposals')
+    cold_storage_booking = models.ForeignKey('ColdStorageBooking', on_delete=models.SET_NULL, null=True,
+                                             blank=True, related_name='pickup_proposals')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Pickup {self.region} on {self.pickup_date}: {self.total_kg}kg"
+
+    class Meta:
+        ordering = ['pickup_date', 'region']
+        verbose_name = "Pickup Proposal"
+        verbose_name_plural = "Pickup Proposals"
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'pickup_date'], name='unique_pickup_proposal'),
+        ]
+
+
+class SyncMutation(models.Model):
+    """A change queued offline by a driver's app and replayed through the sync API (see web_app.driver_sync)."""
+
+    KINDS = [
+        ('status', 'Status Change'),
+        ('location', 'Location Fix'),
+        ('rating', 'Handover Rating'),
+    ]
+    RESULTS = [
+        ('applied', 'Applied'),
+        ('rejected', 'Rejected'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_mutations')
+    client_id = models.CharField(max_length=64, help_text="Idempotency key generated by the client")
+    kind = models.CharField(max_length=20, choices=KINDS)
+    shipment = models.ForeignKey(Shipment, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='sync_mutations')
+    payload = models.JSONField(default=dict)
+    client_at = models.DateTimeField(help_text="When the change happened on the device")
+    result = models.CharField(max_length=20, choices=RESULTS)
+    error = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} {self.kind} {self.client_id} ({self.result})"
+
+    class Meta:
+        ordering = ['-received_at']
+        verbose_name = "Sync Mutation"
+        verbose_name_plural = "Sync Mutations"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_sync_mutation'),
+        ]
+
+
 # ============================================================
 # 📦 ORDERS
 # ============================================================
@@ -438,6 +654,12 @@ class Order(models.Model):
         ordering = ['-created_at']
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['completed_at']),
+            models.Index(fields=['buyer', 'updated_at', 'id'], name='order_buyer_changes_idx'),
+            models.Index(fields=['farmer', 'updated_at', 'id'], name='order_farmer_changes_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -482,7 +704,7 @@ class Dispute(models.Model):
     raised_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='disputes_raised')
     reason = models.CharField(max_length=20, choices=REASONS)
     description = models.TextField()
-    evidence_photo = models.ImageField(upload_to='disputes/', null=True, blank=True)
+    evidence_photo = models.ImageField(upload_to='disputes/', storage=media_storage, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS, default='open')
     resolution = models.TextField(blank=True)
     resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
@@ -525,7 +747,7 @@ class ColdStorageFacility(models.Model):
     has_backup_generator = models.BooleanField(default=False)
     certification = models.CharField(max_length=100, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='operational')
-    photo = models.ImageField(upload_to='cold_storage/', null=True, blank=True)
+    photo = models.ImageField(upload_to='cold_storage/', storage=media_storage, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -567,6 +789,7 @@ class ColdStorageBooking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS, default='pending')
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def duration_days(self):
@@ -586,6 +809,10 @@ class ColdStorageBooking(models.Model):
     class Meta:
         verbose_name = "Cold Storage Booking"
         verbose_name_plural = "Cold Storage Bookings"
+        indexes = [
+            models.Index(fields=['booked_by', 'updated_at', 'id'], name='booking_changes_idx'),
+            models.Index(fields=['facility', 'updated_at', 'id'], name='booking_facility_changes_idx'),
+        ]
 
 
 class TemperatureLog(models.Model):
@@ -615,6 +842,55 @@ class TemperatureLog(models.Model):
         verbose_name_plural = "Temperature Logs"
 
 
+class TemperatureExcursion(models.Model):
+    """One out-of-range episode for a sensor, from first bad reading to recovery."""
+
+    STATUS = [
+        ('open', '🔴 Open'),
+        ('closed', '🟢 Recovered'),
+    ]
+
+    booking = models.ForeignKey(ColdStorageBooking, on_delete=models.CASCADE,
+                                 related_name='excursions', null=True, blank=True)
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE,
+                                  related_name='excursions', null=True, blank=True)
+    sensor_id = models.CharField(max_length=50)
+    first_log = models.ForeignKey(TemperatureLog, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+')
+    alert_level = models.CharField(max_length=10, choices=TemperatureLog.ALERT_LEVELS, default='warning')
+    status = models.CharField(max_length=10, choices=STATUS, default='open')
+    allowed_min_celsius = models.DecimalField(max_digits=5, decimal_places=2)
+    allowed_max_celsius = models.DecimalField(max_digits=5, decimal_places=2)
+    peak_temperature_celsius = models.DecimalField(max_digits=5, decimal_places=2)
+    readings_count = models.PositiveIntegerField(default=1)
+    suppressed_count = models.PositiveIntegerField(default=0)
+    notifications_sent = models.PositiveIntegerField(default=0)
+    opened_at = models.DateTimeField()
+    notified_at = models.DateTimeField(null=True, blank=True)
+    alert_latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Excursion on {self.sensor_id}: peak {self.peak_temperature_celsius}°C [{self.get_status_display()}]"
+
+    @property
+    def duration(self):
+        return (self.closed_at or timezone.now()) - self.opened_at
+
+    class Meta:
+        ordering = ['-opened_at']
+        verbose_name = "Temperature Excursion"
+        verbose_name_plural = "Temperature Excursions"
+        indexes = [
+            models.Index(fields=['sensor_id', 'status']),
+            models.Index(fields=['notified_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['sensor_id'], condition=models.Q(status='open'),
+                                    name='one_open_excursion_per_sensor'),
+        ]
+
+
 # ============================================================
 # 📊 ANALYTICS
 # ============================================================
@@ -632,6 +908,7 @@ class PostHarvestLossReport(models.Model):
 
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='loss_reports')
     product_name = models.CharField(max_length=100)
+    commodity_key = models.CharField(max_length=40, blank=True, db_index=True)
     quantity_lost_kg = models.DecimalField(max_digits=10, decimal_places=2)
     estimated_value_lost = models.DecimalField(max_digits=12, decimal_places=2)
     primary_cause = models.CharField(max_length=20, choices=CAUSE_CHOICES)
@@ -640,6 +917,10 @@ class PostHarvestLossReport(models.Model):
     incident_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.commodity_key = commodity_key_for(self.product_name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Loss: {self.quantity_lost_kg}kg {self.product_name} from {self.farm.name}"
 
@@ -686,9 +967,15 @@ class MarketPriceIndex(models.Model):
 
     market = models.CharField(max_length=30, choices=MARKETS)
     product_name = models.CharField(max_length=100)
+    commodity_key = models.CharField(max_length=40, blank=True, db_index=True)
     price_per_kg = models.DecimalField(max_digits=8, decimal_places=2)
     recorded_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.commodity_key = commodity_key_for(self.product_name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.product_name} @ {self.get_market_display()}: KES {self.price_per_kg}/kg"
@@ -696,4 +983,279 @@ class MarketPriceIndex(models.Model):
     class Meta:
         ordering = ['-recorded_date']
         verbose_name = "Market Price Index"
-        verbose_name_plural = "Market Price Indices"
\ No newline at end of file
+        verbose_name_plural = "Market Price Indices"
+        indexes = [
+            models.Index(fields=['commodity_key', 'updated_at'], name='market_price_version_idx'),
+            models.Index(fields=['commodity_key', 'market', 'recorded_date'], name='market_price_pair_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['market', 'product_name', 'recorded_date'],
+                                    name='unique_market_price_per_day'),
+        ]
+
+
+class LossSummary(models.Model):
+    """Materialized PostHarvestLossReport totals per farm, month and cause."""
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='loss_summaries')
+    month = models.DateField(help_text="First day of the month")
+    primary_cause = models.CharField(max_length=20, choices=PostHarvestLossReport.CAUSE_CHOICES)
+    report_count = models.PositiveIntegerField(default=0)
+    total_kg_lost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_value_lost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.farm.name} {self.month:%b %Y} — {self.get_primary_cause_display()}: {self.total_kg_lost}kg"
+
+    class Meta:
+        ordering = ['-month']
+        verbose_name = "Loss Summary"
+        verbose_name_plural = "Loss Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'month', 'primary_cause'], name='unique_loss_summary'),
+        ]
+
+
+class LossTotal(models.Model):
+    """All-time LossSummary totals per cause, for one farmer or (``owner`` empty) the whole platform."""
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='loss_totals')
+    primary_cause = models.CharField(max_length=20, choices=PostHarvestLossReport.CAUSE_CHOICES)
+    report_count = models.IntegerField(default=0)
+    total_kg_lost = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_value_lost = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.owner or 'Platform'} — {self.get_primary_cause_display()}: {self.total_kg_lost}kg"
+
+    class Meta:
+        verbose_name = "Loss Total"
+        verbose_name_plural = "Loss Totals"
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'primary_cause'], name='unique_loss_total'),
+            models.UniqueConstraint(fields=['primary_cause'], condition=models.Q(owner__isnull=True),
+                                    name='unique_platform_loss_total'),
+        ]
+
+
+class MarketCoverage(models.Model):
+    """Materialized MarketPriceIndex coverage per market and product."""
+
+    market = models.CharField(max_length=30, choices=MarketPriceIndex.MARKETS)
+    product_name = models.CharField(max_length=100)
+    price_points = models.PositiveIntegerField(default=0)
+    first_recorded = models.DateField()
+    last_recorded = models.DateField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_name} @ {self.get_market_display()} ({self.price_points} prices)"
+
+    class Meta:
+        ordering = ['market', 'product_name']
+        verbose_name = "Market Coverage"
+        verbose_name_plural = "Market Coverage"
+        constraints = [
+            models.UniqueConstraint(fields=['market', 'product_name'], name='unique_market_coverage'),
+        ]
+
+
+class PriceBand(models.Model):
+    """Nightly farm-gate price band per commodity and market region (see web_app.pricing)."""
+
+    commodity_key = models.CharField(max_length=40)
+    market = models.CharField(max_length=30, choices=MarketPriceIndex.MARKETS)
+    market_price = models.DecimalField(max_digits=8, decimal_places=2, help_text="Median wholesale price per kg")
+    transport_cost_per_kg = models.DecimalField(max_digits=8, decimal_places=2)
+    low_price = models.DecimalField(max_digits=8, decimal_places=2)
+    suggested_price = models.DecimalField(max_digits=8, decimal_places=2)
+    high_price = models.DecimalField(max_digits=8, decimal_places=2)
+    sample_size = models.PositiveIntegerField(default=0)
+    as_of = models.DateField(help_text="Latest market price included")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.commodity_key} @ {self.get_market_display()}: KES {self.low_price}–{self.high_price}/kg"
+
+    class Meta:
+        ordering = ['commodity_key', 'market']
+        verbose_name = "Price Band"
+        verbose_name_plural = "Price Bands"
+        constraints = [
+            models.UniqueConstraint(fields=['commodity_key', 'market'], name='unique_price_band'),
+        ]
+
+
+class SupplyForecast(models.Model):
+    """Weekly supply/demand outlook per commodity and region (see web_app.forecasting)."""
+
+    commodity_key = models.CharField(max_length=40)
+    region = models.CharField(max_length=100, help_text="Nearest town of the supplying farms")
+    week_start = models.DateField(help_text="Monday of the forecast week")
+    scheduled_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                       help_text="Expected quantity on open harvest schedules")
+    supply_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                    help_text="Scheduled quantity adjusted by each farm's actual/expected record")
+    demand_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                    help_text="Average weekly ordered quantity over the lookback window")
+    farm_count = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def balance_kg(self):
+        return self.supply_kg - self.demand_kg
+
+    def __str__(self):
+        return f"{self.commodity_key} / {self.region}, week of {self.week_start}: {self.supply_kg}kg"
+
+    class Meta:
+        ordering = ['commodity_key', 'region', 'week_start']
+        verbose_name = "Supply Forecast"
+        verbose_name_plural = "Supply Forecasts"
+        constraints = [
+            models.UniqueConstraint(fields=['commodity_key', 'region', 'week_start'],
+                                    name='unique_supply_forecast'),
+        ]
+
+
+class BuyerRecommendation(models.Model):
+    """Nightly top-N product ids for one buyer (see web_app.recommendations)."""
+
+    buyer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recommendation')
+    product_ids = models.JSONField(default=list, help_text="Best first")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations for {self.buyer}: {len(self.product_ids)} products"
+
+    class Meta:
+        verbose_name = "Buyer Recommendation"
+        verbose_name_plural = "Buyer Recommendations"
+
+# ============================================================
+# 🗂️ MEDIA
+# ============================================================
+
+class MediaBlob(models.Model):
+    """One stored upload, named by the SHA-256 of its content (see web_app.storage)."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True, help_text="Path in media storage")
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_uploaded_at = models.DateTimeField(default=timezone.now,
+                                            help_text="Latest upload of this content, deduplicated or not")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+
+
+class MediaReference(models.Model):
+    """A model field currently pointing at a MediaBlob; blobs with none are garbage-collected."""
+
+    blob = models.ForeignKey(MediaBlob, on_delete=models.CASCADE, related_name='references')
+    model = models.CharField(max_length=100, help_text="app_label.model_name")
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=50)
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id}.{self.field} → {self.blob.name}"
+
+    class Meta:
+        verbose_name = "Media Reference"
+        verbose_name_plural = "Media References"
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id', 'field'], name='unique_media_reference'),
+        ]
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked upload of one photo for a shipment or dispute (see web_app.uploads)."""
+
+    TARGETS = [
+        ('shipment', 'Proof of Delivery'),
+        ('dispute', 'Dispute Evidence'),
+    ]
+    STATUS = [
+        ('open', 'Receiving'),
+        ('complete', 'Attached'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGETS)
+    object_id = models.PositiveBigIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Checksum declared by the client, if any")
+    on_complete = models.JSONField(default=dict, blank=True,
+                                   help_text="Shipment status change to apply once the photo is attached")
+    status = models.CharField(max_length=20, choices=STATUS, default='open')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.size} bytes) → {self.target} #{self.object_id}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+        indexes = [models.Index(fields=['status', 'expires_at'])]
+
+
+# ============================================================
+# ⚙️ BACKGROUND JOBS
+# ============================================================
+
+class BackgroundJob(models.Model):
+    STATUS = [
+        ('queued', '⏳ Queued'),
+        ('running', '⚙️ Running'),
+        ('succeeded', '✅ Succeeded'),
+        ('failed', '❌ Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} [{self.get_status_display()}]"
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+
+class Lease(models.Model):
+    """Named, expiring lock shared by every process (see web_app.jobs.acquire_lease)."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    holder = models.CharField(max_length=32, blank=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder or 'nobody'} until {self.expires_at}"
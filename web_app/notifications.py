@@ -0,0 +1,245 @@
+"""
+Notification delivery and unread counts.
+
+The unread badge on every page reads ``unread_count``, one UnreadCounter
+row per user. ``deliver`` and ``mark_read`` move it with ``F()`` updates in
+the same transaction as the rows they write, so every process sees it
+change exactly when the notifications do; single-row saves and deletes (the
+admin) recount it from the table (see web_app.signals). A plain
+``QuerySet.update()`` elsewhere bypasses both, and ``reconcile``
+(``manage.py reconcile_unread_counts``) repairs any drift.
+
+``notify`` is the entry point for event notifications. Types listed in
+``NOTIFICATION_DIGEST_WINDOWS`` are not written straight away: each event is
+buffered as a PendingNotification and a ``notifications.digest`` job is
+queued for the end of the window. That job collapses everything buffered
+for the user and type into one Notification, with ``item_count`` and the
+individual events in ``payload``. A farmer who receives forty orders in
+five minutes gets one inbox row instead of forty.
+
+``broadcast`` fans one message out to a whole audience (e.g. every farmer
+in a county) as a chain of ``notifications.broadcast`` jobs. Each job sends
+one chunk, records a BroadcastChunk marker and queues the next in the same
+transaction; a retried job finds the marker and sends nothing.
+
+``archive`` (``manage.py archive_notifications``) moves read notifications
+older than ``NOTIFICATION_ARCHIVE_DAYS`` into NotificationArchive, keeping
+their ids, so the hot table only holds recent and unread rows. ``inbox_page``
+pages a user's inbox newest first by id and reads the archive only once
+the hot rows run out.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    BroadcastChunk, Notification, NotificationArchive, PendingNotification, UnreadCounter, User,
+)
+
+BATCH_SIZE = 1000
+DIGEST_GRACE_SECONDS = 10    # lets events from requests still committing at the window's end make it in
+DIGEST_MAX_ITEMS = 50        # events kept in a digest's payload; item_count has the full number
+ARCHIVE_FIELDS = ['id', 'user_id', 'notification_type', 'title', 'message', 'item_count', 'payload', 'created_at']
+INBOX_PAGE_SIZE = 25
+DIGEST_TITLES = {
+    'order': '🛒 {count} order updates',
+    'delivery': '🚛 {count} delivery updates',
+    'payment': '💳 {count} payment updates',
+}
+
+
+def unread_count(user_id):
+    return UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first() or 0
+
+
+def _adjust(deltas):
+    """Add ``deltas`` ({user id: change}) to the users' counters; runs inside the caller's transaction."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id) for user_id in sorted(deltas)],
+                                      ignore_conflicts=True, batch_size=BATCH_SIZE)
+    users_by_delta = {}
+    for user_id, delta in deltas.items():
+        users_by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        UnreadCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+
+
+def _unread_rows():
+    return (Notification.objects.filter(user_id=OuterRef('user_id'), is_read=False)
+            .values('user_id').annotate(count=Count('id')).values('count').order_by())
+
+
+def recount(user_id, create=True):
+    """Set ``user_id``'s counter from the table; for changes made one row at a time."""
+    unread = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    if not UnreadCounter.objects.filter(user_id=user_id).update(unread=unread) and create:
+        UnreadCounter.objects.get_or_create(user_id=user_id, defaults={'unread': unread})
+
+
+def reconcile(batch_size=BATCH_SIZE):
+    """Rewrite every user's counter from the table; returns how many users have unread notifications."""
+    last_pk = 0
+    while True:
+        user_ids = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            break
+        last_pk = user_ids[-1]
+        with transaction.atomic():
+            UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id) for user_id in user_ids],
+                                              ignore_conflicts=True)
+            # Lock first: a delivery that already moved a counter commits before the COUNT runs, and one
+            # that has not waits for this batch and then adds its rows on top of the recounted value.
+            list(UnreadCounter.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+                 .values_list('user_id'))
+            UnreadCounter.objects.filter(user_id__in=user_ids).update(
+                unread=Coalesce(Subquery(_unread_rows()), Value(0)))
+    return UnreadCounter.objects.filter(unread__gt=0).count()
+
+
+def deliver(notifications):
+    """bulk_create ``notifications`` in chunks and add the unread ones to their users' counters."""
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        _adjust(Counter(n.user_id for n in created if not n.is_read))
+    return created
+
+
+def send(user_ids, notification_type, title, message):
+    return deliver([
+        Notification(user_id=user_id, notification_type=notification_type, title=title, message=message)
+        for user_id in user_ids
+    ])
+
+
+def notify(user_ids, notification_type, title, message):
+    """Send now, or buffer for a digest if ``notification_type`` has a digest window."""
+    from .jobs import enqueue_debounced
+
+    window = settings.NOTIFICATION_DIGEST_WINDOWS.get(notification_type)
+    if not window or settings.JOB_QUEUE_EAGER:
+        return send(user_ids, notification_type, title, message)
+
+    PendingNotification.objects.bulk_create([
+        PendingNotification(user_id=user_id, notification_type=notification_type, title=title, message=message)
+        for user_id in user_ids
+    ], batch_size=BATCH_SIZE)
+    for user_id in user_ids:
+        # One flush per user, type and window, picked when the events commit; later events ride along.
+        enqueue_debounced('notifications.digest', {'user_id': user_id, 'notification_type': notification_type},
+                          key=f'notifications.digest:{user_id}:{notification_type}', window=window,
+                          grace=DIGEST_GRACE_SECONDS)
+    return []
+
+
+def flush_digest(user_id, notification_type):
+    """Collapse the user's buffered events of ``notification_type`` into one Notification."""
+    with transaction.atomic():
+        events = list(PendingNotification.objects.select_for_update()
+                      .filter(user_id=user_id, notification_type=notification_type).order_by('-created_at', '-id'))
+        if not events:
+            return None
+        latest = events[0]
+        notification = Notification(
+            user_id=user_id, notification_type=notification_type, title=latest.title, message=latest.message,
+            item_count=len(events),
+            payload=[{'title': e.title, 'message': e.message, 'at': e.created_at.isoformat()}
+                     for e in events[:DIGEST_MAX_ITEMS]],
+        )
+        if len(events) > 1:
+            notification.title = DIGEST_TITLES.get(notification_type, '🔔 {count} updates').format(count=len(events))
+            notification.message = f'{latest.message} (+{len(events) - 1} more)'
+        deliver([notification])
+        PendingNotification.objects.filter(pk__in=[e.pk for e in events]).delete()
+    return notification
+
+
+def mark_read(user, ids=None):
+    """Mark ``user``'s notifications ``ids`` (or all of them) read; returns how many changed."""
+    unread = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    with transaction.atomic():
+        changed = unread.update(is_read=True, updated_at=timezone.now())
+        _adjust({user.pk: -changed})
+    return changed
+
+
+def audience(role='', county=''):
+    """Active users with ``role``, located in (or farming in) ``county``."""
+    users = User.objects.filter(is_active=True)
+    if role:
+        users = users.filter(role=role)
+    if county:
+        users = users.filter(
+            Q(location__icontains=county) | Q(farms__location_name__icontains=county)
+        ).distinct()
+    return users
+
+
+def broadcast(broadcast_id, notification_type, title, message, role='', county='', after=0):
+    """Send to the next chunk of the audience after user id ``after``; queues the following chunk."""
+    from .jobs import enqueue
+
+    with transaction.atomic():
+        user_ids = list(audience(role, county).filter(pk__gt=after).order_by('pk')
+                        .values_list('pk', flat=True)[:BATCH_SIZE])
+        # The marker commits with the chunk, so a job retried after sending it stops here.
+        _, created = BroadcastChunk.objects.get_or_create(broadcast_id=broadcast_id, after=after,
+                                                          defaults={'recipients': len(user_ids)})
+        if not created:
+            return 0
+        send(user_ids, notification_type, title, message)
+        if len(user_ids) == BATCH_SIZE:
+            enqueue('notifications.broadcast', {
+                'broadcast_id': broadcast_id, 'notification_type': notification_type, 'title': title,
+                'message': message, 'role': role, 'county': county, 'after': user_ids[-1],
+            }, key=f'notifications.broadcast:{broadcast_id}:{user_ids[-1]}')
+    return len(user_ids)
+
+
+def archive(days=None, batch_size=BATCH_SIZE):
+    """Move read notifications older than ``days`` to the archive, one batch per transaction; returns the count."""
+    days = settings.NOTIFICATION_ARCHIVE_DAYS if days is None else days
+    old = Notification.objects.filter(is_read=True, created_at__lt=timezone.now() - timedelta(days=days))
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.select_for_update().order_by('id').values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                return moved
+            # ignore_conflicts: a batch copied by a run that died before its DELETE is copied again harmlessly.
+            # Only read rows move, so no unread counter changes.
+            NotificationArchive.objects.bulk_create([NotificationArchive(**row) for row in rows],
+                                                    ignore_conflicts=True)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+
+
+def inbox_page(user, before=None, size=INBOX_PAGE_SIZE):
+    """
+    ``size`` of ``user``'s notifications with ids below ``before``, newest first, and the next ``before``.
+
+    The archive is only queried when the hot table has fewer than ``size``
+    rows left; any hot rows older than archived ones (unread stragglers) are
+    merged in by id.
+    """
+    hot = Notification.objects.filter(user=user)
+    if before is not None:
+        hot = hot.filter(id__lt=before)
+    items = list(hot.order_by('-id')[:size + 1])
+    if len(items) <= size:
+        cold = NotificationArchive.objects.filter(user=user)
+        if before is not None:
+            cold = cold.filter(id__lt=before)
+        items = sorted(items + list(cold.order_by('-id')[:size + 1]), key=lambda n: n.id, reverse=True)
+    has_more = len(items) > size
+    items = items[:size]
+    return items, (items[-1].id if has_more else None)
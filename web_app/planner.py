@@ -0,0 +1,178 @@
+"""
+Harvest-driven pickup planning.
+
+``plan`` reads every open HarvestSchedule ready for pickup in a date window
+in one query, groups them by region (the farm's nearest town) and pickup day,
+and upserts one PickupProposal per group with a shipping quote, vehicle
+class and, for cold-chain produce, the nearest cold store with room for it.
+
+Each proposal stores a fingerprint of its harvests, so a re-run only writes
+groups whose harvests changed. Proposals nobody has reviewed yet follow the
+harvests freely; accepted or dismissed ones are flagged ``needs_review``
+instead of being overwritten or removed.
+"""
+
+import hashlib
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import requires_cold_chain
+from .geo import haversine_km
+from .jobs import enqueue_debounced
+from .models import (
+    ColdStorageBooking, ColdStorageFacility, HarvestSchedule, PickupProposal, Shipment,
+)
+from .shipping import DEFAULT_DESTINATION, WEIGHT_BANDS_KG, quote
+
+OPEN_STATUSES = ['planned', 'in_progress', 'ready']
+STORAGE_DAYS = 3  # default cold-store reservation after pickup
+
+PLAN_FIELDS = [
+    'harvest_ids', 'farm_count', 'total_kg', 'cold_chain_kg', 'pickup_latitude', 'pickup_longitude',
+    'route', 'vehicle_class', 'vehicle_loads', 'estimated_cost', 'cold_storage_facility', 'storage_tonnes',
+    'fingerprint', 'needs_review', 'updated_at',
+]
+
+
+def _group_harvests(start, end):
+    """{(region, day): [harvest rows]} for open harvests ready in [start, end]."""
+    rows = (HarvestSchedule.objects
+            .filter(ready_for_pickup_date__range=(start, end), status__in=OPEN_STATUSES, farm__is_active=True)
+            .values('id', 'farm_id', 'farm__nearest_town', 'farm__latitude', 'farm__longitude',
+                    'expected_quantity_kg', 'actual_quantity_kg', 'commodity_key', 'ready_for_pickup_date')
+            .order_by('id'))
+    groups = {}
+    for row in rows:
+        region = row['farm__nearest_town'].strip() or 'Unknown'
+        groups.setdefault((region, row['ready_for_pickup_date']), []).append(row)
+    return groups
+
+
+def _nearest_facility(facilities, latitude, longitude, tonnes):
+    candidates = [f for f in facilities if f.available_capacity_tonnes >= tonnes]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda f: haversine_km(latitude, longitude, f.latitude, f.longitude))
+
+
+def _proposal(region, day, rows, facilities):
+    quantities = [row['actual_quantity_kg'] or row['expected_quantity_kg'] for row in rows]
+    total_kg = sum(quantities, Decimal(0))
+    cold_kg = sum((q for q, row in zip(quantities, rows) if requires_cold_chain(row['commodity_key'])), Decimal(0))
+    # Pickup point: quantity-weighted centroid of the farms.
+    weight = float(total_kg) or 1.0
+    latitude = sum(float(row['farm__latitude']) * float(q) for row, q in zip(rows, quantities)) / weight
+    longitude = sum(float(row['farm__longitude']) * float(q) for row, q in zip(rows, quantities)) / weight
+    if not total_kg:
+        latitude, longitude = float(rows[0]['farm__latitude']), float(rows[0]['farm__longitude'])
+
+    trip = quote((latitude, longitude), DEFAULT_DESTINATION, total_kg, cold=cold_kg > 0)
+    storage_tonnes = (cold_kg / 1000).quantize(Decimal('0.001'))
+    facility = _nearest_facility(facilities, latitude, longitude, storage_tonnes) if cold_kg else None
+    fingerprint = hashlib.sha1(repr([(row['id'], str(q)) for row, q in zip(rows, quantities)]).encode()).hexdigest()
+    return PickupProposal(
+        region=region,
+        pickup_date=day,
+        harvest_ids=[row['id'] for row in rows],
+        farm_count=len({row['farm_id'] for row in rows}),
+        total_kg=total_kg,
+        cold_chain_kg=cold_kg,
+        pickup_latitude=Decimal(str(round(latitude, 6))),
+        pickup_longitude=Decimal(str(round(longitude, 6))),
+        route_id=trip['route_id'],
+        vehicle_class=trip['vehicle_class'],
+        vehicle_loads=max(trip['weight_band_kg'] // WEIGHT_BANDS_KG[-1], 1),
+        estimated_cost=trip['cost'],
+        cold_storage_facility=facility,
+        storage_tonnes=storage_tonnes if facility else 0,
+        fingerprint=fingerprint,
+    )
+
+
+def plan(start, end):
+    """Bring PickupProposals for [start, end] in line with the harvest schedules; returns counts."""
+    groups = _group_harvests(start, end)
+    existing = {(p.region, p.pickup_date): p
+                for p in PickupProposal.objects.filter(pickup_date__range=(start, end))}
+    facilities = list(ColdStorageFacility.objects.filter(is_active=True, status='operational'))
+
+    changed, reviewed = [], []
+    for key, rows in groups.items():
+        proposal = _proposal(*key, rows, facilities)
+        current = existing.get(key)
+        if current is not None and current.fingerprint == proposal.fingerprint:
+            continue
+        if current is not None and current.status != 'proposed':
+            reviewed.append(current)  # keep what was accepted or dismissed; only flag it
+            continue
+        changed.append(proposal)
+
+    vanished = [p for key, p in existing.items() if key not in groups]
+    stale = reviewed + [p for p in vanished if p.status != 'proposed']
+    with transaction.atomic():
+        PickupProposal.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=['region', 'pickup_date'], update_fields=PLAN_FIELDS,
+        )
+        removed = PickupProposal.objects.filter(
+            pk__in=[p.pk for p in vanished if p.status == 'proposed']).delete()[0]
+        flagged = PickupProposal.objects.filter(
+            pk__in=[p.pk for p in stale], needs_review=False).update(needs_review=True)
+
+    return {
+        'groups': len(groups),
+        'created': sum(1 for p in changed if (p.region, p.pickup_date) not in existing),
+        'updated': sum(1 for p in changed if (p.region, p.pickup_date) in existing),
+        'unchanged': len(groups) - len(changed) - len(reviewed),
+        'removed': removed,
+        'flagged': flagged,
+    }
+
+
+def schedule_replan(*days):
+    """Queue a debounced re-plan of each pickup day touched by a harvest change."""
+    for day in {day for day in days if day}:
+        enqueue_debounced('planner.plan_day', {'day': day.isoformat()}, key=f'pickup-plan:{day.isoformat()}')
+
+
+@transaction.atomic
+def accept(proposal, user):
+    """Turn a proposal into a pending Shipment and, for cold produce, a pending cold-store booking."""
+    pickup_at = timezone.make_aware(datetime.combine(proposal.pickup_date, dt_time(6, 0)))
+    route = proposal.route
+    shipment = Shipment.objects.create(
+        shipment_code=f'SHP-{uuid.uuid4().hex[:8].upper()}',
+        route=route,
+        pickup_address=f'{proposal.region} collection point ({proposal.farm_count} farms)',
+        pickup_latitude=proposal.pickup_latitude,
+        pickup_longitude=proposal.pickup_longitude,
+        delivery_address=route.destination_name if route else 'Wakulima Market, Nairobi',
+        delivery_latitude=route.destination_latitude if route else DEFAULT_DESTINATION[0],
+        delivery_longitude=route.destination_longitude if route else DEFAULT_DESTINATION[1],
+        scheduled_pickup=pickup_at,
+        shipping_cost=proposal.estimated_cost,
+        weight_kg=proposal.total_kg,
+        notes=f'Planned pickup for harvests {", ".join(map(str, proposal.harvest_ids))}',
+    )
+    booking = None
+    facility = proposal.cold_storage_facility
+    if facility is not None and proposal.storage_tonnes:
+        booking = ColdStorageBooking.objects.create(
+            facility=facility,
+            booked_by=user,
+            product_description=f'Planned {proposal.region} pickup ({proposal.cold_chain_kg}kg cold chain)',
+            quantity_tonnes=proposal.storage_tonnes,
+            required_temp_min=facility.min_temperature_celsius,
+            required_temp_max=facility.max_temperature_celsius,
+            start_date=proposal.pickup_date,
+            end_date=proposal.pickup_date + timedelta(days=STORAGE_DAYS),
+        )
+    proposal.status = 'accepted'
+    proposal.needs_review = False
+    proposal.shipment = shipment
+    proposal.cold_storage_booking = booking
+    proposal.save(update_fields=['status', 'needs_review', 'shipment', 'cold_storage_booking', 'updated_at'])
+    return proposal
@@ -0,0 +1,150 @@
+"""
+Market price time-series analytics.
+
+Prices for one commodity are loaded into a (market × day) NumPy matrix, gaps
+are forward-filled, and moving averages, volatility, week-over-week change
+and inter-market spreads are computed column-wise in one pass. Results are
+cached per commodity (see ``catalog``) under a key that includes the
+commodity's row count and latest ``updated_at``, so any insert, edit or
+delete moves every process on to a fresh entry without an explicit
+invalidation.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .catalog import commodity_key_for, display_name
+from .models import MarketPriceIndex
+
+CACHE_TIMEOUT = 6 * 60 * 60
+SERIES_DAYS = 90
+MARKET_LABELS = dict(MarketPriceIndex.MARKETS)
+
+
+def _cache_key(commodity_key):
+    stamp = MarketPriceIndex.objects.filter(commodity_key=commodity_key).aggregate(
+        rows=Count('id'), changed=Max('updated_at'))
+    changed = stamp['changed'].timestamp() if stamp['changed'] else 0
+    return f'price-analytics:{commodity_key}:{stamp["rows"]}:{changed}'
+
+
+def _forward_fill(matrix):
+    """Carry each row's last observed price forward over missing days."""
+    mask = np.isnan(matrix)
+    index = np.where(~mask, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], index]
+    # Days before a market's first observation stay empty.
+    filled[np.cumsum(~mask, axis=1) == 0] = np.nan
+    return filled
+
+
+def _trailing_mean(matrix, window):
+    """Mean of the last ``window`` days per row, ignoring missing days."""
+    tail = matrix[:, -window:]
+    counts = np.sum(~np.isnan(tail), axis=1)
+    sums = np.nansum(tail, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def load_matrix(commodity_key):
+    """Return (markets, dates, matrix) of raw daily prices for one commodity."""
+    rows = list(MarketPriceIndex.objects.filter(commodity_key=commodity_key)
+                .values_list('market', 'recorded_date', 'price_per_kg'))
+    if not rows:
+        return [], [], np.empty((0, 0))
+    # Several product names can share a commodity; average same-day prices.
+    markets = sorted({market for market, _, _ in rows})
+    first = min(day for _, day, _ in rows)
+    last = max(day for _, day, _ in rows)
+    dates = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    totals = np.zeros((len(markets), len(dates)))
+    counts = np.zeros((len(markets), len(dates)))
+    market_index = {market: i for i, market in enumerate(markets)}
+    for market, day, price in rows:
+        cell = market_index[market], (day - first).days
+        totals[cell] += float(price)
+        counts[cell] += 1
+    with np.errstate(invalid='ignore'):
+        return markets, dates, totals / np.where(counts > 0, counts, np.nan)
+
+
+def compute(commodity_key):
+    """Uncached analytics for one commodity; see ``price_analytics``."""
+    header = {'commodity': commodity_key, 'product': display_name(commodity_key)}
+    markets, dates, raw = load_matrix(commodity_key)
+    if not markets:
+        return {**header, 'markets': [], 'spreads': [], 'series': {'dates': [], 'prices': {}}}
+
+    filled = _forward_fill(raw)
+    latest = filled[:, -1]
+    ma_7 = _trailing_mean(filled, 7)
+    ma_30 = _trailing_mean(filled, 30)
+    week_ago = filled[:, -8] if filled.shape[1] > 7 else np.full(len(markets), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wow = (latest - week_ago) / week_ago * 100
+        # Volatility: std-dev of day-on-day % moves over the last 30 days.
+        window = filled[:, -31:]
+        moves = np.diff(window, axis=1) / window[:, :-1] * 100
+    volatility = np.array([np.std(row[~np.isnan(row)]) if np.any(~np.isnan(row)) else np.nan for row in moves])
+    observed = np.sum(~np.isnan(raw), axis=1)
+    last_seen = [dates[int(np.flatnonzero(~np.isnan(row))[-1])] for row in raw]
+
+    summary = [{
+        'market': market,
+        'label': MARKET_LABELS.get(market, market),
+        'latest_price': _round(latest[i]),
+        'latest_date': last_seen[i].isoformat(),
+        'ma_7': _round(ma_7[i]),
+        'ma_30': _round(ma_30[i]),
+        'wow_change_pct': _round(wow[i], 1),
+        'volatility_pct': _round(volatility[i], 1),
+        'observations': int(observed[i]),
+    } for i, market in enumerate(markets)]
+
+    # Pairwise spreads from the latest price matrix: spread[i, j] = price_i - price_j.
+    spread = latest[:, None] - latest[None, :]
+    spreads = []
+    for i, j in zip(*np.triu_indices(len(markets), k=1)):
+        if np.isnan(spread[i, j]):
+            continue
+        high, low = (i, j) if spread[i, j] >= 0 else (j, i)
+        spreads.append({
+            'high_market': markets[high],
+            'high_label': MARKET_LABELS.get(markets[high], markets[high]),
+            'low_market': markets[low],
+            'low_label': MARKET_LABELS.get(markets[low], markets[low]),
+            'spread': _round(abs(spread[i, j])),
+            'spread_pct': _round(abs(spread[i, j]) / latest[low] * 100, 1),
+        })
+    spreads.sort(key=lambda row: row['spread'], reverse=True)
+
+    tail = filled[:, -SERIES_DAYS:]
+    return {
+        **header,
+        'markets': summary,
+        'spreads': spreads,
+        'series': {
+            'dates': [day.isoformat() for day in dates[-SERIES_DAYS:]],
+            'prices': {market: [_round(value) for value in tail[i]] for i, market in enumerate(markets)},
+        },
+    }
+
+
+def price_analytics(product):
+    """Cached trend and spread analytics for ``product``'s commodity across all markets."""
+    commodity_key = commodity_key_for(product)
+    key = _cache_key(commodity_key)
+    result = cache.get(key)
+    if result is None:
+        result = compute(commodity_key)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,200 @@
+"""
+Bulk import of market price bulletins into MarketPriceIndex.
+
+Rows are streamed from CSV (or XLSX, when openpyxl is installed), validated
+against ``MarketPriceIndex.MARKETS`` and upserted in batches with
+``bulk_create(update_conflicts=True)`` on (market, product_name,
+recorded_date). bulk_create skips ``save()`` and signals, so commodity keys
+are set here and MarketCoverage is rebuilt once at the end instead of per
+row.
+"""
+
+import csv
+import io
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import islice
+
+from django.db import transaction
+
+from .catalog import commodity_key_for
+from .models import MarketPriceIndex
+from .summaries import rebuild_market_coverage
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # pragma: no cover - optional dependency
+    load_workbook = None
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 50
+
+HEADER_ALIASES = {
+    'market': 'market', 'market_name': 'market',
+    'product': 'product_name', 'product_name': 'product_name', 'commodity': 'product_name',
+    'price': 'price_per_kg', 'price_per_kg': 'price_per_kg', 'price_kg': 'price_per_kg',
+    'wholesale_price': 'price_per_kg',
+    'date': 'recorded_date', 'recorded_date': 'recorded_date', 'bulletin_date': 'recorded_date',
+}
+REQUIRED_COLUMNS = {'market', 'product_name', 'price_per_kg', 'recorded_date'}
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d %b %Y', '%d %B %Y']
+
+
+def _market_lookup():
+    """
+    Accept market keys, full labels, the bare market name ("Wakulima") or the
+    town ("Nakuru") when only one market is in it; Nairobi stays ambiguous.
+    """
+    lookup = {}
+    towns = {}
+    for key, label in MarketPriceIndex.MARKETS:
+        name, town = (part.strip().lower() for part in label.split(',', 1))
+        lookup[key] = key
+        lookup[label.lower()] = key
+        lookup[name] = key
+        lookup[name.replace(' market', '')] = key
+        towns.setdefault(town, []).append(key)
+    for town, keys in towns.items():
+        if len(keys) == 1:
+            lookup.setdefault(town, keys[0])
+    return lookup
+
+
+MARKET_LOOKUP = _market_lookup()
+
+
+class BulletinError(ValueError):
+    """Raised for files that cannot be imported at all (bad header, unknown format)."""
+
+
+def _field_for(name):
+    """Map a header cell to a field: exact alias first, then by leading word ("Price (KES/kg)")."""
+    normalized = re.sub(r'[^a-z]+', '_', str(name or '').strip().lower()).strip('_')
+    return HEADER_ALIASES.get(normalized) or HEADER_ALIASES.get(normalized.split('_')[0])
+
+
+def _header_map(header):
+    columns = {}
+    for index, name in enumerate(header):
+        field = _field_for(name)
+        if field and field not in columns:
+            columns[field] = index
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise BulletinError(f'Missing column(s): {", ".join(sorted(missing))}')
+    return columns
+
+
+def _rows_from_csv(handle):
+    return csv.reader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline=''))
+
+
+def _rows_from_xlsx(handle):
+    if load_workbook is None:
+        raise BulletinError('XLSX import needs openpyxl; install it or export the bulletin as CSV')
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    return workbook.active.iter_rows(values_only=True)
+
+
+def read_rows(handle, filename):
+    """Yield raw rows (header first) from a CSV or XLSX file opened in binary mode."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        return _rows_from_xlsx(handle)
+    if filename.lower().endswith(('.csv', '.txt')):
+        return _rows_from_csv(handle)
+    raise BulletinError(f'Unsupported file type: {filename}')
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _parse_date_text(str(value or '').strip())
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(text):
+    # A bulletin repeats a handful of dates thousands of times; strptime is slow.
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognised date "{text}"')
+
+
+def _parse_price(value):
+    if isinstance(value, (int, float, Decimal)):
+        price = Decimal(str(value))
+    else:
+        try:
+            price = Decimal(re.sub(r'[^0-9.\-]', '', str(value or '')))
+        except InvalidOperation:
+            raise ValueError(f'invalid price "{value}"') from None
+    if not price.is_finite() or price <= 0 or price >= Decimal('1000000'):
+        raise ValueError(f'price out of range "{value}"')
+    return price.quantize(Decimal('0.01'))
+
+
+def parse(rows):
+    """Yield ((market, product, date), price) or (line number, error) for each data row."""
+    rows = iter(rows)
+    columns = _header_map(next(rows, None) or [])
+    for line, row in enumerate(rows, start=2):
+        if not row or all(cell in (None, '') for cell in row):
+            continue
+        try:
+            cells = {field: row[index] if index < len(row) else None for field, index in columns.items()}
+            market = MARKET_LOOKUP.get(str(cells['market'] or '').strip().lower())
+            if market is None:
+                raise ValueError(f'unknown market "{cells["market"]}"')
+            product = ' '.join(str(cells['product_name'] or '').split())[:100]
+            if not product:
+                raise ValueError('missing product')
+            yield (market, product, _parse_date(cells['recorded_date'])), _parse_price(cells['price_per_kg'])
+        except ValueError as exc:
+            yield line, str(exc)
+
+
+def _upsert(batch):
+    MarketPriceIndex.objects.bulk_create(
+        [MarketPriceIndex(market=market, product_name=product, recorded_date=day, price_per_kg=price,
+                          commodity_key=commodity_key_for(product))
+         for (market, product, day), price in batch.items()],
+        update_conflicts=True,
+        unique_fields=['market', 'product_name', 'recorded_date'],
+        update_fields=['price_per_kg', 'commodity_key', 'updated_at'],   # updated_at versions cached analytics
+    )
+
+
+def import_prices(handle, filename, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import one bulletin file and return a summary dict.
+
+    Each batch is deduplicated on (market, product, date), last row wins, and
+    upserted in its own statement; the whole file commits atomically.
+    """
+    result = {'rows': 0, 'upserted': 0, 'rejected': 0, 'errors': []}
+    parsed = parse(read_rows(handle, filename))
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(parsed, batch_size))
+            if not chunk:
+                break
+            batch = {}
+            for key, value in chunk:
+                result['rows'] += 1
+                if isinstance(key, int):
+                    result['rejected'] += 1
+                    if len(result['errors']) < MAX_REPORTED_ERRORS:
+                        result['errors'].append(f'line {key}: {value}')
+                    continue
+                batch[key] = value
+            if batch:
+                _upsert(batch)
+                result['upserted'] += len(batch)
+        transaction.on_commit(rebuild_market_coverage)
+    return result
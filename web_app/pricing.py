@@ -0,0 +1,107 @@
+"""
+Fair-price bands for farmers listing produce.
+
+``compute_bands`` runs nightly (``manage.py compute_price_bands``) and stores
+one PriceBand per commodity and market region: the interquartile range of
+recent wholesale prices at that market, less the typical transport cost into
+it and the platform fee, i.e. the farm-gate price at which a listing stays
+competitive with the market. The listing form only reads the stored row.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .catalog import commodity_key_for
+from .geo import MARKET_LOCATIONS, haversine_km, markets_by_distance
+from .models import LogisticsRoute, MarketPriceIndex, PriceBand, PriceHistory
+
+WINDOW_DAYS = 30
+ROUTE_RADIUS_KM = 30  # a route "serves" a market when it ends this close to it
+
+_CENTS = Decimal('0.01')
+
+
+def _money(value):
+    return Decimal(str(max(value, 0))).quantize(_CENTS)
+
+
+def transport_costs():
+    """{market: mean base_cost_per_kg of active routes ending near it}, plus a fallback for the rest."""
+    routes = list(LogisticsRoute.objects.filter(is_active=True).values_list(
+        'destination_latitude', 'destination_longitude', 'base_cost_per_kg'))
+    fallback = float(np.median([float(cost) for _, _, cost in routes])) if routes else 0.0
+    costs = {}
+    for market, (lat, lon) in MARKET_LOCATIONS.items():
+        nearby = [float(cost) for dest_lat, dest_lon, cost in routes
+                  if haversine_km(lat, lon, dest_lat, dest_lon) <= ROUTE_RADIUS_KM]
+        costs[market] = float(np.mean(nearby)) if nearby else fallback
+    return costs
+
+
+def compute_bands(window_days=WINDOW_DAYS):
+    """Recompute every PriceBand; returns the number of bands stored."""
+    fee = 1 + float(settings.PLATFORM_FEE_RATE)
+    transport = transport_costs()
+
+    # The window ends at each pair's latest observation so sparse series still get a band.
+    # One GROUP BY (served by the commodity/market/date index) finds those dates; rows are
+    # then read once from the earliest window start and trimmed per pair here.
+    rows = MarketPriceIndex.objects.exclude(commodity_key='')
+    starts = {(commodity, market): as_of - timedelta(days=window_days) for commodity, market, as_of in
+              rows.values('commodity_key', 'market').annotate(as_of=Max('recorded_date'))
+              .values_list('commodity_key', 'market', 'as_of').order_by()}
+    if not starts:
+        window = rows.none()
+    else:
+        window = rows.filter(recorded_date__gt=min(starts.values())).order_by()
+    prices = {}
+    for commodity, market, day, price in window.values_list(
+            'commodity_key', 'market', 'recorded_date', 'price_per_kg').iterator(chunk_size=5000):
+        if day > starts[commodity, market]:
+            prices.setdefault((commodity, market), []).append((day, float(price)))
+
+    bands = []
+    for (commodity, market), rows in prices.items():
+        as_of = max(day for day, _ in rows)
+        recent = np.array([price for _, price in rows])
+        p25, median, p75 = np.percentile(recent, [25, 50, 75])
+        cost = transport.get(market, 0.0)
+        bands.append(PriceBand(
+            commodity_key=commodity,
+            market=market,
+            market_price=_money(median),
+            transport_cost_per_kg=_money(cost),
+            low_price=_money((p25 - cost) / fee),
+            suggested_price=_money((median - cost) / fee),
+            high_price=_money((p75 - cost) / fee),
+            sample_size=len(recent),
+            as_of=as_of,
+        ))
+
+    with transaction.atomic():
+        PriceBand.objects.all().delete()
+        PriceBand.objects.bulk_create(bands, batch_size=1000)
+    return len(bands)
+
+
+def band_for(farm, product_name):
+    """The PriceBand for ``product_name`` at the market nearest ``farm`` that has one, or None."""
+    bands = {band.market: band for band in PriceBand.objects.filter(commodity_key=commodity_key_for(product_name))}
+    nearest = markets_by_distance(farm.latitude, farm.longitude, bands)
+    return bands[nearest[0][1]] if nearest else None
+
+
+def record_suggestion(product, band):
+    """Log the listing price next to the market price it was suggested against."""
+    return PriceHistory.objects.create(
+        product=product,
+        price=product.price_per_unit,
+        market_price=band.market_price if band else None,
+        notes=(f'Suggested KES {band.low_price}–{band.high_price}/kg ({band.get_market_display()}, {band.as_of})'
+               if band else 'No market price band available'),
+    )
@@ -0,0 +1,131 @@
+"""
+Product recommendations for buyers.
+
+``build`` runs as a nightly batch (``manage.py compute_recommendations``).
+Items are commodities rather than individual listings, because listings sell
+out and get relisted while a buyer's interest in "avocado" carries over:
+
+* a buyer × commodity matrix of purchases, each weighted by recency
+  (half-life ``HALF_LIFE_DAYS``);
+* an item-item cosine similarity over which buyers bought which
+  commodities, built from the sparse co-occurrence matrix;
+* buyer affinity = purchases @ (similarity + repeat-purchase weight), plus a
+  small platform-wide popularity term so new buyers still get a list.
+
+Each available product is scored by its commodity's affinity, discounted by
+the distance from the farm to the buyer, and the top ``TOP_N`` product ids
+per buyer are stored in BuyerRecommendation. The dashboard only reads that
+buyer's row.
+"""
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .geo import distances_km
+from .models import BuyerRecommendation, OrderItem, Product, User
+
+HALF_LIFE_DAYS = 60
+PROXIMITY_KM = 150          # distance decay scale: a farm this far away keeps ~37% of its score
+REPEAT_WEIGHT = 0.5         # weight of buying the same commodity again vs. a similar one
+POPULARITY_WEIGHT = 0.1
+FRESHNESS_WEIGHT = 0.05     # nudges brand-new listings of commodities nobody has ordered yet
+TOP_N = 12
+BUYER_CHUNK = 500
+EXCLUDED_ORDER_STATUSES = ['draft', 'cancelled']
+
+
+def _item(commodity_key, product_id):
+    return commodity_key or f'product:{product_id}'
+
+
+def similarity(purchases):
+    """Item-item cosine similarity (sparse, zero diagonal) from a buyer × item purchase matrix."""
+    bought = (purchases > 0).astype(float)
+    co_occurrence = (bought.T @ bought).tocsr()
+    counts = co_occurrence.diagonal()
+    norm = sparse.diags_array(np.divide(1.0, np.sqrt(counts), out=np.zeros_like(counts), where=counts > 0))
+    similar = (norm @ co_occurrence @ norm).tocsr()
+    similar.setdiag(0)
+    similar.eliminate_zeros()
+    return similar
+
+
+def build(top_n=TOP_N, now=None):
+    """Recompute and store the top-N product ids of every active buyer; returns the number of buyers."""
+    now = now or timezone.now()
+    buyers = list(User.objects.filter(role='buyer', is_active=True).values_list('id', 'latitude', 'longitude'))
+    products = list(Product.objects
+                    .filter(status='available', quantity_available__gt=0, farm__is_active=True)
+                    .values_list('id', 'commodity_key', 'farm__latitude', 'farm__longitude', 'created_at'))
+    if not buyers:
+        BuyerRecommendation.objects.all().delete()
+        return 0
+
+    buyer_index = {buyer_id: i for i, (buyer_id, _, _) in enumerate(buyers)}
+    items = {}
+    rows, cols, weights = [], [], []
+    for buyer_id, product_id, commodity_key, ordered_at in (
+            OrderItem.objects.exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+            .filter(order__buyer_id__in=buyer_index)
+            .values_list('order__buyer_id', 'product_id', 'product__commodity_key', 'order__created_at')):
+        rows.append(buyer_index[buyer_id])
+        cols.append(items.setdefault(_item(commodity_key, product_id), len(items)))
+        weights.append(0.5 ** ((now - ordered_at).days / HALF_LIFE_DAYS))
+
+    # One extra all-zero column for products whose commodity nobody has ordered.
+    purchases = sparse.csr_array((weights, (rows, cols)), shape=(len(buyers), len(items) + 1))
+    affinity = (purchases @ (similarity(purchases) + REPEAT_WEIGHT * sparse.eye_array(len(items) + 1))).tocsr()
+    popularity = purchases.sum(axis=0)
+    popularity = popularity / (popularity.max() or 1)
+
+    recommendations = {}
+    if products:
+        product_ids = np.array([p[0] for p in products])
+        product_cols = np.array([items.get(_item(p[1], p[0]), len(items)) for p in products])
+        product_lat = np.array([float(p[2]) for p in products])
+        product_lon = np.array([float(p[3]) for p in products])
+        age_days = np.array([(now - p[4]).days for p in products])
+        baseline = POPULARITY_WEIGHT * popularity[product_cols] + FRESHNESS_WEIGHT * 0.5 ** (age_days / 7)
+        top = min(top_n, len(products))
+
+        for start in range(0, len(buyers), BUYER_CHUNK):
+            chunk = buyers[start:start + BUYER_CHUNK]
+            scores = affinity[start:start + len(chunk)].toarray()[:, product_cols]
+            scores /= np.maximum(scores.max(axis=1, keepdims=True), 1e-9)
+            scores += baseline
+
+            located = np.array([lat is not None and lon is not None for _, lat, lon in chunk])
+            if located.any():
+                lat = np.array([float(b[1]) for b in chunk if b[1] is not None and b[2] is not None])
+                lon = np.array([float(b[2]) for b in chunk if b[1] is not None and b[2] is not None])
+                distance = distances_km(lat[:, None], lon[:, None], product_lat[None, :], product_lon[None, :])
+                scores[located] *= np.exp(-distance / PROXIMITY_KM)
+
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            ranked = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1), axis=1)
+            for (buyer_id, _, _), order in zip(chunk, ranked):
+                recommendations[buyer_id] = product_ids[order].tolist()
+    else:
+        recommendations = {buyer_id: [] for buyer_id, _, _ in buyers}
+
+    with transaction.atomic():
+        BuyerRecommendation.objects.all().delete()
+        BuyerRecommendation.objects.bulk_create(
+            [BuyerRecommendation(buyer_id=buyer_id, product_ids=ids) for buyer_id, ids in recommendations.items()],
+            batch_size=1000)
+    return len(buyers)
+
+
+def recommended_products(user, limit=6):
+    """The buyer's stored recommendations that are still available, topped up with the newest listings."""
+    available = Product.objects.filter(status='available').select_related('farm')
+    product_ids = BuyerRecommendation.objects.filter(buyer=user).values_list('product_ids', flat=True).first()
+    if not product_ids:
+        return list(available.order_by('-created_at')[:limit])
+    in_stock = available.in_bulk(product_ids[:limit * 2])
+    products = [in_stock[pk] for pk in product_ids if pk in in_stock][:limit]
+    if len(products) < limit:
+        products += available.exclude(pk__in=[p.pk for p in products]).order_by('-created_at')[:limit - len(products)]
+    return products
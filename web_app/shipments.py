@@ -0,0 +1,76 @@
+"""
+Shipment status changes shared by the driver form and the JSON API.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Shipment, ShipmentTracking
+
+STATUSES = {key for key, _ in Shipment.STATUS_CHOICES}
+FINAL_STATUSES = {'delivered', 'failed'}
+
+
+def _reading(value, name, low, high, places):
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'{name} must be a number') from None
+    if not number.is_finite() or not low <= number <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return number.quantize(Decimal(1).scaleb(-places))
+
+
+def clean_fix(latitude=None, longitude=None, speed_kmh=None):
+    """
+    (latitude, longitude, speed_kmh) as Decimals that fit ShipmentTracking, None where not given.
+
+    Raises ValueError for anything malformed, non-finite or out of range.
+    """
+    return (_reading(latitude, 'latitude', -90, 90, 6),
+            _reading(longitude, 'longitude', -180, 180, 6),
+            _reading(speed_kmh, 'speed_kmh', 0, 999, 2))
+
+
+def track(shipment, latitude=None, longitude=None, speed_kmh=None, note='', at=None):
+    """Log a tracking point for ``shipment``, timestamped ``at`` (e.g. a fix recorded offline)."""
+    event = ShipmentTracking.objects.create(
+        shipment=shipment,
+        latitude=latitude or 0,
+        longitude=longitude or 0,
+        speed_kmh=speed_kmh or 0,
+        status_note=note,
+    )
+    if at is not None:
+        # timestamp is auto_now_add, so a device time has to be written afterwards.
+        ShipmentTracking.objects.filter(pk=event.pk).update(timestamp=at)
+        event.timestamp = at
+    return event
+
+
+@transaction.atomic
+def update_status(shipment, status, latitude=None, longitude=None, speed_kmh=None, photo=None, at=None):
+    """
+    Move ``shipment`` to ``status``, stamping pickup/delivery times, and log a tracking point.
+
+    ``photo`` (a File) is stored as the proof of delivery when the new status is delivered.
+    """
+    if status not in STATUSES:
+        raise ValueError(f'Unknown shipment status "{status}"')
+    latitude, longitude, speed_kmh = clean_fix(latitude, longitude, speed_kmh)
+    when = at or timezone.now()
+    shipment.status = status
+    if status == 'picked_up':
+        shipment.actual_pickup = when
+    if status == 'delivered':
+        shipment.actual_delivery = when
+        if photo is not None:
+            shipment.proof_of_delivery_photo = photo
+    shipment.save()
+
+    track(shipment, latitude, longitude, speed_kmh, f'Status updated to {shipment.get_status_display()}', at=at)
+    return shipment
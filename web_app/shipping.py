@@ -0,0 +1,168 @@
+"""
+Shipping quotes for orders.
+
+A quote is priced from the LogisticsRoute that best matches the trip (its
+``base_cost_per_kg``), or from the network's median cost per kg-km over the
+road distance when no route fits, then adjusted for the vehicle class the
+load needs and a cold-chain surcharge.
+
+Origins and destinations are snapped to ~11 km grid cells and weights to
+bands, and the per-kg rate for each (origin cell, destination cell, weight
+band, cold flag) is memoised with an LRU cache, so the order form can ask for
+a fresh quote on every keystroke. The cache is per process, so every entry is
+keyed on a version stamp of the route table (row count and latest
+``updated_at``); a route saved or deleted in any process changes the stamp and
+the stale entries simply stop being hit.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+import numpy as np
+
+from django.db.models import Count, Max
+
+from .catalog import requires_cold_chain
+from .geo import MARKET_LOCATIONS, distances_km, haversine_km
+from .models import LogisticsRoute
+
+CELL_DEGREES = 0.1
+ROAD_FACTOR = 1.3              # road distance vs. great-circle distance
+ROUTE_MATCH_RADIUS_KM = 25     # a route serves trips starting and ending this close to its ends
+COLD_CHAIN_SURCHARGE = 0.35
+DEFAULT_DESTINATION = MARKET_LOCATIONS['nairobi_wakulima']
+
+WEIGHT_BANDS_KG = [50, 250, 1000, 3000, 7000, 15000]
+
+# vehicle class: (rate multiplier, minimum charge in KES)
+VEHICLE_CLASSES = {
+    'motorcycle': (1.4, 250),
+    'pickup': (1.15, 1500),
+    'truck_small': (1.0, 4000),
+    'truck_medium': (0.9, 8000),
+    'truck_large': (0.8, 15000),
+    'refrigerated': (1.0, 6000),
+}
+
+# Approximate kg per Product.unit, for units that are not already weights.
+UNIT_WEIGHTS_KG = {'kg': 1, 'tonne': 1000, 'crate': 25, 'bag': 90, 'litre': 1.03, 'dozen': 0.7, 'unit': 1}
+
+
+def cell(latitude, longitude):
+    return round(float(latitude) / CELL_DEGREES), round(float(longitude) / CELL_DEGREES)
+
+
+def _cell_centre(grid_cell):
+    return grid_cell[0] * CELL_DEGREES, grid_cell[1] * CELL_DEGREES
+
+
+def weight_band(weight_kg):
+    """Smallest band holding ``weight_kg``; heavier loads round up to whole large-truck loads."""
+    for band in WEIGHT_BANDS_KG:
+        if weight_kg <= band:
+            return band
+    top = WEIGHT_BANDS_KG[-1]
+    return top * -(-int(weight_kg) // top)
+
+
+def vehicle_class(band, cold):
+    if cold:
+        return 'refrigerated'
+    if band <= 50:
+        return 'motorcycle'
+    if band <= 1000:
+        return 'pickup'
+    if band <= 3000:
+        return 'truck_small'
+    if band <= 7000:
+        return 'truck_medium'
+    return 'truck_large'
+
+
+def routes_version():
+    """Stamp that changes whenever a route is added, edited or deleted."""
+    stamp = LogisticsRoute.objects.aggregate(rows=Count('id'), changed=Max('updated_at'))
+    return stamp['rows'], stamp['changed'].timestamp() if stamp['changed'] else 0
+
+
+@lru_cache(maxsize=1)
+def _network(version):
+    """Active routes as NumPy arrays, loaded once per routes version."""
+    rows = list(LogisticsRoute.objects.filter(is_active=True).values_list(
+        'id', 'name', 'origin_latitude', 'origin_longitude', 'destination_latitude', 'destination_longitude',
+        'distance_km', 'base_cost_per_kg', 'is_cold_chain_available'))
+    if not rows:
+        return {'ids': [], 'names': [], 'coords': np.empty((0, 4)), 'distance': np.empty(0), 'rate': np.empty(0),
+                'cold': np.empty(0, dtype=bool), 'rate_per_km': 0.02}
+    coords = np.array([[float(v) for v in row[2:6]] for row in rows])
+    distance = np.array([float(row[6]) for row in rows])
+    rate = np.array([float(row[7]) for row in rows])
+    return {
+        'ids': [row[0] for row in rows],
+        'names': [row[1] for row in rows],
+        'coords': coords,
+        'distance': distance,
+        'rate': rate,
+        'cold': np.array([row[8] for row in rows]),
+        'rate_per_km': float(np.median(rate / np.maximum(distance, 1))),
+    }
+
+
+@lru_cache(maxsize=4096)
+def route_rate(origin_cell, destination_cell, band, cold, version):
+    """(rate per kg, minimum charge, distance km, (route id, name) or None, vehicle class) for one cache key."""
+    network = _network(version)
+    origin, destination = _cell_centre(origin_cell), _cell_centre(destination_cell)
+    direct_km = haversine_km(*origin, *destination) * ROAD_FACTOR
+
+    route, distance_km, rate = None, direct_km, network['rate_per_km'] * direct_km
+    if network['names']:
+        coords = network['coords']
+        slack = (distances_km(*origin, coords[:, 0], coords[:, 1])
+                 + distances_km(*destination, coords[:, 2], coords[:, 3]))
+        usable = slack <= 2 * ROUTE_MATCH_RADIUS_KM
+        if cold:
+            usable &= network['cold']
+        if usable.any():
+            best = int(np.argmin(np.where(usable, slack, np.inf)))
+            route = network['ids'][best], network['names'][best]
+            distance_km = float(network['distance'][best])
+            rate = float(network['rate'][best])
+
+    vehicle = vehicle_class(band, cold)
+    multiplier, minimum = VEHICLE_CLASSES[vehicle]
+    rate *= multiplier * ((1 + COLD_CHAIN_SURCHARGE) if cold else 1)
+    return rate, minimum, distance_km, route, vehicle
+
+
+def quote(origin, destination, weight_kg, cold=False):
+    """
+    Shipping quote for ``weight_kg`` from ``origin`` to ``destination`` ((lat, lon) pairs).
+
+    Returns a JSON-serialisable dict; ``cost`` is in KES.
+    """
+    weight_kg = max(float(weight_kg), 0.0)
+    band = weight_band(weight_kg)
+    rate, minimum, distance_km, route, vehicle = route_rate(cell(*origin), cell(*destination), band, bool(cold),
+                                                            routes_version())
+    cost = Decimal(str(max(weight_kg * rate, minimum))).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+    return {
+        'cost': cost,
+        'rate_per_kg': round(rate, 4),
+        'weight_kg': round(weight_kg, 2),
+        'weight_band_kg': band,
+        'distance_km': round(distance_km, 1),
+        'vehicle_class': vehicle,
+        'cold_chain': bool(cold),
+        'route': route[1] if route else None,
+        'route_id': route[0] if route else None,
+    }
+
+
+def quote_for_product(product, quantity, destination=None):
+    """Quote for ``quantity`` of ``product`` from its farm to ``destination`` (default: Nairobi)."""
+    weight_kg = float(quantity) * UNIT_WEIGHTS_KG.get(product.unit, 1)
+    cold = (product.category.requires_cold_chain if product.category else False) \
+        or requires_cold_chain(product.commodity_key)
+    farm = product.farm
+    return quote((farm.latitude, farm.longitude), destination or DEFAULT_DESTINATION, weight_kg, cold)
@@ -0,0 +1,142 @@
+from datetime import date
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .images import IMAGE_FIELDS
+from .jobs import enqueue_debounced, enqueue_on_commit
+from .metrics import schedule_refresh
+from .notifications import recount as recount_unread
+from .planner import schedule_replan
+from .storage import reconcile as reconcile_media, untrack as untrack_media
+from .models import (
+    HarvestSchedule, MarketPriceIndex, Notification, Order, PostHarvestLossReport, Shipment,
+    TemperatureExcursion, TemperatureLog,
+)
+from .summaries import month_start
+
+
+@receiver(post_save, sender=TemperatureLog)
+def temperature_log_saved(sender, instance, created, **kwargs):
+    if created:
+        enqueue_on_commit('cold_chain.process_reading', {'log_id': instance.pk},
+                          key=f'temperature-log:{instance.pk}')
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, **kwargs):
+    schedule_refresh(instance.created_at, instance.completed_at)
+
+
+@receiver(post_save, sender=Shipment)
+def shipment_saved(sender, instance, **kwargs):
+    schedule_refresh(instance.actual_pickup, instance.actual_delivery)
+
+
+@receiver(post_save, sender=TemperatureExcursion)
+def excursion_saved(sender, instance, **kwargs):
+    schedule_refresh(instance.notified_at)
+
+
+def _as_date(value):
+    # Views assign raw POST strings to date fields; they stay strings on the instance.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _remember_original(instance, *fields):
+    """Stash the stored values of ``fields`` so post_save can refresh the old group too."""
+    if instance.pk:
+        instance._original = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=PostHarvestLossReport)
+def loss_report_changing(sender, instance, **kwargs):
+    _remember_original(instance, 'farm_id', 'incident_date')
+
+
+@receiver(post_save, sender=PostHarvestLossReport)
+@receiver(post_delete, sender=PostHarvestLossReport)
+def loss_report_changed(sender, instance, **kwargs):
+    groups = {(instance.farm_id, month_start(_as_date(instance.incident_date)))}
+    original = getattr(instance, '_original', None)
+    if original:
+        groups.add((original['farm_id'], month_start(original['incident_date'])))
+    for farm_id, month in groups:
+        enqueue_debounced('summaries.refresh_losses', {'farm_id': farm_id, 'month': month.isoformat()},
+                          key=f'loss-summary:{farm_id}:{month.isoformat()}')
+
+
+@receiver(pre_save, sender=MarketPriceIndex)
+def market_price_changing(sender, instance, **kwargs):
+    _remember_original(instance, 'market', 'product_name')
+
+
+@receiver(post_save, sender=MarketPriceIndex)
+@receiver(post_delete, sender=MarketPriceIndex)
+def market_price_changed(sender, instance, **kwargs):
+    pairs = {(instance.market, instance.product_name)}
+    original = getattr(instance, '_original', None)
+    if original:
+        pairs.add((original['market'], original['product_name']))
+    for market, product_name in pairs:
+        enqueue_debounced('summaries.refresh_market_coverage', {'market': market, 'product_name': product_name},
+                          key=f'market-coverage:{market}:{product_name}')
+
+
+@receiver(pre_save, sender=HarvestSchedule)
+def harvest_changing(sender, instance, **kwargs):
+    _remember_original(instance, 'ready_for_pickup_date')
+
+
+@receiver(post_save, sender=HarvestSchedule)
+@receiver(post_delete, sender=HarvestSchedule)
+def harvest_changed(sender, instance, **kwargs):
+    original = getattr(instance, '_original', None)
+    schedule_replan(_as_date(instance.ready_for_pickup_date), original and original['ready_for_pickup_date'])
+
+
+@receiver(pre_save, sender=Notification)
+def notification_changing(sender, instance, **kwargs):
+    _remember_original(instance, 'user_id')
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, **kwargs):
+    # Single saves (the admin's is_read toggle) recount; deliver and mark_read move the counter themselves.
+    original = getattr(instance, '_original', None)
+    for user_id in {instance.user_id, original and original['user_id']} - {None}:
+        recount_unread(user_id)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # No new counter row: in a user's cascade delete it would point at the row being deleted.
+    recount_unread(instance.user_id, create=False)
+
+
+def image_changing(sender, instance, **kwargs):
+    # A freshly assigned upload is still uncommitted here; FileField writes it during save().
+    instance._new_images = [field for field in IMAGE_FIELDS[sender]
+                            if getattr(instance, field) and not getattr(instance, field)._committed]
+
+
+def image_changed(sender, instance, update_fields=None, **kwargs):
+    # Every save, not just uploads: a cleared field or a name set in code must move its reference too.
+    fields = [field for field in IMAGE_FIELDS[sender] if update_fields is None or field in update_fields]
+    if fields:
+        reconcile_media(instance, fields)
+    for field in getattr(instance, '_new_images', ()):
+        name = getattr(instance, field).name
+        # No idempotency key: a deduplicated re-upload of an already cleaned blob must still be repointed.
+        enqueue_on_commit('images.render', {'name': name})
+    instance._new_images = []
+
+
+def image_owner_deleted(sender, instance, **kwargs):
+    untrack_media(instance)
+
+
+for _model in IMAGE_FIELDS:
+    pre_save.connect(image_changing, sender=_model, dispatch_uid=f'image_changing:{_model.__name__}')
+    post_save.connect(image_changed, sender=_model, dispatch_uid=f'image_changed:{_model.__name__}')
+    post_delete.connect(image_owner_deleted, sender=_model, dispatch_uid=f'image_owner_deleted:{_model.__name__}')
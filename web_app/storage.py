@@ -0,0 +1,188 @@
+"""
+Content-addressed media storage.
+
+Every photo field stores its uploads through ``ContentAddressedStorage``:
+the file is hashed in chunks while it streams in and saved as
+``cas/<aa>/<bb>/<sha256><ext>``. A second upload of the same bytes (the same
+delivery photo sent twice, one photo reused across listings) is not written
+again; it resolves to the existing file.
+
+MediaBlob records each stored file and MediaReference each model field
+pointing at one. Every save reconciles the instance's references with the
+names its fields hold (``reconcile``), so clearing a field or assigning an
+existing name drops or moves the reference too; deletes ``untrack``.
+``collect_garbage`` (``manage.py gc_media``) deletes blobs that
+have been unreferenced for longer than a grace period, together with their
+renditions.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+PREFIX = 'cas/'
+GC_GRACE = timedelta(hours=24)   # time for an upload's model row to be saved before its blob counts as garbage
+
+
+def content_hash(content, chunk_size=64 * 1024):
+    """SHA-256 hex digest of a Django File, read chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content and never stores the same bytes twice."""
+
+    def _save(self, name, content):
+        MediaBlob = apps.get_model('web_app', 'MediaBlob')
+        sha256 = content_hash(content)
+        ext = os.path.splitext(name)[1].lower()[:10]
+        target = f'{PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+        blob = MediaBlob.objects.filter(sha256=sha256).first()
+        if blob is not None and self.exists(blob.name):
+            # Bump the upload time so a concurrent gc_media run leaves this blob alone.
+            MediaBlob.objects.filter(pk=blob.pk).update(last_uploaded_at=timezone.now())
+            return blob.name
+        if not self.exists(target):
+            target = super()._save(target, content)
+        MediaBlob.objects.update_or_create(
+            sha256=sha256, defaults={'name': target, 'size': content.size, 'last_uploaded_at': timezone.now()},
+        )
+        return target
+
+
+_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage for upload fields (a callable, so migrations don't serialise the instance)."""
+    return _storage
+
+
+def _label(instance):
+    return instance._meta.label_lower
+
+
+def track(instance, field):
+    """Point the reference for ``instance.field`` at the blob it now stores (or drop it)."""
+    MediaBlob = apps.get_model('web_app', 'MediaBlob')
+    MediaReference = apps.get_model('web_app', 'MediaReference')
+    name = getattr(instance, field).name
+    blob = MediaBlob.objects.filter(name=name).first() if is_content_addressed(name) else None
+    lookup = {'model': _label(instance), 'object_id': instance.pk, 'field': field}
+    if blob is None:
+        MediaReference.objects.filter(**lookup).delete()
+    else:
+        MediaReference.objects.update_or_create(**lookup, defaults={'blob': blob})
+
+
+def reconcile(instance, fields):
+    """Re-track those of ``fields`` whose reference no longer matches the stored name; one query if none."""
+    MediaReference = apps.get_model('web_app', 'MediaReference')
+    referenced = dict(MediaReference.objects.filter(model=_label(instance), object_id=instance.pk)
+                      .values_list('field', 'blob__name'))
+    for field in fields:
+        name = getattr(instance, field).name
+        if referenced.get(field) != (name if is_content_addressed(name) else None):
+            track(instance, field)
+
+
+def untrack(instance):
+    MediaReference = apps.get_model('web_app', 'MediaReference')
+    MediaReference.objects.filter(model=_label(instance), object_id=instance.pk).delete()
+
+
+@transaction.atomic
+def repoint(old_name, new_name):
+    """Move every field and reference from blob ``old_name`` to blob ``new_name``; returns rows updated."""
+    MediaBlob = apps.get_model('web_app', 'MediaBlob')
+    MediaReference = apps.get_model('web_app', 'MediaReference')
+    new_blob = MediaBlob.objects.get(name=new_name)
+    references = MediaReference.objects.filter(blob__name=old_name)
+    groups = {}
+    for model, field, object_id in references.values_list('model', 'field', 'object_id'):
+        groups.setdefault((model, field), []).append(object_id)
+    updated = 0
+    for (model, field), object_ids in groups.items():
+        model = apps.get_model(model)
+        changes = {field: new_name}
+        if any(f.name == 'updated_at' for f in model._meta.fields):
+            changes['updated_at'] = timezone.now()  # so the change feed sends the new photo URL
+        updated += model.objects.filter(pk__in=object_ids, **{field: old_name}).update(**changes)
+    references.update(blob=new_blob)
+    return updated
+
+
+def discard(name, uploaded_before):
+    """
+    Delete blob ``name`` now if nothing references it and it was not re-uploaded since
+    ``uploaded_before``; returns whether it was deleted.
+
+    Used once a blob's references have been moved elsewhere, so its bytes don't wait out
+    GC_GRACE. The checks mirror ``collect_garbage``: a reference or duplicate upload that
+    lands first keeps the blob. One that resolves to the name between this DELETE and
+    the file removal is still lost, as in ``collect_garbage`` (a gap of milliseconds).
+    """
+    MediaBlob = apps.get_model('web_app', 'MediaBlob')
+    deleted, _ = MediaBlob.objects.filter(name=name, references__isnull=True,
+                                          last_uploaded_at__lt=uploaded_before).delete()
+    if deleted:
+        _storage.delete(name)
+    return bool(deleted)
+
+
+def rebuild_references(fields):
+    """Recreate every MediaReference from ``fields`` ({model: [field names]}); returns the count."""
+    MediaBlob = apps.get_model('web_app', 'MediaBlob')
+    MediaReference = apps.get_model('web_app', 'MediaReference')
+    blobs = dict(MediaBlob.objects.values_list('name', 'pk'))
+    references = []
+    for model, names in fields.items():
+        for field in names:
+            rows = model.objects.filter(**{f'{field}__startswith': PREFIX}).values_list('pk', field)
+            references.extend(
+                MediaReference(blob_id=blobs[name], model=model._meta.label_lower, object_id=pk, field=field)
+                for pk, name in rows.iterator() if name in blobs
+            )
+    with transaction.atomic():
+        MediaReference.objects.all().delete()
+        MediaReference.objects.bulk_create(references, batch_size=1000)
+    return len(references)
+
+
+def collect_garbage(grace=GC_GRACE, dry_run=False):
+    """Delete unreferenced blobs not uploaded within ``grace``, with their renditions; returns (count, bytes)."""
+    from .images import FORMATS, RENDITIONS, rendition_name
+
+    MediaBlob = apps.get_model('web_app', 'MediaBlob')
+    cutoff = timezone.now() - grace
+    candidates = MediaBlob.objects.filter(references__isnull=True, last_uploaded_at__lt=cutoff)
+    count = freed = 0
+    for blob in candidates.iterator():
+        if not dry_run:
+            # Re-checked in the DELETE so a reference or upload that arrived meanwhile keeps the blob.
+            deleted, _ = MediaBlob.objects.filter(pk=blob.pk, references__isnull=True,
+                                                  last_uploaded_at__lt=cutoff).delete()
+            if not deleted:
+                continue
+            for name in [blob.name] + [rendition_name(blob.name, size, fmt) for size in RENDITIONS for fmt in FORMATS]:
+                _storage.delete(name)
+        count += 1
+        freed += blob.size
+    return count, freed
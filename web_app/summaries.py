@@ -0,0 +1,141 @@
+"""
+Materialized analytics summaries behind the analytics dashboard.
+
+LossSummary and MarketCoverage are refreshed one small group at a time
+(a farm-month, or a market/product pair) whenever a source row changes.
+Each farm-month refresh also adds the change to LossTotal, the all-time
+totals per cause for the farm's owner and for the platform, so the loss
+overview reads one row per cause however much history there is. The
+tables are the cache: every process sees a refresh as soon as it commits.
+``rebuild_all`` recomputes everything, repairing totals after deletes of
+whole farms (which cascade without a refresh).
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+
+from .models import Farm, LossSummary, LossTotal, MarketCoverage, MarketPriceIndex, PostHarvestLossReport
+
+LOSS_FIELDS = ('report_count', 'total_kg_lost', 'total_value_lost')
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def refresh_loss_summary(farm_id, month):
+    """Rebuild the LossSummary rows of one farm for one month."""
+    month = month_start(month)
+    with transaction.atomic():
+        # Locking the farm serialises refreshes of it, so no delta is applied twice.
+        owner_id = Farm.objects.select_for_update().filter(pk=farm_id).values_list('owner_id', flat=True).first()
+        if owner_id is None:
+            return
+        groups = list(PostHarvestLossReport.objects
+                      .filter(farm_id=farm_id, incident_date__gte=month, incident_date__lt=_next_month(month))
+                      .values('primary_cause')
+                      .annotate(report_count=Count('id'), total_kg_lost=Sum('quantity_lost_kg'),
+                                total_value_lost=Sum('estimated_value_lost'))
+                      .order_by())
+        current = LossSummary.objects.filter(farm_id=farm_id, month=month)
+        deltas = {}
+        for row in current.values('primary_cause', *LOSS_FIELDS):
+            deltas[row['primary_cause']] = [-row[field] for field in LOSS_FIELDS]
+        for group in groups:
+            old = deltas.get(group['primary_cause'], [0, 0, 0])
+            deltas[group['primary_cause']] = [group[field] + delta for field, delta in zip(LOSS_FIELDS, old)]
+        current.delete()
+        LossSummary.objects.bulk_create([
+            LossSummary(farm_id=farm_id, month=month, **group) for group in groups
+        ])
+        _add_to_totals(owner_id, {cause: delta for cause, delta in deltas.items() if any(delta)})
+
+
+def _add_to_totals(owner_id, deltas):
+    """Add ``deltas`` ({cause: [reports, kg, value]}) to the owner's and the platform's LossTotal rows."""
+    for scope in (owner_id, None):
+        # Insert missing rows first, then increment, so concurrent refreshes of other farms add up.
+        LossTotal.objects.bulk_create([LossTotal(owner_id=scope, primary_cause=cause) for cause in deltas],
+                                      ignore_conflicts=True)
+        for cause, delta in deltas.items():
+            LossTotal.objects.filter(owner_id=scope, primary_cause=cause).update(
+                **{field: F(field) + value for field, value in zip(LOSS_FIELDS, delta)})
+
+
+def refresh_market_coverage(market, product_name):
+    """Rebuild the MarketCoverage row of one market/product pair."""
+    stats = MarketPriceIndex.objects.filter(market=market, product_name=product_name).aggregate(
+        price_points=Count('id'), first_recorded=Min('recorded_date'), last_recorded=Max('recorded_date'),
+    )
+    if stats['price_points']:
+        MarketCoverage.objects.update_or_create(market=market, product_name=product_name, defaults=stats)
+    else:
+        MarketCoverage.objects.filter(market=market, product_name=product_name).delete()
+
+
+def rebuild_market_coverage():
+    """Recompute the whole MarketCoverage table in one grouped query (used after bulk imports)."""
+    coverage = (MarketPriceIndex.objects.values('market', 'product_name')
+                .annotate(price_points=Count('id'), first_recorded=Min('recorded_date'),
+                          last_recorded=Max('recorded_date'))
+                .order_by())
+    with transaction.atomic():
+        MarketCoverage.objects.all().delete()
+        MarketCoverage.objects.bulk_create([MarketCoverage(**row) for row in coverage], batch_size=1000)
+
+
+def rebuild_all():
+    """Recompute every summary from scratch with set-based queries."""
+    loss_groups = (PostHarvestLossReport.objects
+                   .values('farm_id', 'incident_date__year', 'incident_date__month', 'primary_cause')
+                   .annotate(report_count=Count('id'), total_kg_lost=Sum('quantity_lost_kg'),
+                             total_value_lost=Sum('estimated_value_lost'))
+                   .order_by())
+    with transaction.atomic():
+        LossSummary.objects.all().delete()
+        LossSummary.objects.bulk_create([
+            LossSummary(
+                farm_id=group['farm_id'],
+                month=date(group['incident_date__year'], group['incident_date__month'], 1),
+                primary_cause=group['primary_cause'],
+                report_count=group['report_count'],
+                total_kg_lost=group['total_kg_lost'],
+                total_value_lost=group['total_value_lost'],
+            ) for group in loss_groups
+        ], batch_size=1000)
+        LossTotal.objects.all().delete()
+        totals = LossSummary.objects.values('primary_cause').order_by()
+        per_owner = totals.values('farm__owner_id', 'primary_cause').order_by()
+        LossTotal.objects.bulk_create([
+            LossTotal(owner_id=row.get('farm__owner_id'), primary_cause=row['primary_cause'],
+                      report_count=row['reports'], total_kg_lost=row['kg'], total_value_lost=row['value'])
+            for rows in (totals, per_owner)
+            for row in rows.annotate(reports=Sum('report_count'), kg=Sum('total_kg_lost'),
+                                     value=Sum('total_value_lost'))
+        ], batch_size=1000)
+        rebuild_market_coverage()
+
+
+def loss_overview(owner=None):
+    """All-time loss totals and per-cause breakdown, platform-wide or for one farmer."""
+    rows = list(LossTotal.objects.filter(owner=owner, report_count__gt=0).order_by('-total_kg_lost'))
+    return {
+        'totals': {'total_kg': sum((row.total_kg_lost for row in rows), Decimal(0)),
+                   'total_value': sum((row.total_value_lost for row in rows), Decimal(0))},
+        'by_cause': [{'primary_cause': row.primary_cause, 'total_kg': row.total_kg_lost, 'count': row.report_count}
+                     for row in rows],
+    }
+
+
+def market_coverage():
+    """Number of products tracked per market."""
+    return list(MarketCoverage.objects.values('market').annotate(
+        product_count=Count('id'),
+    ).order_by('market'))
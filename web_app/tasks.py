@@ -0,0 +1,65 @@
+"""Job handlers run by the background worker (see jobs.py)."""
+
+from datetime import date
+
+from .jobs import task
+from .models import TemperatureLog
+
+
+@task('notifications.send')
+def send_notifications(user_ids, notification_type, title, message):
+    from .notifications import notify
+    notify(user_ids, notification_type, title, message)
+
+
+@task('notifications.digest')
+def send_notification_digest(user_id, notification_type):
+    from .notifications import flush_digest
+    flush_digest(user_id, notification_type)
+
+
+@task('notifications.broadcast')
+def broadcast_notification(broadcast_id, notification_type, title, message, role='', county='', after=0):
+    from .notifications import broadcast
+    broadcast(broadcast_id, notification_type, title, message, role=role, county=county, after=after)
+
+
+@task('cold_chain.process_reading')
+def process_temperature_reading(log_id):
+    from .alerts import process_reading
+    log = TemperatureLog.objects.select_related(
+        'booking__facility', 'booking__order', 'shipment__vehicle', 'shipment__order',
+    ).filter(pk=log_id).first()
+    if log is not None:
+        process_reading(log)
+
+
+@task('metrics.refresh_day')
+def refresh_platform_metric(day):
+    from .metrics import refresh_day
+    refresh_day(date.fromisoformat(day))
+
+
+@task('summaries.refresh_losses')
+def refresh_loss_summary(farm_id, month):
+    from .summaries import refresh_loss_summary
+    refresh_loss_summary(farm_id, date.fromisoformat(month))
+
+
+@task('summaries.refresh_market_coverage')
+def refresh_market_coverage(market, product_name):
+    from .summaries import refresh_market_coverage
+    refresh_market_coverage(market, product_name)
+
+
+@task('planner.plan_day')
+def plan_pickup_day(day):
+    from .planner import plan
+    day = date.fromisoformat(day)
+    plan(day, day)
+
+
+@task('images.render')
+def render_image(name):
+    from .images import render
+    render(name)
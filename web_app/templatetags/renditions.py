@@ -0,0 +1,12 @@
+from django import template
+
+from web_app.images import rendition_url
+
+register = template.Library()
+
+
+@register.filter
+def rendition(image, size):
+    """``{{ product.photo|rendition:"card" }}``; add ".jpg" ("card.jpg") for the JPEG copy."""
+    size, _, fmt = size.partition('.')
+    return rendition_url(image, size, fmt or 'webp')
@@ -1,3 +1,1776 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.template import base as template_base
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import change_feed, images, instrumentation, inventory, jobs, notifications, uploads, view_counter
+from .alerts import process_reading
+from .catalog import commodity_key_for, filter_by_commodity
+from .exports import export_queryset, parquet_available, read_csv_export
+from .forecasting import compute_forecast, week_start
+from .models import (
+    BackgroundJob, BroadcastChunk, BuyerRecommendation, ColdStorageBooking, ColdStorageFacility, Dispute, Farm,
+    HarvestSchedule, Lease, LogisticsRoute, LossTotal, MarketPriceIndex, MediaBlob, MediaReference, Notification,
+    Order, OrderItem, PendingNotification, PickupProposal, PostHarvestLossReport, PriceBand, Product,
+    ProductCategory, ProductViewDaily, Shipment, ShipmentTracking, SupplyForecast, SyncMutation,
+    TemperatureExcursion, TemperatureLog, UnreadCounter, UploadSession, User, Vehicle,
+)
+from .notifications import archive, deliver, inbox_page, mark_read, unread_count
+from .planner import plan
+from .price_analytics import price_analytics
+from .price_import import import_prices
+from .pricing import compute_bands
+from .recommendations import build, recommended_products
+from .shipping import quote
+from .summaries import (
+    loss_overview, market_coverage, month_start, rebuild_all, refresh_loss_summary, refresh_market_coverage,
+)
+
+
+def make_farm(owner, **fields):
+    fields = {'name': 'Shamba', 'farm_type': 'vegetable', 'size_acres': 5, 'location_name': 'Limuru',
+              'latitude': Decimal('-1.1'), 'longitude': Decimal('36.6'), 'nearest_town': 'Limuru', **fields}
+    return Farm.objects.create(owner=owner, **fields)
+
+
+def make_product(farm, **fields):
+    fields = {'name': 'Kale', 'quantity_available': 100, 'price_per_unit': 40, 'harvest_date': date.today(), **fields}
+    return Product.objects.create(farm=farm, **fields)
+
+
+def make_route(**fields):
+    fields = {'name': 'Limuru - Nairobi', 'origin_name': 'Limuru', 'origin_latitude': Decimal('-1.1'),
+              'origin_longitude': Decimal('36.6'), 'destination_name': 'Nairobi',
+              'destination_latitude': Decimal('-1.3'), 'destination_longitude': Decimal('36.8'),
+              'distance_km': 40, 'estimated_duration_hours': 1, 'base_cost_per_kg': Decimal('2.5'), **fields}
+    return LogisticsRoute.objects.create(**fields)
+
+
+def make_shipment(driver, **fields):
+    fields = {'shipment_code': f'SHP{Shipment.objects.count():05d}', 'pickup_address': 'Limuru',
+              'pickup_latitude': Decimal('-1.1'), 'pickup_longitude': Decimal('36.6'), 'delivery_address': 'Nairobi',
+              'delivery_latitude': Decimal('-1.3'), 'delivery_longitude': Decimal('36.8'), 'status': 'in_transit',
+              'scheduled_pickup': timezone.now(), 'weight_kg': 100, **fields}
+    return Shipment.objects.create(driver=driver, **fields)
+
+
+def use_temp_media(test):
+    """Point MEDIA_ROOT and the chunked-upload directory at a throwaway directory for ``test``."""
+    root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    override = override_settings(MEDIA_ROOT=root, CHUNKED_UPLOAD_DIR=os.path.join(root, 'upload_sessions'))
+    override.enable()
+    test.addCleanup(override.disable)
+    return root
+
+
+def make_facility(operator, **fields):
+    fields = {'name': 'Baridi', 'location_name': 'Nairobi', 'latitude': Decimal('-1.3'),
+              'longitude': Decimal('36.8'), 'total_capacity_tonnes': 100, 'available_capacity_tonnes': 60,
+              'cost_per_tonne_per_day': 50, **fields}
+    return ColdStorageFacility.objects.create(operator=operator, **fields)
+
+
+def make_booking(facility, booked_by, **fields):
+    fields = {'product_description': 'Kale', 'quantity_tonnes': 2, 'required_temp_min': 2,
+              'required_temp_max': 8, 'start_date': date.today(),
+              'end_date': date.today() + timedelta(days=7), 'status': 'active', **fields}
+    return ColdStorageBooking.objects.create(facility=facility, booked_by=booked_by, **fields)
+
+
+# ============================================================
+# 🌡️ COLD CHAIN ALERTS
+# ============================================================
+
+class ExcursionTests(TestCase):
+    """One alert per out-of-range episode, whatever order the readings are processed in."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', role='buyer')
+        cls.operator = User.objects.create_user('operator', role='cold_storage')
+        cls.booking = make_booking(make_facility(cls.operator), cls.buyer)
+        cls.start = timezone.now() - timedelta(hours=1)
+
+    def reading(self, temperature, minute):
+        log = TemperatureLog.objects.create(booking=self.booking, sensor_id='S1', temperature_celsius=temperature)
+        TemperatureLog.objects.filter(pk=log.pk).update(recorded_at=self.start + timedelta(minutes=minute))
+        log.refresh_from_db()
+        return process_reading(log)
+
+    def alerts(self):
+        return Notification.objects.filter(notification_type='cold_chain')
+
+    def test_first_bad_reading_opens_and_notifies(self):
+        excursion = self.reading(10, 0)
+        self.assertEqual((excursion.status, excursion.alert_level), ('open', 'warning'))
+        self.assertEqual(sorted(self.alerts().values_list('user_id', flat=True)), [self.buyer.pk, self.operator.pk])
+        self.assertEqual(excursion.notifications_sent, 2)
+
+    def test_further_bad_readings_extend_without_notifying(self):
+        self.reading(10, 0)
+        excursion = self.reading(9, 1)
+        self.assertEqual((excursion.readings_count, excursion.suppressed_count), (2, 1))
+        self.assertEqual(excursion.peak_temperature_celsius, 10)
+        self.assertEqual(self.alerts().count(), 2)
+
+    def test_escalation_to_critical_notifies_again(self):
+        self.reading(10, 0)
+        excursion = self.reading(15, 1)
+        self.assertEqual(excursion.alert_level, 'critical')
+        self.assertEqual(excursion.peak_temperature_celsius, 15)
+        self.assertEqual(self.alerts().count(), 4)
+
+    def test_normal_reading_closes(self):
+        opened = self.reading(10, 0)
+        self.reading(5, 2)
+        opened.refresh_from_db()
+        self.assertEqual(opened.status, 'closed')
+        self.assertEqual(opened.closed_at, self.start + timedelta(minutes=2))
+
+    def test_late_normal_reading_does_not_close(self):
+        self.reading(10, 5)
+        self.reading(5, 1)
+        self.assertEqual(TemperatureExcursion.objects.get().status, 'open')
+
+    def test_late_bad_reading_inside_closed_episode_is_suppressed(self):
+        self.reading(10, 0)
+        self.reading(5, 3)
+        excursion = self.reading(11, 2)
+        self.assertEqual(TemperatureExcursion.objects.count(), 1)
+        self.assertEqual((excursion.status, excursion.pk), ('closed', TemperatureExcursion.objects.get().pk))
+        excursion.refresh_from_db()
+        self.assertEqual(excursion.suppressed_count, 1)
+        self.assertEqual(self.alerts().count(), 2)
+
+    def test_bad_reading_processed_after_its_recovery_opens_closed(self):
+        self.reading(5, 3)
+        excursion = self.reading(10, 0)
+        self.assertEqual((excursion.status, excursion.closed_at), ('closed', self.start + timedelta(minutes=3)))
+        self.assertEqual(self.alerts().count(), 2)
+
+
+# Rows seeded for every list a page shows. A relation traversed per row without a
+# select_related/prefetch_related plan costs ROWS extra queries and breaks the budget.
+ROWS = 6
+
+
+# ============================================================
+# ⚙️ JOB QUEUE
+# ============================================================
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record_call(**payload):
+    calls.append(payload)
+
+
+@jobs.task('tests.fail')
+def always_fail(**payload):
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def claim_and_run(self):
+        for job_id in jobs.claim_jobs('worker', 10):
+            jobs.run_job(BackgroundJob.objects.get(pk=job_id))
+
+    def test_unknown_task_is_refused(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue('tests.missing')
+
+    def test_key_makes_enqueue_idempotent(self):
+        first = jobs.enqueue('tests.record', {'n': 1}, key='once')
+        second = jobs.enqueue('tests.record', {'n': 2}, key='once')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(BackgroundJob.objects.get().payload, {'n': 1})
+
+    def test_claim_takes_due_jobs_once(self):
+        due = jobs.enqueue('tests.record')
+        jobs.enqueue('tests.record', delay=timedelta(minutes=5))
+        self.assertEqual(jobs.claim_jobs('a', 10), [due.pk])
+        self.assertEqual(jobs.claim_jobs('b', 10), [])
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.locked_by, due.attempts), ('running', 'a', 1))
+
+    def test_claim_skips_a_job_taken_between_select_and_update(self):
+        job = jobs.enqueue('tests.record')
+
+        def listed_then_stolen(ids):
+            ids = [*ids]
+            BackgroundJob.objects.filter(pk__in=ids).update(status='running', locked_by='other')
+            return ids
+
+        with mock.patch('web_app.jobs.list', listed_then_stolen, create=True):
+            self.assertEqual(jobs.claim_jobs('a', 10), [])
+        job.refresh_from_db()
+        self.assertEqual(job.locked_by, 'other')
+
+    def test_success(self):
+        job = jobs.enqueue('tests.record', {'n': 1})
+        self.claim_and_run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(calls, [{'n': 1}])
+
+    def test_failure_is_retried_with_backoff(self):
+        job = jobs.enqueue('tests.fail')
+        before = timezone.now()
+        with self.assertLogs('web_app.jobs', 'WARNING'):
+            self.claim_and_run()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=5))
+        self.assertEqual(jobs.claim_jobs('worker', 10), [])
+
+    def test_backoff_grows_and_is_capped(self):
+        self.assertLess(jobs.backoff_delay(1), jobs.backoff_delay(3))
+        self.assertLessEqual(jobs.backoff_delay(50), timedelta(seconds=3600 * 1.1))
+
+    def test_last_attempt_dead_letters(self):
+        job = jobs.enqueue('tests.fail', max_attempts=2)
+        with self.assertLogs('web_app.jobs', 'WARNING') as logs:
+            for _ in range(2):
+                BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+                self.claim_and_run()
+        self.assertIn('failed permanently', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_running_jobs_are_released(self):
+        job = jobs.enqueue('tests.record')
+        jobs.claim_jobs('dead', 10)
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.release_stale_jobs(), 1)
+        self.assertEqual(jobs.claim_jobs('alive', 10), [job.pk])
+
+    def test_job_that_keeps_killing_its_worker_runs_out_of_attempts(self):
+        job = jobs.enqueue('tests.record', max_attempts=2)
+        for worker in ['dead-1', 'dead-2']:
+            self.assertEqual(jobs.claim_jobs(worker, 10), [job.pk])
+            BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+            if worker == 'dead-1':
+                self.assertEqual(jobs.release_stale_jobs(), 1)
+        with self.assertLogs('web_app.jobs', 'ERROR'):
+            self.assertEqual(jobs.release_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('failed', 2, ''))
+        self.assertEqual(jobs.claim_jobs('alive', 10), [])
+
+    def test_enqueue_on_commit_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue_on_commit('tests.record', key='committed')
+            self.assertFalse(BackgroundJob.objects.exists())
+        self.assertTrue(BackgroundJob.objects.filter(idempotency_key='committed').exists())
+
+    def test_enqueue_on_commit_is_dropped_on_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    jobs.enqueue_on_commit('tests.record', key='rolled-back')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_debounced_jobs_share_a_window(self):
+        with mock.patch('web_app.jobs.time.time', return_value=6000.0), self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue_debounced('tests.record', {'n': 1}, key='refresh', window=60)
+            jobs.enqueue_debounced('tests.record', {'n': 1}, key='refresh', window=60)
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.idempotency_key, 'refresh:100')
+        self.assertAlmostEqual((job.run_after - job.created_at).total_seconds(), 60, delta=1)
+
+    def test_debounce_window_is_picked_at_commit(self):
+        with mock.patch('web_app.jobs.time.time') as clock, self.captureOnCommitCallbacks(execute=True):
+            clock.return_value = 6050.0
+            jobs.enqueue_debounced('tests.record', {}, key='refresh', window=60)
+            clock.return_value = 6070.0   # the transaction commits in the next window
+        self.assertEqual(BackgroundJob.objects.get().idempotency_key, 'refresh:101')
+
+    def test_debounce_after_the_window_was_claimed_queues_the_next(self):
+        BackgroundJob.objects.create(task='tests.record', idempotency_key='refresh:100', status='running')
+        with mock.patch('web_app.jobs.time.time', return_value=6030.0), self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue_debounced('tests.record', {}, key='refresh', window=60)
+        self.assertEqual(BackgroundJob.objects.get(idempotency_key='refresh:101').status, 'queued')
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        job = jobs.enqueue('tests.record', {'n': 1})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('succeeded', 1))
+        self.assertEqual(calls, [{'n': 1}])
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_eager_mode_leaves_delayed_jobs_queued(self):
+        job = jobs.enqueue('tests.record', delay=timedelta(minutes=1))
+        self.assertEqual((job.status, calls), ('queued', []))
+
+
+# ============================================================
+# 📊 ANALYTICS SUMMARIES
+# ============================================================
+
+class SummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', role='farmer')
+        cls.farm = make_farm(cls.farmer)
+        cls.month = date.today().replace(day=1)
+
+    def report(self, kg, cause='handling'):
+        return PostHarvestLossReport.objects.create(
+            farm=self.farm, product_name='Kale', quantity_lost_kg=kg, estimated_value_lost=kg * 40,
+            primary_cause=cause, incident_date=self.month)
+
+    def test_loss_overview_reads_each_refresh(self):
+        self.report(10)
+        refresh_loss_summary(self.farm.pk, self.month)
+        self.assertEqual(loss_overview(self.farmer)['totals']['total_kg'], 10)
+        self.report(5, 'temperature')
+        refresh_loss_summary(self.farm.pk, self.month)
+        overview = loss_overview()
+        self.assertEqual(overview['totals']['total_kg'], 15)
+        self.assertEqual([row['primary_cause'] for row in overview['by_cause']], ['handling', 'temperature'])
+
+    def test_refreshes_move_all_time_totals_by_their_difference(self):
+        other = User.objects.create_user('other', role='farmer')
+        self.report(10)
+        report = self.report(4)
+        PostHarvestLossReport.objects.create(
+            farm=make_farm(other), product_name='Kale', quantity_lost_kg=7, estimated_value_lost=280,
+            primary_cause='handling', incident_date=self.month - timedelta(days=40))
+        for farm in Farm.objects.all():
+            for month in [self.month, month_start(self.month - timedelta(days=40))]:
+                refresh_loss_summary(farm.pk, month)
+        report.delete()
+        refresh_loss_summary(self.farm.pk, self.month)
+        refresh_loss_summary(self.farm.pk, self.month)  # a repeat is a no-op
+        self.assertEqual(loss_overview(self.farmer)['totals'], {'total_kg': 10, 'total_value': 400})
+        self.assertEqual(loss_overview(other)['by_cause'], [{'primary_cause': 'handling', 'total_kg': 7, 'count': 1}])
+        self.assertEqual(loss_overview()['by_cause'], [{'primary_cause': 'handling', 'total_kg': 17, 'count': 2}])
+        totals = LossTotal.objects.order_by('owner_id', 'primary_cause').values_list(
+            'owner_id', 'primary_cause', 'report_count', 'total_kg_lost')
+        incremental = list(totals)
+        rebuild_all()
+        self.assertEqual(list(totals.all()), incremental)
+
+    def test_overview_is_one_query_however_long_the_history(self):
+        for months_ago in range(24):
+            day = self.month - timedelta(days=31 * months_ago)
+            PostHarvestLossReport.objects.create(
+                farm=self.farm, product_name='Kale', quantity_lost_kg=1, estimated_value_lost=40,
+                primary_cause='handling', incident_date=day)
+            refresh_loss_summary(self.farm.pk, day)
+        with self.assertNumQueries(1):
+            overview = loss_overview()
+        self.assertEqual(overview['totals']['total_kg'], 24)
+
+    def test_market_coverage_reads_each_refresh(self):
+        price = MarketPriceIndex.objects.create(
+            market='nairobi_wakulima', product_name='Kale', price_per_kg=40, recorded_date=self.month)
+        refresh_market_coverage(price.market, price.product_name)
+        self.assertEqual(market_coverage(), [{'market': 'nairobi_wakulima', 'product_count': 1}])
+        price.delete()
+        refresh_market_coverage(price.market, price.product_name)
+        self.assertEqual(market_coverage(), [])
+
+
+class AnalyticsDashboardTests(TestCase):
+
+    def test_supply_outlook_shows_catalog_names(self):
+        SupplyForecast.objects.create(commodity_key='kale', region='Limuru', week_start=week_start(date.today()),
+                                      supply_kg=900, demand_kg=400)
+        self.client.force_login(User.objects.create_user('admin', role='admin'))
+        response = self.client.get(reverse('analytics_dashboard'))
+        self.assertContains(response, '<td>Kale (Sukuma Wiki)</td>', html=True)
+
+
+# ============================================================
+# 💹 PRICE ANALYTICS
+# ============================================================
+
+class PriceAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def price(self, market, price, days_ago=0):
+        return MarketPriceIndex.objects.create(market=market, product_name='Kale', price_per_kg=price,
+                                               recorded_date=date.today() - timedelta(days=days_ago))
+
+    def latest(self):
+        return {row['market']: row['latest_price'] for row in price_analytics('Kale')['markets']}
+
+    def test_spread_between_markets(self):
+        self.price('nairobi_wakulima', 50)
+        self.price('kisumu_kibuye', 40)
+        spread = price_analytics('Kale')['spreads'][0]
+        self.assertEqual((spread['high_market'], spread['spread'], spread['spread_pct']),
+                         ('nairobi_wakulima', 10, 25))
+
+    def test_cached_result_follows_every_change(self):
+        # Simulates another process: nothing is deleted from the cache, the key moves on.
+        row = self.price('nairobi_wakulima', 50)
+        self.assertEqual(self.latest(), {'nairobi_wakulima': 50})
+        self.price('kisumu_kibuye', 40)
+        self.assertEqual(self.latest(), {'nairobi_wakulima': 50, 'kisumu_kibuye': 40})
+        row.price_per_kg = 55
+        row.save()
+        self.assertEqual(self.latest()['nairobi_wakulima'], 55)
+        row.delete()
+        self.assertEqual(self.latest(), {'kisumu_kibuye': 40})
+
+
+class PriceImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def import_csv(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_prices(io.BytesIO(text.encode()), 'bulletin.csv')
+
+    def test_rows_are_upserted_and_bad_lines_reported(self):
+        result = self.import_csv('Market,Product,Price (KES/kg),Date\n'
+                                 'Wakulima,Kale,40,2026-10-01\n'
+                                 'Wakulima,Kale,42,2026-10-01\n'
+                                 'Nowhere,Kale,40,2026-10-01\n'
+                                 'Kibuye,Kale,-3,2026-10-01\n')
+        self.assertEqual((result['rows'], result['upserted'], result['rejected']), (4, 1, 2))
+        self.assertEqual(MarketPriceIndex.objects.get().price_per_kg, 42)
+        self.assertEqual(market_coverage(), [{'market': 'nairobi_wakulima', 'product_count': 1}])
+
+    def test_markets_can_be_named_by_their_town(self):
+        result = self.import_csv('market,product,price,date\n'
+                                 'Nakuru,Kale,38,2026-10-01\n'
+                                 'Central Market,Kale,39,2026-10-02\n'
+                                 'Kisumu,Kale,35,2026-10-01\n'
+                                 'Nairobi,Kale,45,2026-10-01\n')
+        self.assertEqual((result['upserted'], result['rejected']), (3, 1))
+        self.assertEqual(sorted(MarketPriceIndex.objects.values_list('market', 'price_per_kg')),
+                         [('kisumu_kibuye', 35), ('nakuru_central', 38), ('nakuru_central', 39)])
+
+    def test_reimported_prices_reach_cached_analytics(self):
+        self.import_csv('market,product,price,date\nWakulima,Kale,40,2026-10-01\n')
+        self.assertEqual(price_analytics('Kale')['markets'][0]['latest_price'], 40)
+        self.import_csv('market,product,price,date\nWakulima,Kale,48,2026-10-01\n')
+        self.assertEqual(price_analytics('Kale')['markets'][0]['latest_price'], 48)
+
+
+class PriceBandTests(TestCase):
+    def price(self, market, price, days_ago):
+        MarketPriceIndex.objects.create(market=market, product_name='Kale', price_per_kg=price,
+                                        recorded_date=date.today() - timedelta(days=days_ago))
+
+    def test_window_ends_at_each_pairs_latest_price(self):
+        for days_ago, price in [(0, 40), (5, 44), (40, 90)]:
+            self.price('nairobi_wakulima', price, days_ago)
+        for days_ago, price in [(100, 30), (110, 34), (200, 80)]:
+            self.price('kisumu_kibuye', price, days_ago)
+        self.assertEqual(compute_bands(), 2)
+        bands = {band.market: band for band in PriceBand.objects.all()}
+        self.assertEqual((bands['nairobi_wakulima'].sample_size, bands['nairobi_wakulima'].market_price), (2, 42))
+        self.assertEqual((bands['kisumu_kibuye'].sample_size, bands['kisumu_kibuye'].market_price), (2, 32))
+        self.assertEqual(bands['kisumu_kibuye'].as_of, date.today() - timedelta(days=100))
+
+    def test_each_commodity_and_market_pair_gets_its_own_window(self):
+        series = {
+            ('Kale', 'nairobi_wakulima'): [(0, 40), (10, 50), (35, 99)],
+            ('Kale', 'mombasa_kongowea'): [(60, 70), (70, 80), (95, 5)],
+            ('Tomatoes', 'nairobi_wakulima'): [(3, 100), (20, 120), (34, 500)],
+            ('Tomatoes', 'mombasa_kongowea'): [(0, 90)],
+        }
+        for (name, market), points in series.items():
+            for days_ago, price in points:
+                MarketPriceIndex.objects.create(market=market, product_name=name, price_per_kg=price,
+                                                recorded_date=date.today() - timedelta(days=days_ago))
+        # Routes, the latest date per pair, one pass over the window, then delete + insert in a savepoint.
+        with self.assertNumQueries(7):
+            self.assertEqual(compute_bands(), 4)
+        bands = {(band.commodity_key, band.market): (band.sample_size, band.market_price, band.as_of)
+                 for band in PriceBand.objects.all()}
+        self.assertEqual(bands, {
+            ('kale', 'nairobi_wakulima'): (2, 45, date.today()),
+            ('kale', 'mombasa_kongowea'): (2, 75, date.today() - timedelta(days=60)),
+            ('tomato', 'nairobi_wakulima'): (2, 110, date.today() - timedelta(days=3)),
+            ('tomato', 'mombasa_kongowea'): (1, 90, date.today()),
+        })
+
+
+# ============================================================
+# 🚚 SHIPPING QUOTES
+# ============================================================
+
+class ShippingQuoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('buyer', role='buyer')
+        cls.product = make_product(make_farm(User.objects.create_user('farmer', role='farmer')))
+        cls.route = make_route()
+
+    def test_route_changes_reach_memoised_rates(self):
+        destination = (-1.3, 36.8)
+        self.assertEqual(quote((-1.1, 36.6), destination, 100)['rate_per_kg'], 2.875)
+        # A plain UPDATE fires no signal here, like a route edited by another process.
+        LogisticsRoute.objects.filter(pk=self.route.pk).update(
+            base_cost_per_kg=Decimal('4'), updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(quote((-1.1, 36.6), destination, 100)['rate_per_kg'], 4.6)
+        LogisticsRoute.objects.filter(pk=self.route.pk).delete()
+        self.assertIsNone(quote((-1.1, 36.6), destination, 100)['route'])
+
+    def test_quote_api_rejects_unusable_quantities(self):
+        self.client.force_login(self.buyer)
+        url = reverse('api_shipping_quote')
+        for quantity in ['nan', 'inf', '-inf', '0', '-5', 'lots']:
+            response = self.client.get(url, {'product': self.product.pk, 'quantity': quantity})
+            self.assertEqual(response.status_code, 400, quantity)
+            self.assertIn('error', response.json())
+        response = self.client.get(url, {'product': self.product.pk, 'quantity': '20'})
+        self.assertEqual(response.json()['quote']['weight_kg'], 20)
+
+    def test_quote_api_rejects_unusable_delivery_points(self):
+        self.client.force_login(self.buyer)
+        url = reverse('api_shipping_quote')
+        for lat, lon in [('nan', '36.8'), ('-1.3', 'inf'), ('91', '36.8'), ('-1.3', '-181'), ('1e9', '0'),
+                         ('north', '36.8'), ('-1.3', '')]:
+            response = self.client.get(url, {'product': self.product.pk, 'quantity': '20',
+                                             'delivery_latitude': lat, 'delivery_longitude': lon})
+            self.assertEqual(response.status_code, 400, (lat, lon))
+        response = self.client.get(url, {'product': self.product.pk, 'quantity': '20',
+                                         'delivery_latitude': '-1.3', 'delivery_longitude': '36.8'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_form_shows_an_error_for_bad_input(self):
+        self.client.force_login(self.buyer)
+        url = reverse('order_create', args=[self.product.pk])
+        form = {'quantity': '20', 'payment_method': 'mpesa', 'delivery_address': 'Westlands',
+                'delivery_latitude': '-1.3', 'delivery_longitude': '36.8'}
+        for bad in [{'quantity': 'nan'}, {'quantity': 'inf'}, {'quantity': '0'}, {'quantity': '-3'},
+                    {'quantity': ''}, {'delivery_latitude': '95'}, {'delivery_longitude': 'nan'}]:
+            response = self.client.post(url, {**form, **bad})
+            self.assertEqual(response.status_code, 400, bad)
+            self.assertTemplateUsed(response, 'orders/create.html')
+            self.assertEqual([m.level_tag for m in response.context['messages']], ['error'])
+        self.assertFalse(Order.objects.exists())
+        response = self.client.post(url, form)
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('order_detail', args=[order.pk]), fetch_redirect_response=False)
+        self.assertEqual((order.delivery_latitude, order.delivery_longitude), (Decimal('-1.3'), Decimal('36.8')))
+
+    def test_malformed_ids_are_bad_requests(self):
+        self.client.force_login(self.buyer)
+        for name, params in [('api_shipping_quote', {'product': 'abc', 'quantity': '5'}),
+                             ('api_shipping_quote', {'quantity': '5'}),
+                             ('api_price_suggestion', {'farm': 'abc', 'product': 'Kale'})]:
+            response = self.client.get(reverse(name), params)
+            self.assertEqual(response.status_code, 400, params)
+        response = self.client.get(reverse('api_price_suggestion'), {'farm': '999999', 'product': 'Kale'})
+        self.assertEqual(response.status_code, 404)
+
+
+# ============================================================
+# 🗓️ PICKUP PLANNING
+# ============================================================
+
+class PickupPlannerTests(TestCase):
+    """Re-runs only rewrite changed groups, and never rewrite a reviewed proposal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date.today() + timedelta(days=2)
+        farmer = User.objects.create_user('farmer', role='farmer')
+        cls.farms = [make_farm(farmer, name=f'Shamba {i}') for i in range(2)]
+        cls.harvests = [HarvestSchedule.objects.create(
+            farm=farm, product_name='Cabbage', expected_quantity_kg=400, harvest_date=cls.day,
+            ready_for_pickup_date=cls.day) for farm in cls.farms]
+
+    def plan(self):
+        return plan(self.day, self.day)
+
+    def test_harvests_are_grouped_by_region_and_day(self):
+        self.assertEqual(self.plan()['created'], 1)
+        proposal = PickupProposal.objects.get()
+        self.assertEqual((proposal.region, proposal.farm_count, proposal.total_kg), ('Limuru', 2, 800))
+        self.assertEqual(sorted(proposal.harvest_ids), sorted(h.pk for h in self.harvests))
+
+    def test_rerun_without_changes_writes_nothing(self):
+        self.plan()
+        stamp = PickupProposal.objects.get().updated_at
+        with CaptureQueriesContext(connection) as queries:
+            counts = self.plan()
+        self.assertEqual((counts['unchanged'], counts['updated']), (1, 0))
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+        self.assertEqual(PickupProposal.objects.get().updated_at, stamp)
+
+    def test_changed_harvest_rewrites_unreviewed_proposal(self):
+        self.plan()
+        fingerprint = PickupProposal.objects.get().fingerprint
+        HarvestSchedule.objects.filter(pk=self.harvests[0].pk).update(actual_quantity_kg=550)
+        self.assertEqual(self.plan()['updated'], 1)
+        proposal = PickupProposal.objects.get()
+        self.assertEqual(proposal.total_kg, 950)
+        self.assertNotEqual(proposal.fingerprint, fingerprint)
+        self.assertFalse(proposal.needs_review)
+
+    def test_changed_harvest_flags_accepted_proposal_without_rewriting_it(self):
+        self.plan()
+        PickupProposal.objects.update(status='accepted')
+        HarvestSchedule.objects.filter(pk=self.harvests[0].pk).update(actual_quantity_kg=550)
+        counts = self.plan()
+        self.assertEqual((counts['updated'], counts['flagged']), (0, 1))
+        proposal = PickupProposal.objects.get()
+        self.assertEqual((proposal.status, proposal.total_kg, proposal.needs_review), ('accepted', 800, True))
+
+    def test_vanished_harvests_remove_proposed_but_flag_dismissed(self):
+        other_day = self.day + timedelta(days=1)
+        HarvestSchedule.objects.create(farm=self.farms[0], product_name='Kale', expected_quantity_kg=100,
+                                       harvest_date=other_day, ready_for_pickup_date=other_day)
+        plan(self.day, other_day)
+        PickupProposal.objects.filter(pickup_date=other_day).update(status='dismissed')
+        HarvestSchedule.objects.update(status='collected')
+        counts = plan(self.day, other_day)
+        self.assertEqual((counts['removed'], counts['flagged']), (1, 1))
+        self.assertTrue(PickupProposal.objects.get(pickup_date=other_day).needs_review)
+
+
+# ============================================================
+# 🛒 RECOMMENDATIONS
+# ============================================================
+
+class RecommendationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        farmer = User.objects.create_user('farmer', role='farmer')
+        farm = make_farm(farmer)
+        cls.buyer = User.objects.create_user('buyer', role='buyer')
+        cls.avocado = make_product(farm, name='Hass Avocado')
+        cls.cabbages = [make_product(farm, name=f'Cabbage {i}') for i in range(3)]
+        order = Order.objects.create(order_number='ORD00001', buyer=cls.buyer, farmer=farmer, status='delivered',
+                                     subtotal=400, total_amount=420, delivery_address='Nairobi')
+        OrderItem.objects.create(order=order, product=make_product(farm, name='Avocado', status='sold'),
+                                 quantity=10, unit_price=40)
+
+    def test_built_recommendations_are_read_back_by_the_dashboard(self):
+        call_command('compute_recommendations', stdout=io.StringIO())
+        cache.clear()  # the web process shares nothing with the command but the database
+        self.client.force_login(self.buyer)
+        featured = self.client.get(reverse('dashboard')).context['featured_products']
+        self.assertEqual(featured[0], self.avocado)
+        self.assertEqual(BuyerRecommendation.objects.get(buyer=self.buyer).product_ids[0], self.avocado.pk)
+
+    def test_sold_out_recommendations_are_topped_up_with_new_listings(self):
+        build()
+        Product.objects.filter(pk=self.avocado.pk).update(status='sold')
+        products = recommended_products(self.buyer, limit=3)
+        self.assertEqual(len(products), 3)
+        self.assertNotIn(self.avocado, products)
+
+    def test_rebuild_drops_buyers_who_left(self):
+        build()
+        User.objects.filter(pk=self.buyer.pk).update(is_active=False)
+        build()
+        self.assertFalse(BuyerRecommendation.objects.exists())
+
+
+# ============================================================
+# 📦 LISTING SWEEPS
+# ============================================================
+
+class SweepTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', role='farmer')
+        farm = make_farm(cls.farmer)
+        today = date.today()
+        cls.expired = make_product(farm, name='Kale', expiry_date=today - timedelta(days=1))
+        cls.sold = make_product(farm, name='Cabbage', quantity_available=0)
+        cls.near = make_product(farm, name='Spinach', expiry_date=today + timedelta(days=1))
+
+    def test_sweep_moves_listings_and_notifies_owner_once(self):
+        counts = inventory.sweep()
+        self.assertEqual((counts['expired'], counts['sold'], counts['near_expiry'], counts['notified']), (1, 1, 1, 1))
+        self.assertEqual(Product.objects.get(pk=self.expired.pk).status, 'expired')
+        self.assertEqual(Product.objects.get(pk=self.sold.pk).status, 'sold')
+        self.assertTrue(Product.objects.get(pk=self.near.pk).near_expiry)
+        self.assertEqual(Notification.objects.filter(user=self.farmer).count(), 1)
+
+    def test_owners_are_counted_from_rows_actually_updated(self):
+        other = User.objects.create_user('other', role='farmer')
+        relisted = make_product(make_farm(other), expiry_date=date.today() - timedelta(days=2))
+        atomic = transaction.atomic
+
+        def relist_then_atomic(*args, **kwargs):
+            # Another request extends the expiry between the paging SELECT and the UPDATE.
+            Product.objects.filter(pk=relisted.pk).update(expiry_date=date.today() + timedelta(days=30))
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(inventory.transaction, 'atomic', relist_then_atomic):
+            expired = inventory._transition(Product.objects.filter(status='available',
+                                                                   expiry_date__lt=date.today()),
+                                            {'status': 'expired'})
+        self.assertEqual(expired, {self.farmer.pk: 1})
+        self.assertEqual(Product.objects.get(pk=relisted.pk).status, 'available')
+
+    def test_sweep_skips_while_another_process_holds_the_lease(self):
+        holder = jobs.acquire_lease(inventory.LEASE_NAME, 60)
+        self.assertIsNone(inventory.sweep())
+        self.assertEqual(Product.objects.get(pk=self.expired.pk).status, 'available')
+        jobs.release_lease(inventory.LEASE_NAME, holder)
+        self.assertIsNotNone(inventory.sweep())
+
+    def test_expired_lease_can_be_taken_over(self):
+        self.assertIsNotNone(jobs.acquire_lease(inventory.LEASE_NAME, 60))
+        Lease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(inventory.sweep())
+
+    def test_release_by_a_former_holder_is_ignored(self):
+        stale = jobs.acquire_lease(inventory.LEASE_NAME, 60)
+        Lease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        current = jobs.acquire_lease(inventory.LEASE_NAME, 60)
+        jobs.release_lease(inventory.LEASE_NAME, stale)
+        self.assertIsNone(jobs.acquire_lease(inventory.LEASE_NAME, 60))
+        self.assertNotEqual(stale, current)
+
+
+# ============================================================
+# 👀 VIEW COUNTS
+# ============================================================
+
+@override_settings(VIEW_COUNT_FLUSH_THRESHOLD=3, VIEW_COUNT_FLUSH_SECONDS=3600)
+class ViewCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        farm = make_farm(User.objects.create_user('farmer', role='farmer'))
+        cls.products = [make_product(farm, name=f'Kale {i}') for i in range(3)]
+
+    def setUp(self):
+        view_counter._pending.clear()
+        self.addCleanup(view_counter._pending.clear)
+
+    def views(self, product):
+        product.refresh_from_db()
+        return product.views_count
+
+    def test_views_are_buffered_until_the_threshold(self):
+        first, second, third = self.products
+        for product in [first, first, second]:
+            view_counter.record(product.pk)
+        self.assertEqual(self.views(first), 0)
+        view_counter.record(third.pk)
+        self.assertEqual([self.views(p) for p in self.products], [2, 1, 1])
+        self.assertFalse(view_counter._pending)
+
+    def test_flushes_add_to_daily_rows(self):
+        product = self.products[0]
+        for _ in range(2):
+            view_counter.record(product.pk)
+            view_counter.record(product.pk)
+            self.assertEqual(view_counter.flush(), 2)
+        self.assertEqual(self.views(product), 4)
+        self.assertEqual(ProductViewDaily.objects.get(product=product, day=timezone.localdate()).views, 4)
+        ranked = view_counter.with_recent_views(Product.objects.all()).order_by('-recent_views')
+        self.assertEqual((ranked[0], ranked[0].recent_views, ranked[1].recent_views), (product, 4, 0))
+
+    def test_views_of_deleted_products_are_dropped(self):
+        gone = make_product(self.products[0].farm, name='Gone')
+        view_counter.record(gone.pk)
+        view_counter.record(self.products[0].pk)
+        gone.delete()
+        view_counter.flush()
+        self.assertEqual(self.views(self.products[0]), 1)
+        self.assertFalse(view_counter._pending)
+
+    def test_failed_flush_keeps_views_for_the_next_one(self):
+        product = self.products[0]
+        view_counter.record(product.pk)
+        with mock.patch.object(ProductViewDaily.objects, 'bulk_create', side_effect=RuntimeError('db down')), \
+                self.assertLogs('web_app.view_counter', 'ERROR'):
+            self.assertEqual(view_counter.flush(), 0)
+        self.assertEqual(self.views(product), 0)  # the whole flush rolled back
+        self.assertEqual(view_counter.flush(), 1)
+        self.assertEqual(self.views(product), 1)
+
+
+# ============================================================
+# 🗂️ MEDIA
+# ============================================================
+
+class MediaReferenceTests(TestCase):
+    """References follow whatever name a field holds after each save, however it got there."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(User.objects.create_user('farmer', role='farmer'))
+
+    def setUp(self):
+        use_temp_media(self)
+        self.product = make_product(self.farm, photo=SimpleUploadedFile('kale.jpg', b'kale bytes'))
+        self.blob = MediaBlob.objects.get()
+
+    def references(self, product):
+        return list(MediaReference.objects.filter(object_id=product.pk, model='web_app.product')
+                    .values_list('blob__name', flat=True))
+
+    def test_upload_is_tracked(self):
+        self.assertTrue(self.product.photo.name.startswith('cas/'))
+        self.assertEqual(self.references(self.product), [self.blob.name])
+
+    def test_clearing_the_field_drops_the_reference(self):
+        self.product.photo = None
+        self.product.save()
+        self.assertEqual(self.references(self.product), [])
+        self.assertFalse(MediaBlob.objects.filter(references__isnull=False).exists())
+
+    def test_name_assigned_in_code_is_tracked(self):
+        other = make_product(self.farm, name='Spinach', photo=SimpleUploadedFile('spinach.jpg', b'spinach'))
+        other.photo.name = self.blob.name
+        other.save(update_fields=['photo'])
+        self.assertEqual(self.references(other), [self.blob.name])
+        self.assertEqual(MediaBlob.objects.filter(references__isnull=True).count(), 1)
+
+    def test_saves_that_leave_photos_alone_stay_cheap(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.product.save(update_fields=['views_count'])
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.product.save()
+        self.assertFalse([q for q in queries.captured_queries if 'INSERT' in q['sql'] or 'DELETE' in q['sql']])
+        self.assertEqual(self.references(self.product), [self.blob.name])
+
+
+class ImageRenditionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(User.objects.create_user('farmer', role='farmer'))
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'     # Make
+        exif[0x0112] = 6                # Orientation: rotate 90° clockwise to display
+        photo = io.BytesIO()
+        Image.new('RGB', (2000, 1000), 'green').save(photo, 'JPEG', exif=exif.tobytes())
+        cls.photo = photo.getvalue()
+
+    def setUp(self):
+        use_temp_media(self)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.product = make_product(self.farm, photo=SimpleUploadedFile('kale.jpg', self.photo))
+        self.other = make_product(self.farm, name='Spinach', photo=SimpleUploadedFile('again.jpg', self.photo))
+        self.original = self.product.photo.name
+
+    def open(self, name):
+        with default_storage.open(name, 'rb') as handle:
+            image = Image.open(handle)
+            image.load()
+        return image
+
+    def test_original_is_replaced_by_a_clean_blob(self):
+        clean = images.render(self.original)
+        self.assertNotEqual(clean, self.original)
+        self.assertTrue(clean.startswith('cas/'))
+        stored = self.open(clean)
+        self.assertFalse(stored.getexif())
+        self.assertEqual(stored.size, (1000, 2000))   # the orientation tag was applied, not dropped
+        for product in (self.product, self.other):
+            product.refresh_from_db()
+            self.assertEqual(product.photo.name, clean)
+        self.assertEqual(list(MediaReference.objects.values_list('blob__name', flat=True).distinct()), [clean])
+        # The GPS-bearing original goes at once rather than waiting for gc_media.
+        self.assertFalse(MediaBlob.objects.filter(name=self.original).exists())
+        self.assertFalse(default_storage.exists(self.original))
+
+    def test_original_still_referenced_elsewhere_is_kept(self):
+        with mock.patch.object(images, 'repoint'):   # a reference repoint did not move
+            clean = images.render(self.original)
+        self.assertTrue(MediaBlob.objects.filter(name=self.original).exists())
+        self.assertTrue(default_storage.exists(self.original))
+        self.assertTrue(default_storage.exists(clean))
+
+    def test_renditions_are_written_in_every_size_and_format(self):
+        clean = images.render(self.original)
+        for size, (width, height) in images.RENDITIONS.items():
+            for fmt, (pil_format, _) in images.FORMATS.items():
+                rendition = self.open(images.rendition_name(clean, size, fmt))
+                self.assertEqual(rendition.format, pil_format)
+                self.assertLessEqual(rendition.width, width)
+                self.assertLessEqual(rendition.height, height)
+                self.assertEqual(max(rendition.width / width, rendition.height / height), 1, (size, fmt))
+
+    def test_rendition_url_falls_back_to_the_original_until_rendered(self):
+        self.assertEqual(images.rendition_url(self.product.photo, 'thumb'), default_storage.url(self.original))
+        self.assertEqual(images.rendition_urls(self.product.photo)['card']['jpg'], default_storage.url(self.original))
+        clean = images.render(self.original)
+        self.product.refresh_from_db()
+        self.assertEqual(images.rendition_url(self.product.photo, 'thumb'),
+                         default_storage.url(images.rendition_name(clean, 'thumb', 'webp')))
+        self.assertEqual(images.rendition_url(self.product.photo, 'thumb', 'jpg'),
+                         default_storage.url(f'renditions/{clean[:-4]}/thumb.jpg'))
+
+
+class ChunkedUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = User.objects.create_user('driver', role='driver')
+        cls.shipment = make_shipment(cls.driver)
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), 'green').save(image, 'PNG')
+        cls.photo = image.getvalue()
+
+    def setUp(self):
+        use_temp_media(self)
+
+    def start(self, data=None, **options):
+        data = data or self.photo
+        return uploads.open_session(self.driver, 'shipment', self.shipment.pk, 'pod.png', len(data), **options)
+
+    def put(self, session, offset, data):
+        return uploads.write_chunk(session, offset, io.BytesIO(data), len(data))
+
+    def upload(self, session, data=None):
+        data = data or self.photo
+        for offset in range(0, len(data), 50):
+            self.put(session, offset, data[offset:offset + 50])
+
+    def assertUploadError(self, status, func, *args):
+        with self.assertRaises(uploads.UploadError) as raised:
+            func(*args)
+        self.assertEqual(raised.exception.status, status)
+        return raised.exception
+
+    def test_chunks_must_continue_at_the_received_offset(self):
+        session = self.start()
+        self.assertEqual(self.put(session, 0, self.photo[:50]), 50)
+        error = self.assertUploadError(409, self.put, session, 60, self.photo[60:100])
+        self.assertEqual(str(error), 'Expected offset 50')
+        self.assertEqual(self.put(session, 0, self.photo[:50]), 50)  # a retried chunk is acknowledged as-is
+        self.assertUploadError(413, self.put, session, 50, self.photo[50:] + b'extra')
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).received_bytes, 50)
+
+    def test_complete_attaches_the_photo_and_applies_the_status_change(self):
+        session = self.start(on_complete={'status': 'delivered'})
+        self.upload(session)
+        shipment = uploads.complete(session)
+        self.assertEqual(shipment.status, 'delivered')
+        self.assertTrue(shipment.proof_of_delivery_photo.name.startswith('cas/'))
+        self.assertEqual(shipment.proof_of_delivery_photo.read(), self.photo)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).status, 'complete')
+        self.assertFalse(os.path.exists(uploads.part_path(session)))
+        self.assertUploadError(410, uploads.complete, session)
+
+    def test_pending_status_change_needs_a_usable_fix(self):
+        for fix in [{'latitude': 'nan'}, {'latitude': 1e9}, {'longitude': -181}, {'longitude': 'east'},
+                    {'speed_kmh': 'inf'}, {'speed_kmh': -5}, {'speed_kmh': 1e6}]:
+            self.assertUploadError(400, lambda: self.start(on_complete={'status': 'delivered', **fix}))
+        session = self.start(on_complete={'status': 'delivered', 'latitude': -1.3, 'longitude': 36.8,
+                                          'speed_kmh': 12})
+        self.upload(session)
+        uploads.complete(session)
+        self.assertEqual(ShipmentTracking.objects.get(shipment=self.shipment).latitude, Decimal('-1.3'))
+
+    def test_unusable_stored_status_change_is_a_422(self):
+        session = self.start(on_complete={'status': 'delivered'})
+        UploadSession.objects.filter(pk=session.pk).update(
+            on_complete={'status': 'delivered', 'latitude': 1e9, 'longitude': 36.8})
+        session.refresh_from_db()
+        self.upload(session)
+        self.assertUploadError(422, uploads.complete, session)
+        self.shipment.refresh_from_db()
+        self.assertNotEqual(self.shipment.status, 'delivered')
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).status, 'open')
+        self.assertFalse(ShipmentTracking.objects.filter(shipment=self.shipment).exists())
+
+    def test_complete_refuses_partial_corrupt_or_non_image_files(self):
+        session = self.start()
+        self.put(session, 0, self.photo[:50])
+        self.assertUploadError(409, uploads.complete, session)
+
+        session = self.start(sha256='0' * 64)
+        self.upload(session)
+        self.assertUploadError(422, uploads.complete, session)
+
+        session = self.start(b'not a picture')
+        self.upload(session, b'not a picture')
+        self.assertUploadError(422, uploads.complete, session)
+        self.assertEqual(UploadSession.objects.filter(status='open').count(), 3)
+        self.shipment.refresh_from_db()
+        self.assertFalse(self.shipment.proof_of_delivery_photo)
+
+
+# ============================================================
+# 📲 DRIVER SYNC
+# ============================================================
+
+class DriverSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = User.objects.create_user('driver', role='driver')
+        cls.other = User.objects.create_user('other', role='driver')
+        cls.shipment = make_shipment(cls.driver, status='delivered', driver_rating=2)
+        cls.others = make_shipment(cls.other, status='delivered')
+
+    def sync(self, *mutations):
+        self.client.force_login(self.driver)
+        response = self.client.post(reverse('api_driver_sync'), {'mutations': list(mutations)},
+                                    content_type='application/json')
+        return response.json()['results']
+
+    def rating(self, client_id, shipment, rating=5):
+        return {'id': client_id, 'type': 'rating', 'at': timezone.now().isoformat(), 'shipment': shipment.pk,
+                'rating': rating}
+
+    def test_rating_never_touches_the_drivers_own_rating(self):
+        [result] = self.sync(self.rating('r1', self.shipment))
+        self.assertEqual(result['result'], 'applied')
+        self.shipment.refresh_from_db()
+        self.assertEqual((self.shipment.driver_rating, self.shipment.handover_rating), (2, 5))
+
+    def test_other_drivers_shipments_cannot_be_rated(self):
+        [result] = self.sync(self.rating('r1', self.others))
+        self.assertEqual(result['result'], 'rejected')
+        self.others.refresh_from_db()
+        self.assertEqual((self.others.driver_rating, self.others.handover_rating), (None, None))
+
+    def test_resent_mutations_are_acknowledged_not_reapplied(self):
+        self.sync(self.rating('r1', self.shipment, 4))
+        results = self.sync(self.rating('r1', self.shipment, 1), self.rating('r2', self.shipment, 3))
+        self.assertEqual([r.get('duplicate', False) for r in results], [True, False])
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.handover_rating, 3)
+        self.assertEqual(SyncMutation.objects.filter(user=self.driver).count(), 2)
+
+    def test_malformed_mutation_mid_batch_is_rejected_alone(self):
+        shipment = make_shipment(self.driver, status='picked_up')
+        at = timezone.now().isoformat()
+
+        def fix(client_id, **fields):
+            return {'id': client_id, 'type': 'location', 'at': at, 'shipment': shipment.pk,
+                    'latitude': -1.2, 'longitude': 36.7, **fields}
+
+        results = self.sync(
+            fix('l1'),
+            {'id': 's1', 'type': 'status', 'at': at, 'shipment': shipment.pk, 'status': 'in_transit',
+             'latitude': 1e9, 'longitude': 36.7},
+            fix('l2', speed_kmh='fast'),
+            fix('l3', latitude='NaN'),
+            fix('l4', longitude=-200),
+            {'id': 's2', 'type': 'status', 'at': at, 'shipment': shipment.pk, 'status': 'in_transit',
+             'latitude': -1.25, 'longitude': 36.75, 'speed_kmh': 40},
+        )
+        self.assertEqual([r['result'] for r in results],
+                         ['applied', 'rejected', 'rejected', 'rejected', 'rejected', 'applied'])
+        self.assertIn('latitude', results[1]['error'])
+        points = ShipmentTracking.objects.filter(shipment=shipment).values_list('latitude', 'speed_kmh')
+        self.assertEqual(sorted(points), [(Decimal('-1.25'), Decimal('40')), (Decimal('-1.2'), Decimal('0'))])
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.status, 'in_transit')
+
+    def test_model_validation_errors_reject_only_their_mutation(self):
+        refused = ValidationError({'rating': ['Ensure this value is less than or equal to 5.']})
+        with mock.patch.object(Shipment, 'save', side_effect=[refused, None]):
+            results = self.sync(self.rating('r1', self.shipment), self.rating('r2', self.shipment, 4))
+        self.assertEqual([r['result'] for r in results], ['rejected', 'applied'])
+        self.assertIn('less than or equal to 5', results[0]['error'])
+
+    def test_only_drivers_can_sync(self):
+        self.client.force_login(User.objects.create_user('buyer', role='buyer'))
+        response = self.client.post(reverse('api_driver_sync'), {'mutations': [self.rating('r1', self.shipment)]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.shipment.refresh_from_db()
+        self.assertIsNone(self.shipment.handover_rating)
+
+
+# ============================================================
+# 🔄 CHANGE FEED
+# ============================================================
+
+class ChangeFeedTests(TestCase):
+    """The cursor never moves past a row that could still be committing."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('farmer', role='farmer')
+        cls.stranger = User.objects.create_user('stranger', role='farmer')
+
+    def notify(self, seconds_ago, user=None):
+        notification = Notification.objects.create(user=user or self.user, notification_type='system',
+                                                   title='Hello', message='.')
+        self.stamp(notification, seconds_ago)
+        return notification
+
+    def stamp(self, notification, seconds_ago):
+        Notification.objects.filter(pk=notification.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds_ago))
+
+    def poll(self, token=None, limit=10):
+        page = change_feed.changes(self.user, token, feeds=['notifications'], limit=limit)
+        return [row['id'] for row in page['changes']['notifications']], page['has_more'], page['token']
+
+    def test_pages_in_updated_at_then_id_order(self):
+        first, second = self.notify(30), self.notify(30)
+        third = self.notify(20)
+        self.notify(20, user=self.stranger)
+        ids, has_more, token = self.poll(limit=2)
+        self.assertEqual((ids, has_more), ([first.pk, second.pk], True))
+        ids, has_more, token = self.poll(token, limit=2)
+        self.assertEqual((ids, has_more), ([third.pk], False))
+        self.assertEqual(self.poll(token)[0], [])
+
+    def test_rows_inside_the_settle_window_wait_for_a_later_poll(self):
+        settled = self.notify(10)
+        fresh = self.notify(0)
+        ids, _, token = self.poll()
+        self.assertEqual(ids, [settled.pk])
+        # Time passes; a row stamped after the cursor but committed late is still ahead of it.
+        self.stamp(fresh, change_feed.SETTLE.total_seconds() + 1)
+        self.assertEqual(self.poll(token)[0], [fresh.pk])
+
+    def test_cursor_stays_put_when_nothing_has_settled(self):
+        settled = self.notify(10)
+        _, _, token = self.poll()
+        fresh = self.notify(0)
+        ids, _, held = self.poll(token)
+        self.assertEqual(ids, [])
+        self.assertEqual(change_feed.read_token(held), change_feed.read_token(token))
+        self.stamp(fresh, 5)
+        self.assertEqual(self.poll(held)[0], [fresh.pk])
+        self.assertNotIn(settled.pk, self.poll(held)[0])
+
+    def test_buyer_and_farmer_orders_merge_into_one_ordered_page(self):
+        orders = []
+        for number, (buyer, farmer, seconds_ago) in enumerate([(self.user, self.stranger, 30),
+                                                                (self.stranger, self.user, 25),
+                                                                (self.user, self.user, 22),
+                                                                (self.stranger, self.stranger, 21),
+                                                                (self.user, self.stranger, 20)]):
+            order = Order.objects.create(order_number=f'ORD-{number}', buyer=buyer, farmer=farmer,
+                                         delivery_address='Nakuru')
+            Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(seconds=seconds_ago))
+            orders.append(order.pk)
+        with self.assertNumQueries(2):   # one per owner index
+            page = change_feed.changes(self.user, feeds=['orders'], limit=3)
+        self.assertEqual(([row['id'] for row in page['changes']['orders']], page['has_more']),
+                         (orders[:3], True))
+        page = change_feed.changes(self.user, page['token'], feeds=['orders'], limit=3)
+        self.assertEqual(([row['id'] for row in page['changes']['orders']], page['has_more']), ([orders[4]], False))
+
+    @skipUnless(connection.vendor == 'sqlite', 'asserts the SQLite query plan')
+    def test_each_owner_query_range_scans_its_index_from_the_cursor(self):
+        cursor = (timezone.now() - timedelta(minutes=5), 42)
+        for name, indexes in [('orders', ['order_buyer_changes_idx', 'order_farmer_changes_idx']),
+                              ('notifications', ['notification_changes_idx']),
+                              ('products', ['product_changes_idx'])]:
+            queries = change_feed.feed_queries(self.user, name, cursor)
+            for query, index in zip(queries, indexes, strict=True):
+                plan = query.explain()
+                self.assertIn(f'USING INDEX {index} (', plan)
+                self.assertIn('updated_at>? AND updated_at<?', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_tampered_token_starts_over(self):
+        notification = self.notify(10)
+        _, _, token = self.poll()
+        self.assertEqual(self.poll(token[:-2] + 'xx')[0], [notification.pk])
+
+
+# ============================================================
+# 🔔 NOTIFICATIONS
+# ============================================================
+
+class UnreadCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', role='buyer')
+
+    def send(self, count):
+        deliver([Notification(user=self.user, notification_type='system', title=f'Note {i}', message='.')
+                 for i in range(count)])
+
+    def dashboard(self):
+        self.client.force_login(self.user)
+        context = self.client.get(reverse('dashboard')).context
+        return context['unread_count'], len(context['notifications'])
+
+    def counter(self):
+        return UnreadCounter.objects.get(user=self.user).unread
+
+    def test_counter_moves_with_every_write_path(self):
+        self.send(3)
+        self.assertEqual(self.counter(), 3)
+        first, second, third = Notification.objects.filter(user=self.user).order_by('pk')
+        self.assertEqual(mark_read(self.user, [first.pk]), 1)
+        self.assertEqual(mark_read(self.user, [first.pk]), 0)      # already read: no double decrement
+        self.assertEqual(self.counter(), 2)
+        second.is_read = True                                       # the admin's list_editable toggle
+        second.save()
+        self.assertEqual(self.counter(), 1)
+        third.delete()
+        self.assertEqual(self.counter(), 0)
+        Notification.objects.filter(pk__in=[first.pk, second.pk]).update(created_at=timezone.now() - timedelta(days=90))
+        self.assertEqual(archive(days=30), 2)
+        self.assertEqual(unread_count(self.user.pk), 0)
+
+    def test_count_is_one_row_read(self):
+        self.send(7)
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_count(self.user.pk), 7)
+        self.assertEqual(unread_count(User.objects.create_user('new', role='buyer').pk), 0)
+
+    def test_counter_rolls_back_with_its_notifications(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.send(2)
+            raise RuntimeError('request failed')
+        self.assertEqual(unread_count(self.user.pk), 0)
+
+    def test_reconcile_repairs_drift_from_plain_updates(self):
+        self.send(4)
+        other = User.objects.create_user('other', role='farmer')
+        UnreadCounter.objects.create(user=other, unread=9)         # no notifications at all
+        # A plain UPDATE from another process fires no signal and moves no counter.
+        Notification.objects.filter(pk=Notification.objects.first().pk).update(is_read=True)
+        self.assertEqual(unread_count(self.user.pk), 4)
+        out = io.StringIO()
+        call_command('reconcile_unread_counts', '--batch-size', '1', stdout=out)
+        self.assertIn('1 user(s) have unread notifications', out.getvalue())
+        self.assertEqual((unread_count(self.user.pk), unread_count(other.pk)), (3, 0))
+
+    def test_dashboard_lists_five_and_badges_them_all(self):
+        self.send(7)
+        self.assertEqual(self.dashboard(), (7, 5))
+        self.assertEqual(mark_read(self.user), 7)
+        self.assertEqual(self.dashboard(), (0, 0))
+
+
+@override_settings(NOTIFICATION_DIGEST_WINDOWS={'order': 300}, JOB_QUEUE_EAGER=False)
+class DigestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('farmer', role='farmer')
+        cls.key = f'notifications.digest:{cls.user.pk}:order'
+
+    def notify(self, started, committed):
+        with mock.patch('web_app.jobs.time.time') as clock, self.captureOnCommitCallbacks(execute=True):
+            clock.return_value = started
+            notifications.notify([self.user.pk], 'order', 'New order', 'Kale x 10')
+            clock.return_value = committed
+
+    def delay(self, job):
+        return (job.run_after - job.created_at).total_seconds()
+
+    def test_bucket_and_delay_are_picked_at_commit(self):
+        # Buffered in window 19 (5700-6000) but committed in window 20.
+        self.notify(5990.0, 6010.0)
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.idempotency_key, f'{self.key}:20')
+        self.assertAlmostEqual(self.delay(job), 6300 - 6010 + notifications.DIGEST_GRACE_SECONDS, delta=1)
+
+    def test_events_in_one_window_share_a_flush(self):
+        self.notify(6001.0, 6001.0)
+        self.notify(6299.0, 6299.0)
+        self.assertEqual(BackgroundJob.objects.get().idempotency_key, f'{self.key}:20')
+        self.notify(6300.0, 6300.0)     # the boundary opens the next window
+        self.assertEqual(sorted(BackgroundJob.objects.values_list('idempotency_key', flat=True)),
+                         [f'{self.key}:20', f'{self.key}:21'])
+        digest = notifications.flush_digest(self.user.pk, 'order')
+        self.assertEqual((digest.item_count, digest.title), (3, '🛒 3 order updates'))
+        self.assertFalse(PendingNotification.objects.exists())
+
+    def test_claimed_bucket_falls_through_to_the_next(self):
+        BackgroundJob.objects.create(task='notifications.digest', idempotency_key=f'{self.key}:20', status='running')
+        self.notify(6030.0, 6030.0)
+        job = BackgroundJob.objects.get(idempotency_key=f'{self.key}:21')
+        self.assertEqual(job.status, 'queued')
+        self.assertAlmostEqual(self.delay(job), 6600 - 6030 + notifications.DIGEST_GRACE_SECONDS, delta=1)
+
+
+@mock.patch('web_app.notifications.BATCH_SIZE', 2)
+class BroadcastTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmers = [User.objects.create_user(f'farmer{i}', role='farmer') for i in range(3)]
+
+    def broadcast(self, after=0):
+        return notifications.broadcast('b1', 'system', 'Rain', 'Heavy rain expected.', role='farmer', after=after)
+
+    def test_retried_chunk_sends_nothing(self):
+        self.assertEqual(self.broadcast(), 2)
+        self.assertEqual(self.broadcast(), 0)        # the job ran again after its chunk committed
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(BackgroundJob.objects.filter(task='notifications.broadcast').count(), 1)
+        self.assertEqual(self.broadcast(after=self.farmers[1].pk), 1)
+        self.assertEqual(sorted(BroadcastChunk.objects.values_list('after', 'recipients')),
+                         [(0, 2), (self.farmers[1].pk, 1)])
+        self.assertEqual([unread_count(farmer.pk) for farmer in self.farmers], [1, 1, 1])
+
+    def test_failed_chunk_leaves_no_marker(self):
+        with mock.patch('web_app.notifications.send', side_effect=RuntimeError('db down')), \
+                self.assertRaises(RuntimeError):
+            self.broadcast()
+        self.assertFalse(BroadcastChunk.objects.exists())
+        self.assertEqual(self.broadcast(), 2)
+
+
+class InboxPagingTests(TestCase):
+    """Hot and archived notifications page as one inbox, newest first, each row exactly once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('farmer', role='farmer')
+        other = User.objects.create_user('other', role='farmer')
+        cls.ids = [n.pk for n in deliver([Notification(user=cls.user, notification_type='order', title='Order',
+                                                       message='.') for _ in range(10)])]
+        deliver([Notification(user=other, notification_type='order', title='Order', message='.')])
+        old = cls.ids[:6]
+        straggler = cls.ids[1]  # old but still unread, so it stays in the hot table
+        Notification.objects.filter(pk__in=old).update(created_at=timezone.now() - timedelta(days=60))
+        Notification.objects.filter(pk__in=old).exclude(pk=straggler).update(is_read=True)
+        cls.archived = archive(days=30)
+
+    def pages(self, size=3):
+        before, pages = None, []
+        while True:
+            items, before = inbox_page(self.user, before, size)
+            pages.append([n.pk for n in items])
+            if before is None:
+                return pages
+
+    def test_archive_moves_only_old_read_rows(self):
+        self.assertEqual(self.archived, 5)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 5)
+
+    def test_pages_merge_hot_and_archived_rows_by_id(self):
+        ids = self.ids[::-1]
+        self.assertEqual(self.pages(), [ids[0:3], ids[3:6], ids[6:9], ids[9:]])
+
+    def test_archive_is_read_only_once_the_hot_rows_run_out(self):
+        with CaptureQueriesContext(connection) as queries:
+            items, before = inbox_page(self.user, size=3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(before, items[-1].pk)
+        with CaptureQueriesContext(connection) as queries:
+            inbox_page(self.user, before, size=3)
+        self.assertEqual(len(queries), 2)
+
+    def test_inbox_view_pages_through_the_archive(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notification_list'), {'before': self.ids[5]})
+        self.assertEqual([n.pk for n in response.context['notifications']], self.ids[4::-1])
+        self.assertIsNone(response.context['next_before'])
+
+
+# ============================================================
+# 📤 EXPORTS
+# ============================================================
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.price = MarketPriceIndex.objects.create(market='nakuru_central', product_name='Kale',
+                                                     price_per_kg=Decimal('42.05'), recorded_date=date(2024, 2, 29))
+
+    def export_csv(self, queryset, name):
+        path, count = export_queryset(queryset, os.path.join(self.workdir, name), fmt='csv')
+        return path, count, list(read_csv_export(path))
+
+    def test_csv_round_trips_decimals_dates_and_timestamps(self):
+        path, count, rows = self.export_csv(MarketPriceIndex.objects.all(), 'prices')
+        self.assertTrue(path.endswith('.csv.gz'))
+        self.assertEqual(count, 1)
+        self.assertEqual(rows, [{
+            'id': self.price.pk, 'market': 'nakuru_central', 'product_name': 'Kale', 'commodity_key': 'kale',
+            'price_per_kg': Decimal('42.05'), 'recorded_date': date(2024, 2, 29),
+            'created_at': self.price.created_at, 'updated_at': self.price.updated_at,
+        }])
+
+    def test_csv_round_trips_empty_columns_as_null(self):
+        farmer = User.objects.create_user('farmer', role='farmer')
+        buyer = User.objects.create_user('buyer', role='buyer')
+        order = Order.objects.create(order_number='ORD-1', buyer=buyer, farmer=farmer, delivery_address='Nakuru',
+                                     subtotal=Decimal('1200.50'))
+        _, _, [row] = self.export_csv(Order.objects.all(), 'orders')
+        self.assertEqual(row['subtotal'], Decimal('1200.50'))
+        self.assertEqual(row['buyer_id'], order.buyer_id)
+        self.assertIsNone(row['payment_date'])
+        self.assertIsNone(row['delivery_latitude'])
+        self.assertIsNone(row['shipment_id'])
+
+    @skipUnless(parquet_available(), 'pyarrow is not installed')
+    def test_parquet_round_trips_decimals_and_dates(self):
+        import pyarrow.parquet as pq
+        path, _ = export_queryset(MarketPriceIndex.objects.all(), os.path.join(self.workdir, 'prices'), fmt='parquet')
+        [row] = pq.read_table(path).to_pylist()
+        self.assertEqual(row['price_per_kg'], Decimal('42.05'))
+        self.assertEqual(row['recorded_date'], date(2024, 2, 29))
+
+    def test_admin_action_bundles_the_csv_with_its_schema(self):
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        with mock.patch('web_app.exports.pa', None):
+            response = self.client.post(reverse('admin:web_app_marketpriceindex_changelist'), {
+                'action': 'export_columnar', '_selected_action': [self.price.pk],
+            })
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="marketpriceindex.zip"')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as bundle:
+            self.assertEqual(sorted(bundle.namelist()),
+                             ['marketpriceindex.csv.gz', 'marketpriceindex.schema.json'])
+            bundle.extractall(self.workdir)
+        [row] = read_csv_export(os.path.join(self.workdir, 'marketpriceindex.csv.gz'))
+        self.assertEqual(row['price_per_kg'], Decimal('42.05'))
+        self.assertEqual(row['recorded_date'], date(2024, 2, 29))
+
+
+# ============================================================
+# 🏷️ COMMODITY CATALOG
+# ============================================================
+
+class CatalogTests(TestCase):
+    def test_names_normalise_onto_one_key(self):
+        for name in ['Sukuma Wiki (Kale)', 'Fresh KALE', 'kales', 'Organic collard greens']:
+            self.assertEqual(commodity_key_for(name), 'kale', name)
+        self.assertEqual(commodity_key_for('Wheat Flour (Atta)'), 'wheat_flour')
+        self.assertEqual(commodity_key_for('Irish Potatoes, Grade 1'), 'potato')
+
+    def test_digits_keep_uncatalogued_names_apart(self):
+        self.assertEqual(commodity_key_for('Crop1'), 'crop1')
+        self.assertEqual(commodity_key_for('Crop2'), 'crop2')
+        self.assertEqual(commodity_key_for('Hybrid H614 seed'), 'hybrid_h614_seed')
+
+    def test_numbered_names_do_not_share_price_rows(self):
+        for name, price in [('Crop1', 10), ('Crop2', 99)]:
+            MarketPriceIndex.objects.create(market='nakuru_central', product_name=name, price_per_kg=price,
+                                            recorded_date=date.today())
+        matches = filter_by_commodity(MarketPriceIndex.objects.all(), 'Crop1')
+        self.assertEqual([row.product_name for row in matches], ['Crop1'])
+        self.assertEqual(MarketPriceIndex.objects.filter(commodity_key='crop2').count(), 1)
+
+
+# ============================================================
+# 📈 SUPPLY FORECASTS
+# ============================================================
+
+class ForecastTests(TestCase):
+    today = date(2026, 10, 21)          # a Wednesday; forecast weeks start on Monday 2026-10-19
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', role='farmer')
+        cls.farm = make_farm(cls.farmer)
+        cls.other_farm = make_farm(User.objects.create_user('other', role='farmer'))
+
+    def harvest(self, farm, week, kg, **fields):
+        day = week_start(self.today) + timedelta(weeks=week, days=2)
+        return HarvestSchedule.objects.create(farm=farm, product_name='Kale', expected_quantity_kg=kg,
+                                              harvest_date=day, ready_for_pickup_date=day, **fields)
+
+    def curve(self, commodity='kale', region='Limuru'):
+        return [(row.week_start, row.scheduled_kg, row.supply_kg, row.farm_count) for row in
+                SupplyForecast.objects.filter(commodity_key=commodity, region=region).order_by('week_start')]
+
+    def test_seasonal_series_lands_in_its_weeks_and_gaps_stay_zero(self):
+        # A two-week cycle (a flush every other week) with one farm picking every fourth week too.
+        for week, kg in enumerate([120, 0, 300, 0, 120, 0]):
+            if kg:
+                self.harvest(self.farm, week, kg)
+        self.harvest(self.other_farm, 0, 30)
+        self.harvest(self.other_farm, 4, 30)
+        self.harvest(self.farm, -1, 999)                       # last week: before the horizon
+        self.harvest(self.farm, 6, 999)                        # first week past the horizon
+        self.harvest(self.farm, 2, 999, status='completed')    # no longer open supply
+        self.assertEqual(compute_forecast(today=self.today), 6)
+        monday = week_start(self.today)
+        self.assertEqual(self.curve(), [
+            (monday + timedelta(weeks=week), Decimal(kg), Decimal(kg), farms)
+            for week, (kg, farms) in enumerate([(150, 2), (0, 0), (300, 1), (0, 0), (150, 2), (0, 0)])
+        ])
+
+    def test_supply_shrinks_sparse_yield_histories_towards_the_platform(self):
+        self.harvest(self.farm, -8, 100, status='completed', actual_quantity_kg=50)
+        for week in (-9, -10, -11):
+            self.harvest(self.other_farm, week, 100, status='completed', actual_quantity_kg=100)
+        self.harvest(self.farm, 1, 200)
+        self.harvest(self.other_farm, 1, 200)
+        compute_forecast(today=self.today)
+        # Platform ratio 350/400; one harvest at 0.5 and three at 1.0 each weigh against three prior harvests.
+        week = self.curve()[1]
+        self.assertEqual(week[1:], (Decimal('400.00'), Decimal('343.75'), 2))
+
+    def test_sparse_demand_is_averaged_over_the_whole_window(self):
+        buyer = User.objects.create_user('buyer', role='buyer')
+        kale = make_product(self.farm)
+        crates = make_product(make_farm(self.farmer, nearest_town='Naivasha'), name='Kale', unit='crate')
+        for number, (product, quantity, weeks_ago) in enumerate([(kale, 60, 1), (kale, 36, 9), (crates, 6, 3),
+                                                                 (kale, 500, 13)]):
+            order = Order.objects.create(order_number=f'ORD-{number}', buyer=buyer, farmer=self.farmer,
+                                         delivery_address='Nairobi')
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=40, subtotal=0)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(weeks=weeks_ago))
+        self.assertEqual(compute_forecast(), 12)
+        demand = {(row.region, row.demand_kg) for row in SupplyForecast.objects.all()}
+        # 96 kg over the 12-week window in Limuru; 6 crates of 25 kg in Naivasha, which has no harvests.
+        self.assertEqual(demand, {('Limuru', Decimal('8.00')), ('Naivasha', Decimal('12.50'))})
+        self.assertEqual(SupplyForecast.objects.filter(region='Naivasha', supply_kg=0).count(), 6)
+
+
+# ============================================================
+# 📡 INSTRUMENTATION
+# ============================================================
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    def run_request(self, view, get_response):
+        request = RequestFactory().get('/')
+        request.resolver_match = mock.Mock(view_name=view)
+        with override_settings(INSTRUMENTATION_ENABLED=True), \
+                mock.patch.object(instrumentation, 'install_template_hook'):
+            return instrumentation.InstrumentationMiddleware(get_response)(request)
+
+    def test_disabled_middleware_removes_itself_without_hooking_templates(self):
+        render = template_base.Template.render
+        with override_settings(INSTRUMENTATION_ENABLED=False), \
+                mock.patch.object(instrumentation, 'install_template_hook') as install:
+            with self.assertRaises(MiddlewareNotUsed):
+                instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+        install.assert_not_called()
+        self.assertIs(template_base.Template.render, render)
+
+    def test_repeated_query_shape_is_flagged_as_n_plus_one(self):
+        farmer = User.objects.create_user('farmer', role='farmer')
+        farms = [make_farm(farmer, name=f'Farm {n}') for n in range(3)]
+
+        def per_farm(request):
+            for farm in farms:
+                list(Product.objects.filter(farm=farm))
+            list(Product.objects.filter(farm__in=farms))
+            return HttpResponse()
+
+        def batched(request):
+            list(Product.objects.filter(farm__in=farms))
+            return HttpResponse()
+
+        with override_settings(INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=3):
+            with self.assertLogs('web_app.instrumentation', 'WARNING') as logs:
+                self.run_request('farm_products', per_farm)
+            with self.assertNoLogs('web_app.instrumentation', 'WARNING'):
+                self.run_request('farm_products', batched)
+        self.assertIn('ran 3 times', logs.output[0])
+        (row,), recent = instrumentation.snapshot()
+        self.assertEqual((row['view'], row['requests'], row['n_plus_one']), ('farm_products', 2, 1))
+        self.assertEqual(recent[1]['queries'], 4)
+        self.assertEqual(recent[1]['repeats'], 3)
+
+    def test_prometheus_exposition(self):
+        state = instrumentation._Request()
+        state.queries = 2
+        instrumentation.record('orders "a"\\b', 'GET', 200, 0.03, state)
+        instrumentation.record('orders "a"\\b', 'POST', 502, 3.0, state)
+        lines = instrumentation.prometheus().splitlines()
+        view = 'view="orders \\"a\\"\\\\b"'
+        for line in [
+            '# TYPE agrilogix_view_requests_total counter',
+            f'agrilogix_view_requests_total{{{view}}} 2',
+            f'agrilogix_view_errors_total{{{view}}} 1',
+            f'agrilogix_view_db_queries_total{{{view}}} 4',
+            '# TYPE agrilogix_view_duration_seconds histogram',
+            f'agrilogix_view_duration_seconds_bucket{{{view},le="0.025"}} 0',
+            f'agrilogix_view_duration_seconds_bucket{{{view},le="0.05"}} 1',
+            f'agrilogix_view_duration_seconds_bucket{{{view},le="5"}} 2',
+            f'agrilogix_view_duration_seconds_bucket{{{view},le="+Inf"}} 2',
+            f'agrilogix_view_duration_seconds_sum{{{view}}} 3.03',
+            f'agrilogix_view_duration_seconds_count{{{view}}} 2',
+        ]:
+            self.assertIn(line, lines)
+        self.assertTrue(all(line.startswith('# ') or line.startswith('agrilogix_') for line in lines))
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN='s3cret')
+    def test_metrics_needs_the_token_or_staff(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.client.force_login(User.objects.create_user('farmer', role='farmer'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', role='admin', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(INSTRUMENTATION_METRICS_TOKEN='')
+    def test_metrics_without_a_configured_token_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+# ============================================================
+# 🧮 QUERY BUDGETS
+# ============================================================
+
+class QueryBudgetTests(TestCase):
+    """Each page renders in a fixed number of queries, however many rows it lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        cls.farmer = User.objects.create_user('farmer', role='farmer', first_name='Wanjiru')
+        cls.buyer = User.objects.create_user('buyer', role='buyer', first_name='Otieno')
+        cls.driver = User.objects.create_user('driver', role='driver', first_name='Kamau')
+        cls.operator = User.objects.create_user('operator', role='cold_storage', first_name='Achieng')
+        cls.admin = User.objects.create_user('admin', role='admin', is_staff=True, is_superuser=True)
+        buyers = [cls.buyer] + [User.objects.create_user(f'buyer{i}', role='buyer') for i in range(ROWS - 1)]
+
+        category = ProductCategory.objects.create(name='Vegetables')
+        cls.farm = make_farm(cls.farmer)
+        cls.route = LogisticsRoute.objects.create(
+            name='Limuru - Nairobi', origin_name='Limuru', origin_latitude=Decimal('-1.1'),
+            origin_longitude=Decimal('36.6'), destination_name='Nairobi', destination_latitude=Decimal('-1.3'),
+            destination_longitude=Decimal('36.8'), distance_km=40, estimated_duration_hours=1,
+            base_cost_per_kg=Decimal('2.5'))
+        vehicles = [Vehicle.objects.create(
+            driver=cls.driver, vehicle_type='pickup', plate_number=f'KDA {i:03d}A', make_model='Toyota Hilux',
+            year=2020, capacity_kg=1000, insurance_expiry=today + timedelta(days=300),
+            inspection_expiry=today + timedelta(days=300)) for i in range(ROWS)]
+
+        for i in range(ROWS):
+            product = Product.objects.create(
+                farm=cls.farm, category=category, name=f'Kale {i}', quantity_available=100, price_per_unit=40,
+                harvest_date=today)
+            HarvestSchedule.objects.create(
+                farm=cls.farm, product_name=f'Kale {i}', expected_quantity_kg=500, harvest_date=today + timedelta(i),
+                ready_for_pickup_date=today + timedelta(i + 1))
+            PostHarvestLossReport.objects.create(
+                farm=cls.farm, product_name=f'Kale {i}', quantity_lost_kg=10, estimated_value_lost=400,
+                primary_cause='handling', incident_date=today - timedelta(i))
+            shipment = Shipment.objects.create(
+                shipment_code=f'SHP{i:05d}', driver=cls.driver, vehicle=vehicles[i], route=cls.route,
+                pickup_address='Limuru', pickup_latitude=Decimal('-1.1'), pickup_longitude=Decimal('36.6'),
+                delivery_address='Nairobi', delivery_latitude=Decimal('-1.3'), delivery_longitude=Decimal('36.8'),
+                status='in_transit', scheduled_pickup=timezone.now(), weight_kg=100)
+            order = Order.objects.create(
+                order_number=f'ORD{i:05d}', buyer=cls.buyer, farmer=cls.farmer, shipment=shipment,
+                status='confirmed', subtotal=4000, total_amount=4200, delivery_address='Nairobi')
+            OrderItem.objects.create(order=order, product=product, quantity=100, unit_price=40)
+            ShipmentTracking.objects.create(
+                shipment=shipment, latitude=Decimal('-1.2'), longitude=Decimal('36.7'), status_note='En route')
+            Dispute.objects.create(order=order, raised_by=buyers[i], reason='quality', description='Wilted')
+            Notification.objects.create(user=cls.farmer, notification_type='order', title='New order', message='.')
+            if i == 0:
+                cls.order, cls.shipment = order, shipment
+
+        cls.facility = make_facility(cls.operator)
+        for i in range(ROWS):
+            booking = make_booking(cls.facility, buyers[i])
+            TemperatureLog.objects.create(
+                booking=booking, sensor_id=f'S{i}', temperature_celsius=12, alert_level='warning')
+            TemperatureLog.objects.create(
+                shipment=cls.shipment, sensor_id=f'T{i}', temperature_celsius=4)
+        cls.booking = booking
+
+    def assertQueryBudget(self, user, url, budget):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url} ran {len(queries)} queries:\n' + '\n'.join(q['sql'] for q in queries.captured_queries))
+
+    def test_farmer_dashboard(self):
+        self.assertQueryBudget(self.farmer, reverse('dashboard'), 10)
+
+    def test_buyer_dashboard(self):
+        self.assertQueryBudget(self.buyer, reverse('dashboard'), 9)
+
+    def test_driver_dashboard(self):
+        self.assertQueryBudget(self.driver, reverse('dashboard'), 7)
+
+    def test_cold_storage_dashboard(self):
+        self.assertQueryBudget(self.operator, reverse('dashboard'), 6)
+
+    def test_admin_dashboard(self):
+        self.assertQueryBudget(self.admin, reverse('dashboard'), 10)
+
+    def test_farm_list(self):
+        self.assertQueryBudget(self.buyer, reverse('farm_list'), 4)
+
+    def test_farm_detail(self):
+        self.assertQueryBudget(self.buyer, reverse('farm_detail', args=[self.farm.pk]), 7)
+
+    def test_harvest_list(self):
+        self.assertQueryBudget(self.farmer, reverse('harvest_list'), 4)
+
+    def test_product_list(self):
+        self.assertQueryBudget(self.buyer, reverse('product_list'), 5)
+
+    def test_order_list(self):
+        self.assertQueryBudget(self.farmer, reverse('order_list'), 4)
+
+    def test_order_detail(self):
+        self.assertQueryBudget(self.buyer, reverse('order_detail', args=[self.order.pk]), 7)
+
+    def test_dispute_list(self):
+        self.assertQueryBudget(self.admin, reverse('dispute_list'), 4)
+
+    def test_vehicle_list_for_driver(self):
+        self.assertQueryBudget(self.driver, reverse('vehicle_list'), 4)
+
+    def test_vehicle_list(self):
+        self.assertQueryBudget(self.buyer, reverse('vehicle_list'), 4)
+
+    def test_shipment_list(self):
+        self.assertQueryBudget(self.driver, reverse('shipment_list'), 4)
+
+    def test_shipment_detail(self):
+        self.assertQueryBudget(self.driver, reverse('shipment_detail', args=[self.shipment.pk]), 6)
+
+    def test_cold_storage_list(self):
+        self.assertQueryBudget(self.buyer, reverse('cold_storage_list'), 4)
+
+    def test_cold_storage_detail(self):
+        self.assertQueryBudget(self.operator, reverse('cold_storage_detail', args=[self.facility.pk]), 6)
+
+    def test_booking_detail(self):
+        self.assertQueryBudget(self.operator, reverse('cold_storage_booking_detail', args=[self.booking.pk]), 6)
+
+    def test_temperature_logs(self):
+        self.assertQueryBudget(self.operator, reverse('temperature_logs', args=[self.booking.pk]), 5)
+
+    def test_loss_reports(self):
+        self.assertQueryBudget(self.farmer, reverse('loss_report_list'), 4)
+
+    def test_notifications(self):
+        self.assertQueryBudget(self.farmer, reverse('notification_list'), 5)
@@ -0,0 +1,184 @@
+"""
+Resumable chunked uploads for proof-of-delivery and dispute photos.
+
+A client opens an UploadSession (declaring the file size and, for
+deliveries, the status change to apply), PUTs the file in chunks at
+explicit byte offsets, and completes the session. Each chunk is streamed
+straight into ``<CHUNKED_UPLOAD_DIR>/<session id>.part``; after a dropped
+connection the client asks for the session's offset and carries on from
+there. On completion the file is checked, stored through the photo field
+(so it is content-addressed and rendered like any other upload) and
+attached to the Shipment or Dispute, applying any pending status change in
+the same transaction.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .models import Dispute, Shipment, UploadSession
+from .shipments import clean_fix, update_status as update_shipment_status
+
+COPY_CHUNK_BYTES = 64 * 1024
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+class UploadError(Exception):
+    """A request the session cannot accept; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def part_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.pk}.part')
+
+
+def _target_object(user, target, object_id):
+    if target == 'shipment':
+        return Shipment.objects.filter(pk=object_id, driver=user).first()
+    if target == 'dispute':
+        return Dispute.objects.filter(
+            Q(raised_by=user) | Q(order__buyer=user) | Q(order__farmer=user), pk=object_id).first()
+    return None
+
+
+def open_session(user, target, object_id, filename, size, sha256='', on_complete=None):
+    """Start a session for uploading ``size`` bytes to ``target`` #``object_id``."""
+    if _target_object(user, target, object_id) is None:
+        raise UploadError(f'No {target} #{object_id} you can upload to', status=404)
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError('Only JPEG, PNG or WebP photos can be uploaded')
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_BYTES:
+        raise UploadError(f'File size must be between 1 byte and {settings.CHUNKED_UPLOAD_MAX_BYTES} bytes')
+    if on_complete and (target != 'shipment' or on_complete.get('status') != 'delivered'):
+        raise UploadError('Only a shipment\'s change to "delivered" can wait for its photo')
+    if on_complete:
+        try:
+            clean_fix(on_complete.get('latitude'), on_complete.get('longitude'), on_complete.get('speed_kmh'))
+        except ValueError as exc:
+            raise UploadError(str(exc)) from None
+
+    session = UploadSession.objects.create(
+        user=user, target=target, object_id=object_id, filename=os.path.basename(filename)[:255], size=size,
+        sha256=(sha256 or '').lower(), on_complete=on_complete or {},
+        expires_at=timezone.now() + timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS),
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Stream ``length`` bytes from ``stream`` into the session at ``offset``; returns the new offset.
+
+    The offset must equal the bytes received so far. A chunk that was already
+    received (a retry after a lost response) is acknowledged without rewriting.
+    """
+    if session.status != 'open' or session.expires_at <= timezone.now():
+        raise UploadError('Upload session is closed', status=410)
+    if offset + length <= session.received_bytes:
+        return session.received_bytes
+    if offset != session.received_bytes:
+        raise UploadError(f'Expected offset {session.received_bytes}', status=409)
+    if offset + length > session.size:
+        raise UploadError('Chunk runs past the declared file size', status=413)
+
+    written = 0
+    with open(part_path(session), 'r+b') as part:
+        part.seek(offset)
+        while written < length:
+            data = stream.read(min(COPY_CHUNK_BYTES, length - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+    # Only advance if nobody else did meanwhile; bytes at the same offset are the same bytes.
+    UploadSession.objects.filter(pk=session.pk, received_bytes=offset).update(
+        received_bytes=offset + written, updated_at=timezone.now())
+    session.refresh_from_db(fields=['received_bytes', 'status'])
+    return session.received_bytes
+
+
+def _verify(session):
+    path = part_path(session)
+    if session.received_bytes != session.size or os.path.getsize(path) != session.size:
+        raise UploadError(f'Upload incomplete: {session.received_bytes} of {session.size} bytes received',
+                          status=409)
+    if session.sha256:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as part:
+            for block in iter(lambda: part.read(COPY_CHUNK_BYTES), b''):
+                digest.update(block)
+        if digest.hexdigest() != session.sha256:
+            raise UploadError('Checksum mismatch; restart the upload', status=422)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        raise UploadError('The uploaded file is not a readable image', status=422) from None
+
+
+def complete(session):
+    """Attach the assembled file to its Shipment or Dispute; returns the updated object."""
+    if session.status == 'complete':
+        raise UploadError('Upload already completed', status=410)
+    if session.status != 'open':
+        raise UploadError('Upload session is closed', status=410)
+    _verify(session)
+    try:
+        return _attach(session)
+    except (ValidationError, ValueError) as exc:
+        # e.g. a pending status change stored before its coordinates were checked; nothing was saved.
+        raise UploadError(f'The upload could not be applied: {exc}', status=422) from None
+
+
+def _attach(session):
+    with transaction.atomic():
+        claimed = UploadSession.objects.filter(pk=session.pk, status='open').update(status='complete')
+        if not claimed:
+            raise UploadError('Upload already completed', status=410)
+        # Assigned rather than FieldFile.save()d, so the photo signals see a new upload.
+        with open(part_path(session), 'rb') as part:
+            photo = File(part, name=session.filename)
+            if session.target == 'shipment':
+                target = Shipment.objects.select_for_update().get(pk=session.object_id)
+                change = session.on_complete
+                if change:
+                    update_shipment_status(target, change['status'], latitude=change.get('latitude'),
+                                           longitude=change.get('longitude'), speed_kmh=change.get('speed_kmh'),
+                                           photo=photo)
+                else:
+                    target.proof_of_delivery_photo = photo
+                    target.save()
+            else:
+                target = Dispute.objects.select_for_update().get(pk=session.object_id)
+                target.evidence_photo = photo
+                target.save()
+    os.remove(part_path(session))
+    session.status = 'complete'
+    return target
+
+
+def abort(session):
+    UploadSession.objects.filter(pk=session.pk, status='open').update(status='aborted')
+    if os.path.exists(part_path(session)):
+        os.remove(part_path(session))
+
+
+def purge_expired(now=None):
+    """Abort open sessions past their expiry and delete their partial files; returns the count."""
+    expired = list(UploadSession.objects.filter(status='open', expires_at__lt=now or timezone.now()))
+    for session in expired:
+        abort(session)
+    return len(expired)
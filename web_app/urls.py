@@ -86,7 +86,33 @@ urlpatterns = [
 
     #  JSON API — MARKET PRICES
     path('api/market-prices/', views.api_market_prices_view, name='api_market_prices'),
+    path('api/market-prices/analytics/', views.api_market_price_analytics_view, name='api_market_price_analytics'),
+    path('api/pricing/suggest/', views.api_price_suggestion_view, name='api_price_suggestion'),
+
+    #  JSON API — SUPPLY FORECAST
+    path('api/forecast/supply/', views.api_supply_forecast_view, name='api_supply_forecast'),
+
+    #  JSON API — SHIPPING
+    path('api/shipping/quote/', views.api_shipping_quote_view, name='api_shipping_quote'),
 
     #  JSON API — VEHICLE GPS
     path('api/vehicles/<int:vehicle_pk>/location/', views.api_update_vehicle_location_view, name='api_update_vehicle_location'),
+
+    #  METRICS
+    path('metrics', views.metrics_view, name='metrics'),
+
+    #  JSON API — NOTIFICATIONS
+    path('api/notifications/read/', views.api_notifications_read_view, name='api_notifications_read'),
+    path('api/notifications/broadcast/', views.api_notifications_broadcast_view, name='api_notifications_broadcast'),
+
+    #  JSON API — CHANGE FEED
+    path('api/changes/', views.api_changes_view, name='api_changes'),
+
+    #  JSON API — DRIVER SYNC
+    path('api/driver/sync/', views.api_driver_sync_view, name='api_driver_sync'),
+
+    #  JSON API — UPLOADS
+    path('api/uploads/', views.api_upload_create_view, name='api_upload_create'),
+    path('api/uploads/<uuid:pk>/', views.api_upload_view, name='api_upload'),
+    path('api/uploads/<uuid:pk>/complete/', views.api_upload_complete_view, name='api_upload_complete'),
 ]
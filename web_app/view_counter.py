@@ -0,0 +1,101 @@
+"""
+Buffered product view counting.
+
+``record`` only bumps an in-process counter; the counts are written out by
+``flush`` at most every ``VIEW_COUNT_FLUSH_SECONDS`` (or once
+``VIEW_COUNT_FLUSH_THRESHOLD`` views are pending, or at process exit) as a
+few set-based UPDATEs: one ``views_count = views_count + n`` statement per
+distinct n, so concurrent processes never lose each other's increments.
+
+Each flush also adds the same counts to ProductViewDaily, which
+``with_recent_views`` uses to rank products by recent popularity.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Product, ProductViewDaily
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()          # (product id, day) -> views not yet written
+_last_flush = time.monotonic()
+
+
+def record(product_id):
+    """Count one view of ``product_id``; flushes when the buffer is old or large enough."""
+    global _last_flush
+    with _lock:
+        _pending[(product_id, timezone.localdate())] += 1
+        due = (len(_pending) >= settings.VIEW_COUNT_FLUSH_THRESHOLD
+               or time.monotonic() - _last_flush >= settings.VIEW_COUNT_FLUSH_SECONDS)
+        if due:
+            _last_flush = time.monotonic()
+    if due:
+        flush()
+
+
+def _by_increment(counts):
+    """{n: [keys]} so every key with the same increment shares one UPDATE."""
+    groups = defaultdict(list)
+    for key, n in counts.items():
+        groups[n].append(key)
+    return groups
+
+
+def flush():
+    """Write every buffered view to the database; returns the number of views written."""
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+    if not counts:
+        return 0
+
+    try:
+        with transaction.atomic():
+            # Products deleted since they were viewed are dropped rather than retried forever.
+            existing = set(Product.objects.filter(pk__in={pk for pk, _ in counts}).values_list('pk', flat=True))
+            per_product = Counter()
+            per_day = defaultdict(dict)
+            for (product_id, day), n in counts.items():
+                if product_id in existing:
+                    per_product[product_id] += n
+                    per_day[day][product_id] = n
+            # updated_at is left alone: view counts are not worth a change-feed entry.
+            for n, product_ids in _by_increment(per_product).items():
+                Product.objects.filter(pk__in=product_ids).update(views_count=F('views_count') + n)
+            for day, views in per_day.items():
+                # Insert missing rows first, then increment, so concurrent flushes add up.
+                ProductViewDaily.objects.bulk_create(
+                    [ProductViewDaily(product_id=product_id, day=day) for product_id in views],
+                    ignore_conflicts=True,
+                )
+                for n, product_ids in _by_increment(views).items():
+                    ProductViewDaily.objects.filter(day=day, product_id__in=product_ids).update(views=F('views') + n)
+    except Exception:
+        logger.exception('Could not flush %d buffered product views; keeping them for the next flush',
+                         sum(counts.values()))
+        with _lock:
+            _pending.update(counts)
+        return 0
+    return sum(counts.values())
+
+
+atexit.register(flush)
+
+
+def with_recent_views(queryset, days=7):
+    """Annotate ``recent_views`` (views over the last ``days`` days) for popularity ordering."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return queryset.annotate(recent_views=Sum('daily_views__views', filter=Q(daily_views__day__gte=since),
+                                              default=0))
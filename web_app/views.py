@@ -3,10 +3,14 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Sum, Count, Avg, Q
+from django.conf import settings
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from datetime import date, timedelta
+import hmac
 import json
+import math
+import uuid
 
 from .models import (
     User, Notification,
@@ -15,8 +19,23 @@ from .models import (
     Vehicle, LogisticsRoute, Shipment, ShipmentTracking,
     Order, OrderItem, Dispute,
     ColdStorageFacility, ColdStorageBooking, TemperatureLog,
-    PostHarvestLossReport, PlatformMetric, MarketPriceIndex,
+    PostHarvestLossReport, PlatformMetric, MarketPriceIndex, UploadSession,
 )
+from .catalog import display_name, filter_by_commodity
+from .driver_sync import SyncError, sync as driver_sync
+from .forecasting import forecast_curves, supply_outlook
+from .images import rendition_urls
+from .jobs import enqueue, enqueue_on_commit
+from .notifications import (
+    audience as notification_audience, inbox_page, mark_read as mark_notifications_read, unread_count,
+)
+from .price_analytics import price_analytics
+from .pricing import band_for, record_suggestion
+from .recommendations import recommended_products
+from .shipments import update_status as update_shipment_status
+from .shipping import quote_for_product
+from .summaries import loss_overview, market_coverage
+from . import change_feed, instrumentation, uploads, view_counter
 
 
 # ============================================================
@@ -112,22 +131,22 @@ def dashboard_view(request):
             'pending_orders': Order.objects.filter(farmer=user, status='pending').count(),
             'total_earnings': Order.objects.filter(farmer=user, status='completed').aggregate(
                 total=Sum('subtotal'))['total'] or 0,
-            'recent_orders': Order.objects.filter(farmer=user).order_by('-created_at')[:5],
+            'recent_orders': Order.objects.filter(farmer=user).select_related('buyer').order_by('-created_at')[:5],
             'harvest_schedules': HarvestSchedule.objects.filter(
-                farm__owner=user, status__in=['planned', 'ready']).order_by('harvest_date')[:5],
+                farm__owner=user, status__in=['planned', 'ready']).select_related('farm').order_by('harvest_date')[:5],
             'loss_reports': PostHarvestLossReport.objects.filter(
                 farm__owner=user).order_by('-incident_date')[:3],
         })
 
     elif user.role == 'buyer':
         context.update({
-            'recent_orders': Order.objects.filter(buyer=user).order_by('-created_at')[:5],
+            'recent_orders': Order.objects.filter(buyer=user).select_related('farmer').order_by('-created_at')[:5],
             'active_orders': Order.objects.filter(
                 buyer=user, status__in=['confirmed', 'processing', 'dispatched']).count(),
             'completed_orders': Order.objects.filter(buyer=user, status='completed').count(),
             'total_spent': Order.objects.filter(buyer=user, status='completed').aggregate(
                 total=Sum('total_amount'))['total'] or 0,
-            'featured_products': Product.objects.filter(status='available').order_by('-created_at')[:6],
+            'featured_products': recommended_products(user),
         })
 
     elif user.role == 'driver':
@@ -166,8 +185,9 @@ def dashboard_view(request):
                 alert_level='critical').order_by('-recorded_at')[:5],
         })
 
-    context['notifications'] = Notification.objects.filter(
-        user=user, is_read=False).order_by('-created_at')[:5]
+    context['notifications'] = list(Notification.objects.filter(user=user, is_read=False).order_by('-created_at')[:5])
+    if len(context['notifications']) < 5:
+        context['unread_count'] = len(context['notifications'])  # all of them; the badge needs no COUNT
 
     return render(request, 'dashboard.html', context)
 
@@ -193,7 +213,7 @@ def farm_list_view(request):
 
 @login_required
 def farm_detail_view(request, pk):
-    farm = get_object_or_404(Farm, pk=pk)
+    farm = get_object_or_404(Farm.objects.select_related('owner'), pk=pk)
     products = Product.objects.filter(farm=farm, status='available')
     harvests = HarvestSchedule.objects.filter(farm=farm).order_by('harvest_date')
     loss_reports = PostHarvestLossReport.objects.filter(farm=farm).order_by('-incident_date')
@@ -322,6 +342,7 @@ def product_list_view(request):
     min_price   = request.GET.get('min_price')
     max_price   = request.GET.get('max_price')
     search      = request.GET.get('q')
+    sort        = request.GET.get('sort')
 
     if category_id:
         products = products.filter(category_id=category_id)
@@ -338,6 +359,8 @@ def product_list_view(request):
             Q(farm__name__icontains=search) |
             Q(farm__location_name__icontains=search)
         )
+    if sort == 'popular':
+        products = view_counter.with_recent_views(products).order_by('-recent_views', '-created_at')
 
     categories = ProductCategory.objects.all()
     return render(request, 'products/list.html', {
@@ -349,12 +372,11 @@ def product_list_view(request):
 @login_required
 def product_detail_view(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    product.views_count += 1
-    product.save(update_fields=['views_count'])
+    view_counter.record(product.pk)
 
     price_history = PriceHistory.objects.filter(product=product).order_by('-recorded_at')[:10]
     market_prices = MarketPriceIndex.objects.filter(
-        product_name__icontains=product.name.split('(')[0].strip()
+        commodity_key=product.commodity_key
     ).order_by('-recorded_date')[:5]
 
     return render(request, 'products/detail.html', {
@@ -374,8 +396,9 @@ def product_create_view(request):
     categories = ProductCategory.objects.all()
 
     if request.method == 'POST':
+        farm = get_object_or_404(Farm, pk=request.POST['farm'], owner=request.user)
         product = Product.objects.create(
-            farm=get_object_or_404(Farm, pk=request.POST['farm'], owner=request.user),
+            farm=farm,
             category=get_object_or_404(ProductCategory, pk=request.POST['category']),
             name=request.POST['name'],
             variety=request.POST.get('variety', ''),
@@ -390,6 +413,12 @@ def product_create_view(request):
             is_certified=request.POST.get('is_certified') == 'on',
             photo=request.FILES.get('photo'),
         )
+        product.refresh_from_db(fields=['price_per_unit'])  # still the raw POST string otherwise
+        band = band_for(farm, product.name)
+        record_suggestion(product, band)
+        if band and product.unit == 'kg' and not band.low_price <= product.price_per_unit <= band.high_price:
+            messages.info(request, f'Similar produce near {band.get_market_display()} sells for '
+                                   f'KES {band.low_price}–{band.high_price}/kg at the farm gate.')
         messages.success(request, f'"{product.name}" listed successfully!')
         return redirect('product_detail', pk=product.pk)
 
@@ -466,7 +495,8 @@ def order_list_view(request):
 
 @login_required
 def order_detail_view(request, pk):
-    order = get_object_or_404(Order, pk=pk)
+    order = get_object_or_404(
+        Order.objects.select_related('buyer', 'farmer', 'shipment__driver', 'shipment__vehicle'), pk=pk)
     if request.user not in [order.buyer, order.farmer] and request.user.role != 'admin':
         messages.error(request, 'Access denied.')
         return redirect('order_list')
@@ -486,6 +516,59 @@ def order_detail_view(request, pk):
     })
 
 
+def _id_param(request, name):
+    """The integer id in ``request.GET[name]``, or None if it is missing or malformed."""
+    try:
+        return int(request.GET.get(name, ''))
+    except ValueError:
+        return None
+
+
+def _quantity(value):
+    """A finite, positive quantity from form or query text; ValueError otherwise."""
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('quantity must be a number') from None
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise ValueError('quantity must be a positive number')
+    return quantity
+
+
+def _delivery_point(request):
+    """
+    Delivery (lat, lon) from the request, else the buyer's saved location, else None.
+
+    Coordinates that are sent but malformed or out of range raise ValueError
+    rather than silently falling back.
+    """
+    data = request.POST if request.method == 'POST' else request.GET
+    if data.get('delivery_latitude') or data.get('delivery_longitude'):
+        try:
+            latitude, longitude = float(data['delivery_latitude']), float(data['delivery_longitude'])
+        except (KeyError, ValueError):
+            raise ValueError('delivery_latitude and delivery_longitude must both be numbers') from None
+        if not (math.isfinite(latitude) and math.isfinite(longitude)
+                and -90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('delivery coordinates are out of range')
+        return latitude, longitude
+    if request.user.latitude is not None and request.user.longitude is not None:
+        return float(request.user.latitude), float(request.user.longitude)
+    return None
+
+
+def _order_form(request, product, status=200):
+    cold_chain_routes = LogisticsRoute.objects.filter(
+        is_cold_chain_available=True, is_active=True
+    ) if product.category and product.category.requires_cold_chain else []
+
+    return render(request, 'orders/create.html', {
+        'product': product,
+        'payment_methods': Order.PAYMENT_METHODS,
+        'cold_chain_routes': cold_chain_routes,
+    }, status=status)
+
+
 @login_required
 def order_create_view(request, product_pk):
     if request.user.role != 'buyer':
@@ -495,11 +578,16 @@ def order_create_view(request, product_pk):
     product = get_object_or_404(Product, pk=product_pk, status='available')
 
     if request.method == 'POST':
-        quantity   = float(request.POST['quantity'])
+        try:
+            quantity = _quantity(request.POST.get('quantity'))
+            destination = _delivery_point(request)
+        except ValueError as exc:
+            messages.error(request, str(exc).capitalize() + '.')
+            return _order_form(request, product, status=400)
         unit_price = float(product.price_per_unit)
         subtotal   = quantity * unit_price
-        fee        = subtotal * 0.025
-        shipping   = float(request.POST.get('shipping_cost', 0))
+        fee        = subtotal * settings.PLATFORM_FEE_RATE
+        shipping   = float(quote_for_product(product, quantity, destination)['cost'])
         total      = subtotal + fee + shipping
 
         import uuid
@@ -515,6 +603,8 @@ def order_create_view(request, product_pk):
             total_amount=total,
             payment_method=request.POST['payment_method'],
             delivery_address=request.POST['delivery_address'],
+            delivery_latitude=destination[0] if destination else None,
+            delivery_longitude=destination[1] if destination else None,
             requested_delivery_date=request.POST.get('requested_delivery_date') or None,
             buyer_notes=request.POST.get('buyer_notes', ''),
         )
@@ -529,25 +619,17 @@ def order_create_view(request, product_pk):
         )
 
         # Notify farmer
-        Notification.objects.create(
-            user=product.farm.owner,
-            notification_type='order',
-            title='New Order Received!',
-            message=f'{request.user.get_full_name()} ordered {quantity}{product.unit} of {product.name}.',
-        )
+        enqueue_on_commit('notifications.send', {
+            'user_ids': [product.farm.owner_id],
+            'notification_type': 'order',
+            'title': 'New Order Received!',
+            'message': f'{request.user.get_full_name()} ordered {quantity}{product.unit} of {product.name}.',
+        }, key=f'order-created:{order.pk}')
 
         messages.success(request, f'Order #{order.order_number} placed successfully!')
         return redirect('order_detail', pk=order.pk)
 
-    cold_chain_routes = LogisticsRoute.objects.filter(
-        is_cold_chain_available=True, is_active=True
-    ) if product.category and product.category.requires_cold_chain else []
-
-    return render(request, 'orders/create.html', {
-        'product': product,
-        'payment_methods': Order.PAYMENT_METHODS,
-        'cold_chain_routes': cold_chain_routes,
-    })
+    return _order_form(request, product)
 
 
 @login_required
@@ -559,12 +641,12 @@ def order_confirm_view(request, pk):
             order.status = 'confirmed'
             order.farmer_notes = request.POST.get('farmer_notes', '')
             order.save()
-            Notification.objects.create(
-                user=order.buyer,
-                notification_type='order',
-                title='Order Confirmed!',
-                message=f'Your order #{order.order_number} has been confirmed by the farmer.',
-            )
+            enqueue_on_commit('notifications.send', {
+                'user_ids': [order.buyer_id],
+                'notification_type': 'order',
+                'title': 'Order Confirmed!',
+                'message': f'Your order #{order.order_number} has been confirmed by the farmer.',
+            }, key=f'order-confirmed:{order.pk}')
             messages.success(request, 'Order confirmed.')
         elif action == 'cancel':
             order.status = 'cancelled'
@@ -662,10 +744,11 @@ def dispute_resolve_view(request, pk):
 
 @login_required
 def vehicle_list_view(request):
+    vehicles = Vehicle.objects.select_related('driver')
     if request.user.role == 'driver':
-        vehicles = Vehicle.objects.filter(driver=request.user)
+        vehicles = vehicles.filter(driver=request.user)
     else:
-        vehicles = Vehicle.objects.filter(status='available').select_related('driver')
+        vehicles = vehicles.filter(status='available')
     return render(request, 'logistics/vehicle_list.html', {'vehicles': vehicles})
 
 
@@ -727,7 +810,7 @@ def shipment_list_view(request):
 
 @login_required
 def shipment_detail_view(request, pk):
-    shipment = get_object_or_404(Shipment, pk=pk)
+    shipment = get_object_or_404(Shipment.objects.select_related('driver', 'vehicle', 'route'), pk=pk)
     tracking = ShipmentTracking.objects.filter(shipment=shipment).order_by('timestamp')
     temp_logs = TemperatureLog.objects.filter(shipment=shipment).order_by('-recorded_at')[:20]
     return render(request, 'logistics/shipment_detail.html', {
@@ -741,26 +824,18 @@ def shipment_detail_view(request, pk):
 def shipment_update_status_view(request, pk):
     shipment = get_object_or_404(Shipment, pk=pk, driver=request.user)
     if request.method == 'POST':
-        new_status = request.POST['status']
-        shipment.status = new_status
-        if new_status == 'picked_up':
-            shipment.actual_pickup = timezone.now()
-        if new_status == 'delivered':
-            shipment.actual_delivery = timezone.now()
-            if 'proof_of_delivery_photo' in request.FILES:
-                shipment.proof_of_delivery_photo = request.FILES['proof_of_delivery_photo']
-        shipment.save()
-
-        # Update GPS location
-        ShipmentTracking.objects.create(
-            shipment=shipment,
-            latitude=request.POST.get('latitude', 0),
-            longitude=request.POST.get('longitude', 0),
-            speed_kmh=request.POST.get('speed_kmh', 0),
-            status_note=f'Status updated to {shipment.get_status_display()}',
-        )
-
-        messages.success(request, f'Shipment updated to {shipment.get_status_display()}.')
+        try:
+            update_shipment_status(
+                shipment, request.POST['status'],
+                latitude=request.POST.get('latitude'),
+                longitude=request.POST.get('longitude'),
+                speed_kmh=request.POST.get('speed_kmh'),
+                photo=request.FILES.get('proof_of_delivery_photo'),
+            )
+        except ValueError as exc:
+            messages.error(request, str(exc))
+        else:
+            messages.success(request, f'Shipment updated to {shipment.get_status_display()}.')
     return redirect('shipment_detail', pk=pk)
 
 
@@ -790,7 +865,7 @@ def cold_storage_list_view(request):
 
 @login_required
 def cold_storage_detail_view(request, pk):
-    facility = get_object_or_404(ColdStorageFacility, pk=pk)
+    facility = get_object_or_404(ColdStorageFacility.objects.select_related('operator'), pk=pk)
     bookings = ColdStorageBooking.objects.filter(
         facility=facility, status__in=['active', 'confirmed']
     ).select_related('booked_by')
@@ -820,12 +895,12 @@ def cold_storage_book_view(request, facility_pk):
             end_date=request.POST['end_date'],
             notes=request.POST.get('notes', ''),
         )
-        Notification.objects.create(
-            user=facility.operator,
-            notification_type='cold_chain',
-            title='New Booking Request',
-            message=f'{request.user.get_full_name()} booked {booking.quantity_tonnes}T from {booking.start_date}.',
-        )
+        enqueue_on_commit('notifications.send', {
+            'user_ids': [facility.operator_id],
+            'notification_type': 'cold_chain',
+            'title': 'New Booking Request',
+            'message': f'{request.user.get_full_name()} booked {booking.quantity_tonnes}T from {booking.start_date}.',
+        }, key=f'booking-created:{booking.pk}')
         messages.success(request, f'Cold storage booked! Total cost: KES {booking.total_cost:,.0f}')
         return redirect('cold_storage_booking_detail', pk=booking.pk)
 
@@ -834,7 +909,7 @@ def cold_storage_book_view(request, facility_pk):
 
 @login_required
 def cold_storage_booking_detail_view(request, pk):
-    booking = get_object_or_404(ColdStorageBooking, pk=pk)
+    booking = get_object_or_404(ColdStorageBooking.objects.select_related('facility', 'booked_by'), pk=pk)
     temp_logs = TemperatureLog.objects.filter(booking=booking).order_by('-recorded_at')
     alerts = temp_logs.filter(alert_level__in=['warning', 'critical'])
     return render(request, 'cold_chain/booking_detail.html', {
@@ -846,7 +921,7 @@ def cold_storage_booking_detail_view(request, pk):
 
 @login_required
 def temperature_log_view(request, booking_pk):
-    booking   = get_object_or_404(ColdStorageBooking, pk=booking_pk)
+    booking   = get_object_or_404(ColdStorageBooking.objects.select_related('facility'), pk=booking_pk)
     temp_logs = TemperatureLog.objects.filter(booking=booking).order_by('-recorded_at')
     return render(request, 'cold_chain/temperature_logs.html', {
         'booking': booking,
@@ -865,23 +940,18 @@ def analytics_dashboard_view(request):
         return redirect('dashboard')
 
     last_30 = PlatformMetric.objects.order_by('-date')[:30]
-    total_losses = PostHarvestLossReport.objects.aggregate(
-        total_kg=Sum('quantity_lost_kg'),
-        total_value=Sum('estimated_value_lost'),
-    )
-    losses_by_cause = PostHarvestLossReport.objects.values('primary_cause').annotate(
-        total_kg=Sum('quantity_lost_kg'),
-        count=Count('id')
-    ).order_by('-total_kg')
-    top_markets = MarketPriceIndex.objects.values('market').annotate(
-        product_count=Count('product_name', distinct=True)
-    )
+    # Farmers only see their own farms; admins see the whole platform.
+    losses = loss_overview(owner=request.user if request.user.role == 'farmer' else None)
+    outlook = supply_outlook()
+    for row in outlook:
+        row['commodity'] = display_name(row['commodity_key'])
 
     return render(request, 'analytics/dashboard.html', {
         'metrics': last_30,
-        'total_losses': total_losses,
-        'losses_by_cause': losses_by_cause,
-        'top_markets': top_markets,
+        'total_losses': losses['totals'],
+        'losses_by_cause': losses['by_cause'],
+        'top_markets': market_coverage(),
+        'supply_outlook': outlook,
     })
 
 
@@ -894,11 +964,12 @@ def market_prices_view(request):
     if market:
         prices = prices.filter(market=market)
     if product:
-        prices = prices.filter(product_name__icontains=product)
+        prices = filter_by_commodity(prices, product)
 
     return render(request, 'analytics/market_prices.html', {
         'prices': prices[:100],
         'markets': MarketPriceIndex.MARKETS,
+        'analytics': price_analytics(product) if product else None,
     })
 
 
@@ -909,6 +980,10 @@ def loss_report_list_view(request):
     else:
         reports = PostHarvestLossReport.objects.all()
 
+    commodity = request.GET.get('commodity')
+    if commodity:
+        reports = filter_by_commodity(reports, commodity)
+
     return render(request, 'analytics/loss_reports.html', {
         'reports': reports.select_related('farm').order_by('-incident_date'),
         'causes': PostHarvestLossReport.CAUSE_CHOICES,
@@ -945,23 +1020,25 @@ def loss_report_create_view(request):
 
 @login_required
 def notification_list_view(request):
-    notifications = Notification.objects.filter(
-        user=request.user
-    ).order_by('-created_at')
-    return render(request, 'notifications/list.html', {'notifications': notifications})
+    before = request.GET.get('before')
+    notifications, next_before = inbox_page(request.user, int(before) if before and before.isdigit() else None)
+    return render(request, 'notifications/list.html', {
+        'notifications': notifications,
+        'next_before': next_before,
+        'paged': bool(before),
+    })
 
 
 @login_required
 def notification_mark_read_view(request, pk):
-    notification = get_object_or_404(Notification, pk=pk, user=request.user)
-    notification.is_read = True
-    notification.save()
+    get_object_or_404(Notification, pk=pk, user=request.user)
+    mark_notifications_read(request.user, [pk])
     return redirect(request.META.get('HTTP_REFERER', 'notification_list'))
 
 
 @login_required
 def notification_mark_all_read_view(request):
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    mark_notifications_read(request.user)
     messages.success(request, 'All notifications marked as read.')
     return redirect('notification_list')
 
@@ -1007,21 +1084,74 @@ def api_product_search_view(request):
     products = Product.objects.filter(
         status='available',
         name__icontains=q
-    ).values('id', 'name', 'price_per_unit', 'unit', 'quantity_available')[:10]
-    return JsonResponse({'results': list(products)})
+    ).values('id', 'name', 'price_per_unit', 'unit', 'quantity_available', 'photo')[:10]
+    results = [dict(product, photo=rendition_urls(product['photo'])) for product in products]
+    return JsonResponse({'results': results})
 
 
 @login_required
 def api_market_prices_view(request):
     product = request.GET.get('product', '')
-    prices = MarketPriceIndex.objects.filter(
-        product_name__icontains=product
-    ).order_by('-recorded_date').values(
+    prices = MarketPriceIndex.objects.all()
+    if product:
+        prices = filter_by_commodity(prices, product)
+    prices = prices.order_by('-recorded_date').values(
         'market', 'product_name', 'price_per_kg', 'recorded_date'
     )[:20]
     return JsonResponse({'prices': list(prices)})
 
 
+@login_required
+def api_market_price_analytics_view(request):
+    product = request.GET.get('product', '').strip()
+    if not product:
+        return JsonResponse({'error': 'product is required'}, status=400)
+    analytics = price_analytics(product)
+    if request.GET.get('series') != '1':
+        analytics = {key: value for key, value in analytics.items() if key != 'series'}
+    return JsonResponse(analytics)
+
+
+@login_required
+def api_price_suggestion_view(request):
+    farm_id = _id_param(request, 'farm')
+    if farm_id is None:
+        return JsonResponse({'error': 'farm must be a farm id'}, status=400)
+    farm = get_object_or_404(Farm, pk=farm_id, owner=request.user)
+    band = band_for(farm, request.GET.get('product', ''))
+    if band is None:
+        return JsonResponse({'band': None})
+    return JsonResponse({'band': {
+        'commodity': band.commodity_key,
+        'market': band.get_market_display(),
+        'low_price': band.low_price,
+        'suggested_price': band.suggested_price,
+        'high_price': band.high_price,
+        'market_price': band.market_price,
+        'transport_cost_per_kg': band.transport_cost_per_kg,
+        'as_of': band.as_of,
+    }})
+
+
+@login_required
+def api_shipping_quote_view(request):
+    product_id = _id_param(request, 'product')
+    if product_id is None:
+        return JsonResponse({'error': 'product must be a product id'}, status=400)
+    product = get_object_or_404(Product.objects.select_related('farm', 'category'), pk=product_id)
+    try:
+        quantity = _quantity(request.GET.get('quantity'))
+        destination = _delivery_point(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'quote': quote_for_product(product, quantity, destination)})
+
+
+@login_required
+def api_supply_forecast_view(request):
+    return JsonResponse(forecast_curves(request.GET.get('product', '').strip(), request.GET.get('region', '').strip()))
+
+
 @login_required
 def api_update_vehicle_location_view(request, vehicle_pk):
     if request.method != 'POST':
@@ -1032,4 +1162,158 @@ def api_update_vehicle_location_view(request, vehicle_pk):
     vehicle.current_longitude = data.get('longitude')
     vehicle.last_location_update = timezone.now()
     vehicle.save(update_fields=['current_latitude', 'current_longitude', 'last_location_update'])
-    return JsonResponse({'status': 'updated'})
\ No newline at end of file
+    return JsonResponse({'status': 'updated'})
+
+
+@login_required
+def api_changes_view(request):
+    feeds = [name for name in request.GET.get('feeds', '').split(',') if name] or None
+    if feeds and not set(feeds) <= set(change_feed.FEEDS):
+        return JsonResponse({'error': f'feeds must be among {", ".join(change_feed.FEEDS)}'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', change_feed.DEFAULT_LIMIT)), 1), change_feed.MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    return JsonResponse(change_feed.changes(request.user, request.GET.get('token'), feeds, limit))
+
+
+@login_required
+def api_driver_sync_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if request.user.role != 'driver':
+        return JsonResponse({'error': 'Only drivers can sync'}, status=403)
+    try:
+        data = json.loads(request.body)
+        return JsonResponse(driver_sync(request.user, data.get('mutations', []), data.get('token')))
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Body must be a JSON object'}, status=400)
+    except SyncError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+
+def _upload_state(session):
+    return {
+        'id': str(session.pk),
+        'target': session.target,
+        'object_id': session.object_id,
+        'size': session.size,
+        'offset': session.received_bytes,
+        'status': session.status,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_BYTES,
+        'expires_at': session.expires_at,
+    }
+
+
+def _chunk_offset(request):
+    """Offset from ``Upload-Offset`` or ``Content-Range: bytes a-b/total``."""
+    if 'HTTP_UPLOAD_OFFSET' in request.META:
+        return int(request.META['HTTP_UPLOAD_OFFSET'])
+    unit, _, spec = request.META.get('HTTP_CONTENT_RANGE', '').partition(' ')
+    if unit != 'bytes' or '-' not in spec:
+        raise ValueError('Upload-Offset or Content-Range header required')
+    return int(spec.split('-', 1)[0])
+
+
+@login_required
+def api_upload_create_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body)
+        on_complete = {key: data[key] for key in ('status', 'latitude', 'longitude', 'speed_kmh') if data.get(key)}
+        session = uploads.open_session(
+            request.user, data.get('target'), int(data.get('object_id') or 0), data.get('filename', ''),
+            int(data.get('size') or 0), sha256=data.get('sha256', ''), on_complete=on_complete,
+        )
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid upload request'}, status=400)
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    return JsonResponse(_upload_state(session), status=201)
+
+
+@login_required
+def api_upload_view(request, pk):
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+    if request.method == 'DELETE':
+        uploads.abort(session)
+        return JsonResponse({'status': 'aborted'})
+    if request.method == 'PUT':
+        try:
+            offset = _chunk_offset(request)
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            uploads.write_chunk(session, offset, request, length)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        except uploads.UploadError as exc:
+            return JsonResponse({'error': str(exc), **_upload_state(session)}, status=exc.status)
+    return JsonResponse(_upload_state(session))
+
+
+@login_required
+def api_upload_complete_view(request, pk):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+    try:
+        target = uploads.complete(session)
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc), **_upload_state(session)}, status=exc.status)
+    photo = target.proof_of_delivery_photo if session.target == 'shipment' else target.evidence_photo
+    return JsonResponse({**_upload_state(session), 'photo': rendition_urls(photo)})
+
+
+@login_required
+def api_notifications_read_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body)
+        ids = None if data.get('all') else [int(pk) for pk in data['ids']]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'error': 'Send {"ids": [...]} or {"all": true}'}, status=400)
+    if ids is not None and len(ids) > 1000:
+        return JsonResponse({'error': 'At most 1000 ids per request'}, status=400)
+    updated = mark_notifications_read(request.user, ids)
+    return JsonResponse({'updated': updated, 'unread_count': unread_count(request.user.pk)})
+
+
+@login_required
+def api_notifications_broadcast_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if not (request.user.is_staff or request.user.role == 'admin'):
+        return JsonResponse({'error': 'Only platform admins can broadcast'}, status=403)
+    try:
+        data = json.loads(request.body)
+        payload = {
+            'broadcast_id': uuid.uuid4().hex,
+            'notification_type': data.get('notification_type', 'system'),
+            'title': data['title'].strip()[:255],
+            'message': data['message'].strip(),
+            'role': data.get('role', ''),
+            'county': data.get('county', '').strip(),
+        }
+    except (ValueError, KeyError, AttributeError):
+        return JsonResponse({'error': 'title and message are required'}, status=400)
+    if not payload['title'] or not payload['message']:
+        return JsonResponse({'error': 'title and message are required'}, status=400)
+    if payload['notification_type'] not in dict(Notification.TYPES) or \
+            (payload['role'] and payload['role'] not in dict(User.ROLE_CHOICES)):
+        return JsonResponse({'error': 'Unknown notification type or role'}, status=400)
+    recipients = notification_audience(payload['role'], payload['county']).count()
+    job = enqueue('notifications.broadcast', payload)
+    return JsonResponse({'broadcast_id': payload['broadcast_id'], 'job': job.pk, 'recipients': recipients}, status=202)
+
+
+# ============================================================
+# 📈 METRICS (Prometheus scrape target)
+# ============================================================
+
+def metrics_view(request):
+    token = settings.INSTRUMENTATION_METRICS_TOKEN
+    supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and hmac.compare_digest(supplied, token))):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(instrumentation.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')